@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Measure the compiled trade filter as the number of rules grows.
+
+Each rule set is a mix of per-user, per-symbol and compound rules, like a large
+allow and deny list would be. Checking the rules one by one in order is timed on
+a slice of the feed for comparison.
+
+    PYTHONPATH=src python benchmarks/bench_filters.py --trades 100000
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from thetagang_notifications.filters import FilterRule, TradeFilter
+
+TYPES = ["CASH SECURED PUT", "COVERED CALL", "LONG CALL", "PUT CREDIT SPREAD", "SHORT IRON CONDOR"]
+ROLES = ["patron", "joonie", "member"]
+
+
+def make_rules(count: int, rng: random.Random) -> list[FilterRule]:
+    """Build a rule set with the given number of rules over a large universe."""
+    rules = []
+    for _ in range(count):
+        kind = rng.random()
+        action = rng.choice(["allow", "deny"])
+        if kind < 0.4:
+            rules.append(FilterRule(action=action, users=frozenset({f"user{rng.randrange(5000)}"})))
+        elif kind < 0.8:
+            rules.append(FilterRule(action=action, symbols=frozenset({f"SYM{rng.randrange(3000)}"})))
+        else:
+            rules.append(
+                FilterRule(
+                    action=action,
+                    users=frozenset(f"user{rng.randrange(5000)}" for _ in range(3)),
+                    trade_types=frozenset(rng.sample(TYPES, 2)),
+                    min_quantity=rng.choice([None, 5]),
+                )
+            )
+    rules.append(FilterRule(action="allow", roles=frozenset({"patron", "joonie"})))
+    return rules
+
+
+def make_feed(count: int, rng: random.Random) -> list[dict]:
+    """Build a feed of trades from thousands of users and symbols."""
+    return [
+        {
+            "User": {"username": f"user{rng.randrange(5000)}", "role": rng.choice(ROLES)},
+            "symbol": f"SYM{rng.randrange(3000)}",
+            "type": rng.choice(TYPES),
+            "quantity": rng.randint(1, 20),
+        }
+        for _ in range(count)
+    ]
+
+
+def first_match(rules: list[FilterRule], trade: dict) -> bool:
+    """Check the rules one by one in order."""
+    user, role = trade["User"]["username"], trade["User"]["role"]
+    for rule in rules:
+        if rule.matches(user, trade["symbol"], trade["type"], role, trade["quantity"]):
+            return rule.action == "allow"
+    return False
+
+
+def main() -> None:
+    """Time the compiled filter and the linear scan for growing rule sets."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trades", type=int, default=100_000, help="trades in the feed (default: 100000)")
+    parser.add_argument("--linear-trades", type=int, default=500, help="trades for the linear scan (default: 500)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(7)
+    feed = make_feed(args.trades, rng)
+
+    print(f"{'rules':>6} {'compile':>10} {'compiled':>14} {'linear':>14} {'allowed':>8}")
+    for count in (10, 100, 1000, 5000, 10000):
+        rules = make_rules(count, rng)
+        started = time.perf_counter()
+        trade_filter = TradeFilter(rules)
+        compile_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        allowed = sum(1 for trade in feed if trade_filter(trade))
+        compiled = (time.perf_counter() - started) / len(feed)
+
+        sample = feed[: args.linear_trades]
+        started = time.perf_counter()
+        for trade in sample:
+            first_match(rules, trade)
+        linear = (time.perf_counter() - started) / len(sample)
+
+        print(
+            f"{count:>6} {compile_time * 1e3:>8.1f}ms {compiled * 1e6:>10.2f}µs/t "
+            f"{linear * 1e6:>10.1f}µs/t {allowed / len(feed):>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Measure notification rendering and the full notify_packed cost separately.
+
+Trades come from the recorded example trades in tests/fixtures and are sent
+through notify_packed, as run_trades does, to an in-memory sink. Symbol logos are looked up during one untimed
+warm-up round, so the timed rounds make no HTTP requests.
+
+    PYTHONPATH=src python benchmarks/bench_pipeline.py --rounds 200
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import time
+from pathlib import Path
+
+from ruyaml import YAML
+
+from thetagang_notifications.notification import get_notifier, notify_packed
+from thetagang_notifications.sinks import MemorySink, set_sink
+from thetagang_notifications.trade import get_trade_class
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures" / "trades"
+
+
+def load_trades() -> list[dict]:
+    """Load the example trades from the recorded API responses."""
+    yaml = YAML(typ="safe", pure=True)
+    trades = []
+    for path in sorted(FIXTURES.glob("*.yaml")):
+        response = yaml.load(path.read_text(encoding="utf-8"))["interactions"][0]["response"]
+        body = response["body"]["string"] if "body" in response else response["content"]
+        if isinstance(body, bytes):
+            body = gzip.decompress(body)
+        trades.append(json.loads(body)["data"])
+    return trades
+
+
+def main() -> None:
+    """Render and notify the example trades repeatedly and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=100, help="times to run every trade (default: 100)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    trades = load_trades()
+    for trade in trades:
+        get_notifier(get_trade_class(trade)).generate_embeds()
+    sink = set_sink(MemorySink())
+    render_time = notify_time = 0.0
+
+    for _ in range(args.rounds):
+        notifiers = [get_notifier(get_trade_class(trade)) for trade in trades]
+        started = time.perf_counter()
+        for notifier in notifiers:
+            notifier.generate_embeds()
+        rendered = time.perf_counter()
+        notify_packed(notifiers)
+        render_time += rendered - started
+        notify_time += time.perf_counter() - rendered
+
+    count = args.rounds * len(trades)
+    print(f"trades:   {count}")
+    print(f"render:   {render_time / count * 1e6:8.1f} µs/trade")
+    # notify_packed renders each trade again, then routes, packs and delivers it.
+    print(f"notify:   {notify_time / count * 1e6:8.1f} µs/trade")
+    print(f"messages: {sink.delivered}")
+
+
+if __name__ == "__main__":
+    main()
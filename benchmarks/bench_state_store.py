@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Compare batched dedupe throughput and memory of the trade status stores.
+
+Each store is filled with the given number of trades, then fed batches shaped
+like a busy feed window: most GUIDs are already stored, the rest are new and get
+written back. Redis is used when it answers at REDIS_HOST, otherwise an
+in-process fakeredis stands in and its numbers only show the relative cost.
+
+    PYTHONPATH=src python benchmarks/bench_state_store.py --sizes 10000,100000,1000000,10000000
+"""
+
+import argparse
+import importlib.util
+import logging
+import random
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from redis import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from thetagang_notifications.config import settings
+from thetagang_notifications.state_store import LMDBStateStore, RedisStateStore, SQLiteStateStore, StateStore
+
+FILL_BATCH = 10_000
+
+
+def rss_bytes() -> int:
+    """Return the resident memory of this process."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text(encoding="utf-8").split()[1])
+        return pages * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def store_bytes(name: str, store: StateStore, path: Path | None) -> int:
+    """Return the memory used by Redis, or the files of an embedded store with its WAL."""
+    if path is None:
+        if name != "redis" or not isinstance(store, RedisStateStore):
+            return 0
+        return int(store.db_conn.info("memory")["used_memory"])
+    files = path.rglob("*") if path.is_dir() else path.parent.glob(f"{path.name}*")
+    return sum(x.stat().st_size for x in files if x.is_file())
+
+
+def open_redis() -> tuple[Redis, str]:
+    """Connect to Redis, falling back to fakeredis when nothing answers."""
+    db_conn = Redis(host=settings.redis_host, port=settings.redis_port, db=15, decode_responses=True)
+    try:
+        db_conn.ping()
+    except RedisConnectionError:
+        import fakeredis
+
+        return fakeredis.FakeRedis(decode_responses=True), "fakeredis"
+    db_conn.flushdb()
+    return db_conn, "redis"
+
+
+def open_stores(workdir: Path, map_size: int) -> list[tuple[str, StateStore, Path | None]]:
+    """Open every store that can run here."""
+    db_conn, name = open_redis()
+    stores: list[tuple[str, StateStore, Path | None]] = [
+        (name, RedisStateStore(db_conn), None),
+        ("sqlite", SQLiteStateStore(workdir / "state.db"), workdir / "state.db"),
+    ]
+    if importlib.util.find_spec("lmdb") is not None:
+        stores.append(("lmdb", LMDBStateStore(workdir / "state.lmdb", map_size), workdir / "state.lmdb"))
+    return stores
+
+
+def fill(store: StateStore, start: int, stop: int) -> None:
+    """Store trades with serial GUIDs from start to stop."""
+    for batch_start in range(start, stop, FILL_BATCH):
+        batch_stop = min(batch_start + FILL_BATCH, stop)
+        store.set_many([(f"guid-{x:09d}", "open" if x % 3 else "closed") for x in range(batch_start, batch_stop)])
+
+
+def dedupe(
+    store: StateStore, stored: int, batches: int, batch_size: int, new_ratio: float, rng: random.Random
+) -> float:
+    """Run feed windows through the store and return the trades handled per second."""
+    next_guid = stored
+    started = time.perf_counter()
+    for _ in range(batches):
+        guids = []
+        for _ in range(batch_size):
+            if rng.random() < new_ratio:
+                guids.append(f"guid-{next_guid:09d}")
+                next_guid += 1
+            else:
+                guids.append(f"guid-{rng.randrange(stored):09d}")
+        statuses = store.get_many(guids)
+        store.set_many([(guid, "open") for guid, status in statuses.items() if status is None])
+    return batches * batch_size / (time.perf_counter() - started)
+
+
+def main() -> None:
+    """Fill each store to every size and time batched dedupe against it."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--sizes", default="10000,100000,1000000", help="stored trades to test (default: 10000,100000,1000000)"
+    )
+    parser.add_argument("--batches", type=int, default=200, help="feed windows per size (default: 200)")
+    parser.add_argument("--batch-size", type=int, default=500, help="trades per feed window (default: 500)")
+    parser.add_argument("--new-ratio", type=float, default=0.1, help="share of new trades per window (default: 0.1)")
+    parser.add_argument("--map-size", type=int, default=8 << 30, help="LMDB map size in bytes (default: 8 GiB)")
+    args = parser.parse_args()
+    sizes = sorted(int(x) for x in args.sizes.split(","))
+
+    logging.disable(logging.INFO)
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory(prefix="bench-state-") as tmp:
+        stores = open_stores(Path(tmp), args.map_size)
+        print(f"{'store':>10} {'stored':>10} {'fill':>12} {'dedupe':>14} {'rss':>10} {'size':>10}")
+        for name, store, path in stores:
+            stored = 0
+            baseline = rss_bytes()
+            for size in sizes:
+                started = time.perf_counter()
+                fill(store, stored, size)
+                fill_rate = (size - stored) / max(time.perf_counter() - started, 1e-9)
+                stored = size
+
+                rate = dedupe(store, stored, args.batches, args.batch_size, args.new_ratio, rng)
+                print(
+                    f"{name:>10} {size:>10} {fill_rate:>10.0f}/s {rate:>12.0f}/s "
+                    f"{(rss_bytes() - baseline) / 2**20:>8.1f}MB {store_bytes(name, store, path) / 2**20:>8.1f}MB"
+                )
+            if name == "redis" and isinstance(store, RedisStateStore):
+                store.db_conn.flushdb()
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
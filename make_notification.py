@@ -1,41 +1,114 @@
 #!/usr/bin/env python3
-"""Make a test notification for any trade guid from thetagang.com."""
+"""Preview notifications for any trade guid from thetagang.com.
 
+Without arguments, every example trade from the trade spec file is rendered.
+Downloaded trades are cached locally so repeat runs work offline.
+"""
+
+import argparse
+import json
+import logging
 import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-import httpx
 from ruyaml import YAML
 
-from thetagang_notifications.config import TRADE_SPEC_FILE
+from thetagang_notifications.config import settings
 from thetagang_notifications.notification import get_notifier
+from thetagang_notifications.sinks import JsonlFileSink, set_sink
+from thetagang_notifications.trade import get_trade_class
+from thetagang_notifications.transport import close_http_client, get_http_client
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(".cache/trades")
+
+
+def parse_guid(value: str) -> str:
+    """Check that a trade guid is a UUID, so it is safe to use in a cache file name.
+
+    Raises:
+        ValueError: If the value is not a UUID
+    """
+    return str(uuid.UUID(value))
 
 
-def download_trade(trade_guid):
-    """Download the trade from thetagang.com."""
-    response = httpx.get(f"https://api3.thetagang.com/trades/{trade_guid}", timeout=15)
-    return response.json()["data"]
+def download_trade(trade_guid: str, cache_dir: Path) -> dict:
+    """Download the trade from thetagang.com, or load it from the local cache."""
+    cache_file = cache_dir / f"{parse_guid(trade_guid)}.json"
+    if cache_file.exists():
+        return json.loads(cache_file.read_text(encoding="utf-8"))
 
+    response = get_http_client().get(f"{settings.trades_json_url}/{trade_guid}")
+    trade = response.raise_for_status().json()["data"]
 
-def make_notification(trade_guid):
-    """Make a notification for the trade."""
-    trade = download_trade(trade_guid)
-    trade_obj = get_notifier(trade)
-    trade_obj.notify()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_file.write_text(json.dumps(trade), encoding="utf-8")
+    return trade
 
 
-def get_all_guids():
-    """Get all guids from thetagang.com."""
-    yaml = YAML(typ='safe', pure=True)
-    with open(TRADE_SPEC_FILE, encoding="utf-8") as file_handle:
+def download_trades(guids: list[str], cache_dir: Path, concurrency: int) -> list[dict]:
+    """Download many trades at once, keeping the order of the guids."""
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda guid: download_trade(guid, cache_dir), guids))
+
+
+def make_notification(trade: dict) -> None:
+    """Render a trade and deliver it through the configured sink."""
+    get_notifier(get_trade_class(trade)).notify()
+
+
+def get_all_guids() -> list[str]:
+    """Get the example guid for every trade type."""
+    yaml = YAML(typ="safe", pure=True)
+    with open(settings.trade_spec_file, encoding="utf-8") as file_handle:
         spec_data = yaml.load(file_handle)
     return [x["example_guid"] for x in spec_data]
 
 
-if __name__ == "__main__":
-    try:
-        guids = [sys.argv.pop(1)]
-    except IndexError:
-        guids = get_all_guids()
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("guids", nargs="*", type=parse_guid, help="trade guids to preview (default: every example trade)")
+    parser.add_argument("--concurrency", type=int, default=8, help="downloads to run at once (default: 8)")
+    parser.add_argument(
+        "--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help=f"where to cache trades (default: {DEFAULT_CACHE_DIR})"
+    )
+    parser.add_argument(
+        "--output",
+        default="discord",
+        help="'discord' to send to the webhooks, '-' for stdout, or a file path for JSON lines (default: discord)",
+    )
+    return parser.parse_args()
 
-    for guid in guids:
-        make_notification(guid)
+
+def configure_logging() -> None:
+    """Log to stderr, so a preview written to stdout stays valid JSON lines."""
+    logging.basicConfig(
+        stream=sys.stderr, level=logging.INFO, format="%(asctime)s;%(levelname)s;%(message)s", force=True
+    )
+
+
+def main() -> None:
+    """Download and render the requested trades."""
+    args = parse_args()
+    configure_logging()
+    guids = args.guids or get_all_guids()
+
+    trades = download_trades(guids, args.cache_dir, max(args.concurrency, 1))
+    log.info("📦 Loaded %s trades", len(trades))
+
+    if args.output != "discord":
+        set_sink(JsonlFileSink(args.output))
+
+    for trade in trades:
+        make_notification(trade)
+
+    set_sink(None)
+    close_http_client()
+
+
+if __name__ == "__main__":
+    main()
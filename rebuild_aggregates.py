@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Rebuild the per-user and per-symbol performance aggregates from trade history.
+
+Input is the same JSON lines (or make_notification.py cache) that render_trades.py
+reads. Every aggregate key is dropped first, so running it twice gives the same result.
+
+    python rebuild_aggregates.py history.jsonl
+    python rebuild_aggregates.py --cache-dir .cache/trades
+"""
+
+import argparse
+import logging
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from thetagang_notifications.aggregates import PerformanceAggregates
+from thetagang_notifications.bulk_render import parse_trade_line, read_trade_lines
+from thetagang_notifications.trade import Trade, get_trade_class
+from thetagang_notifications.trade_queue import connect_redis
+
+log = logging.getLogger(__name__)
+
+
+def load_trades(lines: Iterable[str]) -> Iterator[Trade]:
+    """Build trades from JSON lines, skipping any that do not validate."""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield get_trade_class(parse_trade_line(line))
+        except (ValueError, KeyError, TypeError, ValidationError) as e:
+            log.warning("⚠️ Skipping line %s: %s", number, e)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", help="JSON lines files with trades, or '-' for stdin")
+    parser.add_argument("--cache-dir", type=Path, help="also read every trade cached by make_notification.py")
+    parser.add_argument("--batch-size", type=int, default=500, help="trades per Redis round trip (default: 500)")
+    args = parser.parse_args()
+    if not args.inputs and args.cache_dir is None:
+        parser.error("give at least one input file or --cache-dir")
+    return args
+
+
+def main() -> None:
+    """Replace the aggregates with ones computed from the given trades."""
+    args = parse_args()
+    db_conn = connect_redis()
+    try:
+        aggregates = PerformanceAggregates(db_conn)
+        recorded = aggregates.rebuild(load_trades(read_trade_lines(args.inputs, args.cache_dir)), max(args.batch_size, 1))
+        log.info("🏆 Rebuilt the aggregates from %s closed trades", recorded)
+    finally:
+        db_conn.close()
+
+
+if __name__ == "__main__":
+    main()
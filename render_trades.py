@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Re-render historical trades in bulk across every core.
+
+Input is JSON lines with one trade (or one API response) per line. Output is
+JSON lines with the guid, type and rendered embed of each trade, in input order.
+
+    python render_trades.py trades.jsonl --output embeds.jsonl
+    python render_trades.py --cache-dir .cache/trades --output - | jq .embed.title
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+from thetagang_notifications.bulk_render import DEFAULT_BATCH_SIZE, RenderStats, read_trade_lines, render_lines
+
+log = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", help="JSON lines files with trades, or '-' for stdin")
+    parser.add_argument("--cache-dir", type=Path, help="also render every trade cached by make_notification.py")
+    parser.add_argument("--output", default="-", help="file for the rendered JSON lines (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: every core)")
+    parser.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"trades per worker task (default: {DEFAULT_BATCH_SIZE})"
+    )
+    args = parser.parse_args()
+    if not args.inputs and args.cache_dir is None:
+        parser.error("give at least one input file or --cache-dir")
+    return args
+
+
+def main() -> None:
+    """Render the trades and report the throughput."""
+    args = parse_args()
+    stats = RenderStats()
+    lines = render_lines(
+        read_trade_lines(args.inputs, args.cache_dir), workers=max(args.workers, 1), batch_size=max(args.batch_size, 1), stats=stats
+    )
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")  # noqa: SIM115
+    with output:
+        for line in lines:
+            output.write(line + "\n")
+
+    print(
+        f"{stats.trades} trades, {stats.errors} errors in {stats.seconds:.2f}s: "
+        f"{stats.per_second:.0f} trades/s, {stats.per_core:.0f} trades/s per core ({stats.workers} workers)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,33 @@
 """Run the trade bot."""
 
 import atexit
-import gc
 import logging
 import os
 import signal
 import sys
 import time
+from collections.abc import Callable
 
-from schedule import every, repeat, run_pending
+from schedule import every, idle_seconds, run_pending
 
+from thetagang_notifications.aggregates import PerformanceAggregates
+from thetagang_notifications.archive import TradeArchive
 from thetagang_notifications.config import settings
-from thetagang_notifications.notification import get_notifier
+from thetagang_notifications.exceptions import LeaseLostError
+from thetagang_notifications.ingest import IngestServer
+from thetagang_notifications.journal import REDIS_OUTAGE_ERRORS
+from thetagang_notifications.lease import LeaderLease
+from thetagang_notifications.memory import memory_reporter
+from thetagang_notifications.notification import get_notifier, notify_packed
+from thetagang_notifications.open_interest import OpenInterestIndex
+from thetagang_notifications.reload import ConfigReloader
+from thetagang_notifications.scheduler import PollScheduler
+from thetagang_notifications.supervisor import Supervisor, SupervisorLink
+from thetagang_notifications.symbols import symbol_cache
 from thetagang_notifications.trade import get_trade_class
+from thetagang_notifications.trade_index import TradeIndex
 from thetagang_notifications.trade_queue import TradeQueue
+from thetagang_notifications.transport import close_http_client
 
 SKIPPED_USERS = settings.skipped_users
 
@@ -25,8 +39,16 @@ log.info("🚀 Running thetagang trades bot")
 if SKIPPED_USERS:
     log.info("The following users will be skipped: %s", SKIPPED_USERS)
 
+# Reports to the supervisor when it started this process, a no-op otherwise
+supervisor_link = SupervisorLink()
+# Stages new configurations from changed files, applied between cycles
+config_reloader = ConfigReloader()
+
 # 🔧 Create TradeQueue ONCE and reuse to avoid connection leaks
 trade_queue: TradeQueue | None = None
+leader_lease: LeaderLease | None = None
+aggregates: PerformanceAggregates | None = None
+trade_archive: TradeArchive | None = None
 
 
 def get_trade_queue() -> TradeQueue:
@@ -35,16 +57,58 @@ def get_trade_queue() -> TradeQueue:
     if trade_queue is None:
         log.info("📡 Creating TradeQueue with persistent connections")
         trade_queue = TradeQueue()
+        if settings.state_backend == "redis":
+            # Deployments with an embedded state store look symbols up without Redis.
+            symbol_cache.db_conn = trade_queue.db_conn
     return trade_queue
 
 
+def get_leader_lease() -> LeaderLease | None:
+    """Get or create the leader lease when running several replicas."""
+    global leader_lease
+    if settings.lease_enabled and leader_lease is None:
+        leader_lease = LeaderLease(get_trade_queue().db_conn)
+    return leader_lease
+
+
+def get_aggregates(tq: TradeQueue) -> PerformanceAggregates:
+    """Get or create the performance aggregates on the trade queue's connection."""
+    global aggregates
+    if aggregates is None or aggregates.db_conn is not tq.db_conn:
+        pending = aggregates.pending if aggregates is not None else []
+        aggregates = PerformanceAggregates(tq.db_conn)
+        aggregates.pending = pending
+    return aggregates
+
+
+def get_trade_archive() -> TradeArchive:
+    """Get or create the local trade archive."""
+    global trade_archive
+    if trade_archive is None:
+        trade_archive = TradeArchive(settings.archive_dir, settings.archive_batch_size, settings.archive_max_age)
+    return trade_archive
+
+
 def cleanup() -> None:
     """Clean up resources on shutdown."""
-    global trade_queue
+    global trade_queue, leader_lease, aggregates, trade_archive
+    if aggregates is not None and aggregates.pending:
+        log.warning(
+            "⚠️ %s closed trades were never counted in the aggregates, run rebuild_aggregates.py to count them",
+            len(aggregates.pending),
+        )
+    aggregates = None
+    if trade_archive is not None:
+        trade_archive.close()
+        trade_archive = None
+    if leader_lease is not None:
+        leader_lease.release()
+        leader_lease = None
     if trade_queue is not None:
         log.info("🧹 Cleaning up TradeQueue resources")
         trade_queue.close()
         trade_queue = None
+    close_http_client()
 
 
 def signal_handler(signum: int, frame: object) -> None:
@@ -58,30 +122,178 @@ def signal_handler(signum: int, frame: object) -> None:
 atexit.register(cleanup)
 signal.signal(signal.SIGTERM, signal_handler)
 signal.signal(signal.SIGINT, signal_handler)
+if hasattr(signal, "SIGUSR1"):
+    signal.signal(signal.SIGUSR1, memory_reporter.request_toggle)
+if hasattr(signal, "SIGHUP"):
+    signal.signal(signal.SIGHUP, config_reloader.request_reload)
+supervisor_link.install()
+
 
+def run_queue() -> int:
+    """Enqueue the trades which need notifications and return how many were sent."""
+    lease = get_leader_lease()
+    if lease is not None and not lease.is_leader:
+        log.debug("💤 Standing by, another replica holds the leader lease")
+        return 0
 
-@repeat(every(15).seconds)
-def run_queue() -> None:
-    """Enqueue the trades which need notifications."""
     log.info("🔎 Checking for new trades")
     tq = get_trade_queue()
     tq.update_trades()
-    for queued_trade in tq.build_queue():
-        trade_obj = get_notifier(get_trade_class(queued_trade))
-        trade_obj.notify()
+    return notify_trades(tq)
+
+
+def run_pushed(trades: list[dict]) -> int:
+    """Send notifications for trades pushed to the ingest receiver."""
+    lease = get_leader_lease()
+    if lease is not None and not lease.is_leader:
+        log.debug("💤 Dropping %s pushed trades, another replica holds the leader lease", len(trades))
+        return 0
+
+    log.info("📥 Processing %s pushed trades", len(trades))
+    tq = get_trade_queue()
+    tq.latest_trades = trades
+    return notify_trades(tq)
+
+
+def prepare_to_store(queued_trades: list[dict]) -> None:
+    """Look up the symbols for the queued trades, then confirm we still lead.
+
+    Symbols are looked up before any status is written so rendering never waits on
+    them, and the lease is checked last so nothing is stored after another replica
+    took over during a slow fetch or lookup.
+    """
+    symbol_cache.prefetch(x["symbol"] for x in queued_trades)
+    if lease := get_leader_lease():
+        lease.ensure()
+
+
+def notify_trades(tq: TradeQueue) -> int:
+    """Send notifications for the trades in the queue and return how many were sent."""
+    try:
+        queued_trades = tq.build_queue(before_store=prepare_to_store)
+    except (LeaseLostError, *REDIS_OUTAGE_ERRORS) as e:
+        # Without Redis the lease cannot be confirmed, so another replica may be leading.
+        log.warning("⚠️ Skipping cycle: %s", e)
+        return 0
+
+    trades = [get_trade_class(queued_trade) for queued_trade in queued_trades]
+    notifiers = [get_notifier(trade) for trade in trades]
+    if settings.pack_embeds:
+        notify_packed(notifiers)
+    else:
+        for notifier in notifiers:
+            notifier.notify()
     log.info("👍 Done processing trades")
+    update_redis_views(tq, queued_trades, trades)
+    if settings.archive_enabled:
+        get_trade_archive().append(
+            related.data for trade in trades for related in (trade, trade.rolled_from) if related is not None
+        )
+    memory_reporter.report_cycle()
+
+    return len(notifiers)
+
+
+def update_redis_views(tq: TradeQueue, queued_trades: list[dict], trades: list) -> None:
+    """Update the aggregates, open interest and trade indexes, which are skipped while Redis is down."""
+    if tq.redis_down:
+        log.info("⏸️ Skipping the Redis views while Redis is down")
+        if settings.aggregates_enabled:
+            # Closes are counted once Redis is back, so the leaderboards do not miss them.
+            get_aggregates(tq).hold(trades)
+        return
+    try:
+        if settings.aggregates_enabled:
+            get_aggregates(tq).record(trades)
+        if settings.open_interest_enabled:
+            open_interest = OpenInterestIndex(tq.db_conn)
+            open_interest.update(trades)
+            open_interest.prune()
+        if settings.trade_index_enabled:
+            trade_index = TradeIndex(tq.db_conn)
+            trade_index.update(queued_trades)
+            trade_index.prune()
+    except REDIS_OUTAGE_ERRORS as e:
+        log.warning("⚠️ Skipped the Redis views while Redis is down: %s", e)
+
+
+def run_cycle(cycle: Callable[..., int], *args: object) -> int:
+    """Apply any staged configuration, then run a cycle and report it to the supervisor."""
+    config_reloader.apply_pending(trade_queue)
+    supervisor_link.cycle_started()
+    started = time.perf_counter()
+    trade_count = cycle(*args)
+    supervisor_link.cycle_finished(time.perf_counter() - started, trade_count, {"scheduler": poll_scheduler.state()})
+    return trade_count
+
+
+def poll() -> None:
+    """Run a cycle and adapt the poll interval to the market and trade flow."""
+    lease = get_leader_lease()
+    if lease is not None and not lease.is_leader:
+        # Standby cycles say nothing about the trade flow, so they must not back off the interval.
+        log.debug("💤 Standing by, another replica holds the leader lease")
+        return
+    poll_scheduler.record_cycle(run_cycle(run_queue))
+    poll_job.interval = poll_scheduler.next_interval()
+    log.debug("⏱️ Next poll in %.1f seconds", poll_job.interval)
 
-    # 🔧 Force garbage collection to clean up circular refs between Trade/Notification
-    gc.collect()
+
+def handle_takeover() -> None:
+    """Poll right away once the lease renewer took over from another replica."""
+    lease = get_leader_lease()
+    if lease is None or not lease.took_over():
+        return
+
+    # Running the job polls through `run_cycle` and reschedules it on the fresh interval.
+    poll_scheduler.reset()
+    poll_job.run()
+
+
+poll_scheduler = PollScheduler()
+poll_scheduler.restore(supervisor_link.handover.get("scheduler", {}))
+poll_job = every(poll_scheduler.next_interval()).seconds.do(poll)
+if settings.lease_enabled:
+    every(settings.lease_renew_interval).seconds.do(handle_takeover)
 
 
 if __name__ == "__main__":
-    if os.environ.get("DAEMONIZE_TRADE_BOT", False):
+    if settings.supervisor_enabled and not supervisor_link.supervised:
+        log.info("Running bot under a supervisor...")
+        os.environ["DAEMONIZE_TRADE_BOT"] = "1"
+        Supervisor([sys.executable, os.path.abspath(__file__)]).run()
+    elif os.environ.get("DAEMONIZE_TRADE_BOT", False):
         log.info("Running bot as a daemon...")
-        while True:
+        get_trade_queue().prewarm()
+        if lease := get_leader_lease():
+            # Renewing off the main loop keeps the lease alive through slow cycles.
+            lease.start_renewing()
+        if settings.config_reload_enabled:
+            config_reloader.start()
+            atexit.register(config_reloader.stop)
+        ingest_server = IngestServer() if settings.ingest_enabled else None
+        if ingest_server is not None:
+            ingest_server.start()
+            atexit.register(ingest_server.stop)
+
+        # A replacement child polls right away so the handover leaves no gap.
+        if supervisor_link.handover:
+            poll()
+
+        while not supervisor_link.draining:
             run_pending()
-            time.sleep(1)
+            # Sleep exactly until the next job is due, handling pushed trades as they arrive.
+            delay = supervisor_link.sleep_interval(max(idle_seconds() or 0.0, 0.0))
+            if ingest_server is None:
+                time.sleep(delay)
+            elif pushed_trades := ingest_server.wait_for_trades(delay):
+                run_cycle(run_pushed, pushed_trades)
+
+        log.info("♻️ Draining for the supervisor")
+        cleanup()
     else:
         log.info("Running as one-shot process...")
+        if lease := get_leader_lease():
+            lease.acquire()
         run_queue()
         cleanup()
@@ -0,0 +1,255 @@
+"""Running performance aggregates and leaderboards per user and per symbol."""
+
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+
+from redis import Redis
+from redis.cluster import RedisCluster
+
+from thetagang_notifications.config import settings
+from thetagang_notifications.journal import REDIS_OUTAGE_ERRORS
+from thetagang_notifications.trade import Trade
+
+log = logging.getLogger(__name__)
+
+SCOPES = ("user", "symbol")
+METRICS = ("pnl", "trades", "win_rate", "assignment_rate")
+# Commands queued for each scope, name and period in the totals pipeline.
+COMMANDS_PER_GROUP = 6
+# Most closed trades held for the aggregates while Redis is down.
+MAX_PENDING_OUTCOMES = 10_000
+
+
+def trade_periods(closed_at: datetime) -> list[str]:
+    """Return every period a trade closed in: all time, its year and its month."""
+    return ["all", f"{closed_at.year}", f"{closed_at.year}-{closed_at.month:02d}"]
+
+
+@dataclass(frozen=True)
+class TradeOutcome:
+    """The parts of a closed trade that feed the aggregates."""
+
+    guid: str
+    username: str
+    symbol: str
+    closed_at: datetime
+    pnl: float
+    won: bool
+    assigned: bool
+
+    @classmethod
+    def from_trade(cls, trade: Trade) -> "TradeOutcome | None":
+        """Return the outcome of a closed trade, or None while it is still open."""
+        if not trade.is_closed or trade.data.close_date is None:
+            return None
+        return cls(
+            guid=trade.guid,
+            username=trade.username,
+            symbol=trade.symbol.upper(),
+            closed_at=trade.data.close_date,
+            pnl=trade.profit() if trade.is_winner else -trade.profit(),
+            won=trade.is_winner,
+            assigned=trade.is_assigned,
+        )
+
+
+def closed_outcomes(trades: Iterable[Trade]) -> list[TradeOutcome]:
+    """Return the outcome of every closed trade, including the closed side of any roll."""
+    return [
+        outcome
+        for trade in trades
+        for related in (trade, trade.rolled_from)
+        if related is not None and (outcome := TradeOutcome.from_trade(related))
+    ]
+
+
+class PerformanceAggregates:
+    """Keep win rate, P&L and assignment rate for every user and symbol in Redis.
+
+    Each user and symbol gets a hash of running totals per period, and each metric
+    gets a sorted set per scope and period. Recording a batch of trades costs three
+    pipelines no matter how many boards it touches, and a leaderboard page is one
+    `ZRANGE`. Rate leaderboards only list names with at least `min_trades` closed
+    trades, so one lucky trade does not top the board.
+
+    A marker per trade GUID records that its close was counted, so a replayed close
+    or a trade that closes again is never counted twice.
+    """
+
+    def __init__(
+        self,
+        db_conn: Redis | RedisCluster,
+        prefix: str | None = None,
+        min_trades: int | None = None,
+        counted_ttl: int | None = None,
+    ) -> None:
+        """Constructor for PerformanceAggregates."""
+        self.db_conn = db_conn
+        self.prefix = prefix or settings.aggregates_prefix
+        self.min_trades = settings.aggregates_min_trades if min_trades is None else min_trades
+        self.counted_ttl = settings.aggregates_counted_ttl if counted_ttl is None else counted_ttl
+        # Closed trades waiting for Redis to come back, oldest first
+        self.pending: list[TradeOutcome] = []
+
+    def stats_key(self, scope: str, name: str, period: str) -> str:
+        """Return the key of the running totals for a user or symbol."""
+        return f"{self.prefix}:{scope}:{name}:{period}"
+
+    def board_key(self, scope: str, metric: str, period: str) -> str:
+        """Return the key of a leaderboard."""
+        return f"{self.prefix}:board:{scope}:{metric}:{period}"
+
+    def counted_key(self, guid: str) -> str:
+        """Return the key that marks a closed trade as counted."""
+        return f"{self.prefix}:counted:{guid}"
+
+    def hold(self, trades: Iterable[Trade]) -> int:
+        """
+        Keep the closed trades from a cycle to record once Redis is back.
+
+        Returns:
+            Number of closed trades held
+        """
+        outcomes = closed_outcomes(trades)
+        self._hold(outcomes)
+        return len(outcomes)
+
+    def record(self, trades: Iterable[Trade]) -> int:
+        """
+        Add closed trades to the aggregates, including the closed side of any roll.
+
+        Trades held while Redis was down are recorded first, and trades already
+        counted are skipped. If Redis goes away, the trades are held for the next
+        call and the error is raised.
+
+        Returns:
+            Number of closed trades newly recorded
+        """
+        outcomes = [*self.pending, *closed_outcomes(trades)]
+        self.pending = []
+        if not outcomes:
+            return 0
+        try:
+            return self._record(outcomes)
+        except REDIS_OUTAGE_ERRORS:
+            self._hold(outcomes)
+            raise
+
+    def _record(self, outcomes: list[TradeOutcome]) -> int:
+        """Count the outcomes of trades not counted before and update the boards."""
+        unique = list({x.guid: x for x in outcomes}.values())
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for outcome in unique:
+                pipe.exists(self.counted_key(outcome.guid))
+            counted = pipe.execute()
+        fresh = [outcome for outcome, seen in zip(unique, counted, strict=True) if not seen]
+        if not fresh:
+            return 0
+
+        groups = [
+            (scope, name, period, outcome)
+            for outcome in fresh
+            for scope, name in (("user", outcome.username), ("symbol", outcome.symbol))
+            for period in trade_periods(outcome.closed_at)
+        ]
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for scope, name, period, outcome in groups:
+                key = self.stats_key(scope, name, period)
+                pipe.hincrby(key, "trades", 1)
+                pipe.hincrby(key, "wins", int(outcome.won))
+                pipe.hincrby(key, "assigned", int(outcome.assigned))
+                pipe.hincrbyfloat(key, "pnl", outcome.pnl)
+                pipe.zincrby(self.board_key(scope, "pnl", period), outcome.pnl, name)
+                pipe.zincrby(self.board_key(scope, "trades", period), 1, name)
+            # The markers go after the totals, so the results of each group keep a fixed stride.
+            for outcome in fresh:
+                pipe.set(self.counted_key(outcome.guid), 1, ex=self.counted_ttl)
+            results = pipe.execute()
+
+        # The increments return the new totals, so the rates need no extra reads.
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for index, (scope, name, period, _) in enumerate(groups):
+                trade_count, wins, assigned = results[index * COMMANDS_PER_GROUP : index * COMMANDS_PER_GROUP + 3]
+                for metric, value in (("win_rate", wins), ("assignment_rate", assigned)):
+                    if trade_count >= self.min_trades:
+                        pipe.zadd(self.board_key(scope, metric, period), {name: value / trade_count})
+                    else:
+                        pipe.zrem(self.board_key(scope, metric, period), name)
+            pipe.execute()
+
+        log.info("🏆 Recorded %s closed trades in the aggregates", len(fresh))
+        return len(fresh)
+
+    def leaderboard(
+        self, scope: str, metric: str, period: str = "all", limit: int = 10, offset: int = 0
+    ) -> list[tuple[str, float]]:
+        """Return a page of a leaderboard, best first."""
+        if scope not in SCOPES or metric not in METRICS:
+            raise ValueError(f"Unknown leaderboard: {scope} {metric}")
+        key = self.board_key(scope, metric, period)
+        return [(name, score) for name, score in self.db_conn.zrevrange(key, offset, offset + limit - 1, withscores=True)]
+
+    def stats(self, scope: str, name: str, period: str = "all") -> dict[str, float]:
+        """Return the totals and rates for one user or symbol."""
+        raw = self.db_conn.hgetall(self.stats_key(scope, name, period))
+        trade_count = int(raw.get("trades", 0))
+        wins = int(raw.get("wins", 0))
+        assigned = int(raw.get("assigned", 0))
+        return {
+            "trades": trade_count,
+            "wins": wins,
+            "assigned": assigned,
+            "pnl": float(raw.get("pnl", 0.0)),
+            "win_rate": wins / trade_count if trade_count else 0.0,
+            "assignment_rate": assigned / trade_count if trade_count else 0.0,
+        }
+
+    def clear(self) -> int:
+        """Delete every aggregate key and return how many were deleted."""
+        deleted = 0
+        batch = []
+        for key in self.db_conn.scan_iter(match=f"{self.prefix}:*", count=1000):
+            batch.append(key)
+            if len(batch) >= 1000:
+                deleted += self._delete(batch)
+                batch = []
+        return deleted + self._delete(batch)
+
+    def rebuild(self, trades: Iterable[Trade], batch_size: int = 500) -> int:
+        """
+        Recompute every aggregate from a full history of trades.
+
+        Returns:
+            Number of closed trades recorded
+        """
+        self.clear()
+        self.pending = []
+        recorded = 0
+        batch: list[Trade] = []
+        for trade in trades:
+            batch.append(trade)
+            if len(batch) >= batch_size:
+                recorded += self.record(batch)
+                batch = []
+        return recorded + self.record(batch)
+
+    def _hold(self, outcomes: list[TradeOutcome]) -> None:
+        """Keep outcomes for the next record, dropping the oldest past the limit."""
+        self.pending.extend(outcomes)
+        overflow = len(self.pending) - MAX_PENDING_OUTCOMES
+        if overflow > 0:
+            del self.pending[:overflow]
+            log.warning(
+                "⚠️ Dropped %s closed trades held for the aggregates, run rebuild_aggregates.py to count them", overflow
+            )
+
+    def _delete(self, keys: list[str]) -> int:
+        """Delete keys one at a time in a pipeline, which also works across cluster slots."""
+        if not keys:
+            return 0
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.delete(key)
+            return sum(pipe.execute())
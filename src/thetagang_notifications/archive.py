@@ -0,0 +1,284 @@
+"""Append-only columnar archive of every processed trade."""
+
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from thetagang_notifications.models import TradeData
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"TGA1"
+SEGMENT_SUFFIX = ".tga"
+# Footer length and trailing magic at the end of every segment.
+TRAILER = struct.Struct("<I4s")
+COMPRESSION_LEVEL = 6
+
+# Array type codes for the numeric column kinds.
+TYPECODES = {"float": "d", "int": "q", "bool": "b"}
+
+
+@dataclass(frozen=True)
+class Column:
+    """A column of the archive and how to pull it out of a trade."""
+
+    name: str
+    kind: str
+    getter: Callable[[TradeData], object]
+    nullable: bool = False
+
+
+def _timestamp(data: TradeData) -> float:
+    """Return the close time as a Unix timestamp, or NaN while open."""
+    return data.close_date.timestamp() if data.close_date else math.nan
+
+
+def _float(name: str) -> Callable[[TradeData], float]:
+    """Return a getter for an optional float field that maps None to NaN."""
+
+    def getter(data: TradeData) -> float:
+        value = getattr(data, name)
+        return math.nan if value is None else float(value)
+
+    return getter
+
+
+COLUMNS = (
+    Column("guid", "str", lambda x: x.guid),
+    Column("symbol", "str", lambda x: x.symbol),
+    Column("type", "str", lambda x: x.type),
+    Column("username", "str", lambda x: x.user.username),
+    Column("status", "str", lambda x: x.status),
+    Column("expiry_date", "str", lambda x: x.expiry_date, nullable=True),
+    Column("quantity", "int", lambda x: x.quantity),
+    Column("price_filled", "float", lambda x: x.price_filled),
+    Column("price_closed", "float", _float("price_closed")),
+    Column("profit_loss", "float", _float("profit_loss_raw")),
+    Column("short_put", "float", _float("short_put")),
+    Column("long_put", "float", _float("long_put")),
+    Column("short_call", "float", _float("short_call")),
+    Column("long_call", "float", _float("long_call")),
+    Column("long_call2", "float", _float("long_call2")),
+    Column("close_date", "float", _timestamp),
+    Column("win", "bool", lambda x: x.win),
+    Column("assigned", "bool", lambda x: x.assigned),
+    Column("note", "str", lambda x: x.note),
+    Column("closing_note", "str", lambda x: x.closing_note),
+)
+COLUMNS_BY_NAME = {x.name: x for x in COLUMNS}
+
+
+def encode_column(column: Column, values: list) -> bytes:
+    """Encode one column of a batch into a compressed chunk.
+
+    Text is stored as row offsets followed by the UTF-8 bytes. Nullable text also
+    gets a null mask, one byte per row, between the two so None and "" stay apart.
+    """
+    if column.kind == "str":
+        encoded = [("" if x is None else str(x)).encode() for x in values]
+        offsets = array("q", [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        nulls = bytes(x is None for x in values) if column.nullable else b""
+        raw = offsets.tobytes() + nulls + b"".join(encoded)
+    else:
+        raw = array(TYPECODES[column.kind], values).tobytes()
+    return zlib.compress(raw, COMPRESSION_LEVEL)
+
+
+def decode_column(column: Column, chunk: bytes, rows: int) -> array | list:
+    """Decode a compressed chunk back into an array or a list of strings."""
+    raw = zlib.decompress(chunk)
+    if column.kind != "str":
+        values = array(TYPECODES[column.kind])
+        values.frombytes(raw)
+        return values
+
+    offsets = array("q")
+    blob_start = (rows + 1) * offsets.itemsize
+    offsets.frombytes(raw[:blob_start])
+    nulls = raw[blob_start : blob_start + rows] if column.nullable else b""
+    blob = memoryview(raw)[blob_start + len(nulls) :]
+    strings = [bytes(blob[offsets[i] : offsets[i + 1]]).decode() for i in range(rows)]
+    if column.nullable:
+        return [None if null else x for x, null in zip(strings, nulls, strict=True)]
+    return strings
+
+
+def write_segment(path: Path, records: list[TradeData]) -> None:
+    """Write a batch of trades to a new segment file.
+
+    The segment is the magic bytes, one compressed chunk per column, a JSON footer
+    with the offset of every chunk, and a trailer with the footer length. It is
+    written to a temporary file first so readers never see half a segment.
+    """
+    footer: dict = {"rows": len(records), "columns": {}}
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as segment:
+        segment.write(MAGIC)
+        for column in COLUMNS:
+            chunk = encode_column(column, [column.getter(x) for x in records])
+            footer["columns"][column.name] = {"kind": column.kind, "offset": segment.tell(), "length": len(chunk)}
+            segment.write(chunk)
+        encoded_footer = json.dumps(footer, separators=(",", ":")).encode()
+        segment.write(encoded_footer)
+        segment.write(TRAILER.pack(len(encoded_footer), MAGIC))
+        segment.flush()
+        os.fsync(segment.fileno())
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """A memory-mapped segment that decompresses only the columns asked for."""
+
+    def __init__(self, path: Path) -> None:
+        """Constructor for Segment."""
+        self.path = path
+        with open(path, "rb") as segment:
+            self._map = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+        footer_length, magic = TRAILER.unpack(self._map[-TRAILER.size :])
+        if magic != MAGIC or self._map[: len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a trade archive segment")
+        footer_start = len(self._map) - TRAILER.size - footer_length
+        footer = json.loads(self._map[footer_start : footer_start + footer_length])
+        self.rows: int = footer["rows"]
+        self.chunks: dict[str, dict] = footer["columns"]
+
+    def read(self, name: str) -> array | list:
+        """Decode one column of the segment."""
+        chunk = self.chunks[name]
+        return decode_column(COLUMNS_BY_NAME[name], self._map[chunk["offset"] : chunk["offset"] + chunk["length"]], self.rows)
+
+    def close(self) -> None:
+        """Unmap the segment."""
+        self._map.close()
+
+
+class ArchiveReader:
+    """Read columns across every segment of an archive."""
+
+    def __init__(self, directory: str | Path) -> None:
+        """Constructor for ArchiveReader."""
+        self.directory = Path(directory)
+        self.segments = [Segment(x) for x in sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))]
+
+    def __len__(self) -> int:
+        """Return the number of archived trades."""
+        return sum(x.rows for x in self.segments)
+
+    def __enter__(self) -> "ArchiveReader":
+        """Use the reader as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Unmap every segment."""
+        self.close()
+
+    def read(self, columns: Iterable[str]) -> dict[str, array | list]:
+        """
+        Read whole columns from every segment.
+
+        Numeric columns come back as arrays (NaN marks a missing float) ready for
+        vectorized math, and text columns as lists of strings.
+
+        Returns:
+            The requested columns keyed by name
+        """
+        names = list(columns)
+        unknown = [x for x in names if x not in COLUMNS_BY_NAME]
+        if unknown:
+            raise KeyError(f"Unknown archive columns: {', '.join(unknown)}")
+
+        result: dict[str, array | list] = {}
+        for name in names:
+            column = COLUMNS_BY_NAME[name]
+            combined: array | list = [] if column.kind == "str" else array(TYPECODES[column.kind])
+            for segment in self.segments:
+                combined.extend(segment.read(name))
+            result[name] = combined
+        return result
+
+    def rows(self, columns: Iterable[str]) -> Iterator[dict]:
+        """Yield the archived trades one at a time with only the requested columns."""
+        data = self.read(columns)
+        for index in range(len(self)):
+            yield {name: values[index] for name, values in data.items()}
+
+    def close(self) -> None:
+        """Unmap every segment."""
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+
+class TradeArchive:
+    """Buffer processed trades and write them to the archive in batches.
+
+    Trades are written once `batch_size` of them are waiting or the oldest has
+    waited `max_age` seconds, whichever comes first, so the archive gets a few
+    large segments instead of one tiny file per cycle. A trade is archived each
+    time it is processed, so one that opens and later closes has a row for each
+    status. Call `close` on shutdown to write whatever is still buffered.
+    """
+
+    def __init__(self, directory: str | Path, batch_size: int = 1000, max_age: float = 3600.0) -> None:
+        """Constructor for TradeArchive."""
+        self.directory = Path(directory)
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.pending: list[TradeData] = []
+        self.oldest: float | None = None
+        self.sequence = 0
+        self._lock = threading.Lock()
+
+    def append(self, records: Iterable[TradeData]) -> int:
+        """
+        Buffer trades and write a segment when the batch is full or old enough.
+
+        Returns:
+            Number of trades written to disk by this call
+        """
+        with self._lock:
+            for record in records:
+                if self.oldest is None:
+                    self.oldest = time.monotonic()
+                self.pending.append(record)
+            if len(self.pending) >= self.batch_size or (
+                self.oldest is not None and time.monotonic() - self.oldest >= self.max_age
+            ):
+                return self._flush()
+            return 0
+
+    def flush(self) -> int:
+        """Write every buffered trade now and return how many were written."""
+        with self._lock:
+            return self._flush()
+
+    def close(self) -> None:
+        """Write any buffered trades before shutting down."""
+        self.flush()
+
+    def _flush(self) -> int:
+        """Write the buffer as one segment. The lock must be held."""
+        if not self.pending:
+            return 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sequence += 1
+        path = self.directory / f"trades-{time.time_ns()}-{os.getpid()}-{self.sequence:06d}{SEGMENT_SUFFIX}"
+        write_segment(path, self.pending)
+        written = len(self.pending)
+        log.info("🗄️ Archived %s trades to %s", written, path.name)
+        self.pending = []
+        self.oldest = None
+        return written
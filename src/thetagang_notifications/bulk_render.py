@@ -0,0 +1,156 @@
+"""Render many trades at once across a pool of worker processes."""
+
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from thetagang_notifications.notification import get_notifier
+from thetagang_notifications.trade import get_trade_class
+
+log = logging.getLogger(__name__)
+
+# Trades per task sent to a worker. Bigger batches spread the IPC cost over more trades.
+DEFAULT_BATCH_SIZE = 256
+
+
+@dataclass
+class RenderStats:
+    """Throughput of a bulk render."""
+
+    trades: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    workers: int = 1
+
+    @property
+    def per_second(self) -> float:
+        """Return the trades rendered per second."""
+        return self.trades / self.seconds if self.seconds else 0.0
+
+    @property
+    def per_core(self) -> float:
+        """Return the trades rendered per second by each worker."""
+        return self.per_second / self.workers
+
+
+def read_trade_lines(paths: list[str], cache_dir: Path | None = None) -> Iterator[str]:
+    """Read trades from JSON lines files, stdin and the make_notification.py cache."""
+    for path in paths:
+        if path == "-":
+            # Leave stdin open for whoever reads it next.
+            yield from sys.stdin
+            continue
+        with open(path, encoding="utf-8") as lines:
+            yield from lines
+    if cache_dir is not None:
+        for cached in sorted(cache_dir.glob("*.json")):
+            yield cached.read_text(encoding="utf-8")
+
+
+def parse_trade_line(line: str) -> dict:
+    """Parse a trade from a JSON line, accepting raw API responses as well as bare trades."""
+    trade = json.loads(line)
+    return trade.get("data", trade)
+
+
+def render_record(line: str) -> dict:
+    """Render one trade from a JSON line into a record with its embed."""
+    trade = parse_trade_line(line)
+    embed = get_notifier(get_trade_class(trade)).generate_embeds()
+    return {"guid": trade["guid"], "type": trade["type"], "embed": vars(embed)}
+
+
+def render_batch(lines: list[str]) -> tuple[list[str], int]:
+    """
+    Render a batch of JSON lines in a worker.
+
+    Trades that fail validation or rendering come back as a record with an error,
+    so the output always lines up with the input.
+
+    Returns:
+        Compact JSON lines without newlines, and the number of errors
+    """
+    rendered = []
+    errors = 0
+    for line in lines:
+        try:
+            record = render_record(line)
+        except (ValueError, KeyError, TypeError, AttributeError, ValidationError) as e:
+            errors += 1
+            record = {"error": f"{type(e).__name__}: {e}", "input": line[:200]}
+        rendered.append(json.dumps(record, separators=(",", ":")))
+    return rendered, errors
+
+
+def init_worker() -> None:
+    """Keep the per-trade log lines out of bulk renders."""
+    logging.getLogger("thetagang_notifications").setLevel(logging.WARNING)
+
+
+def batched(lines: Iterable[str], batch_size: int) -> Iterator[list[str]]:
+    """Group input lines into batches, skipping blank lines."""
+    lines = (x for x in lines if x.strip())
+    while batch := list(islice(lines, batch_size)):
+        yield batch
+
+
+def render_lines(
+    lines: Iterable[str],
+    workers: int | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    stats: RenderStats | None = None,
+) -> Iterator[str]:
+    """
+    Render JSON lines across a process pool, yielding results in input order.
+
+    The parent only batches raw lines and writes results, so parsing, validation,
+    `Trade` construction and embed generation all happen in the workers. At most
+    two batches per worker are in flight, which keeps memory flat for any input
+    size.
+
+    Returns:
+        Iterator of rendered JSON lines
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = stats if stats is not None else RenderStats()
+    stats.workers = workers
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        pending: deque[Future[tuple[list[str], int]]] = deque()
+        batches = batched(lines, batch_size)
+        for batch in batches:
+            pending.append(pool.submit(render_batch, batch))
+            if len(pending) >= 2 * workers:
+                yield from _collect(pending.popleft().result(), stats)
+        while pending:
+            yield from _collect(pending.popleft().result(), stats)
+
+    stats.seconds = time.perf_counter() - started
+    log.info(
+        "🖨️ Rendered %s trades (%s errors) in %.1fs: %.0f trades/s, %.0f trades/s per core on %s workers",
+        stats.trades,
+        stats.errors,
+        stats.seconds,
+        stats.per_second,
+        stats.per_core,
+        workers,
+    )
+
+
+def _collect(result: tuple[list[str], int], stats: RenderStats) -> list[str]:
+    """Count a finished batch and return its lines."""
+    rendered, errors = result
+    stats.trades += len(rendered)
+    stats.errors += errors
+    return rendered
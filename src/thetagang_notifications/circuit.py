@@ -0,0 +1,107 @@
+"""Circuit breakers for flaky upstream services."""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+log = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Every breaker by name, so operators can see them all in one place.
+breakers: dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitBreaker:
+    """Stop calling a service that keeps failing.
+
+    After `failure_threshold` failures in a row the breaker opens and callers skip
+    the service. Once `reset_timeout` passes, one probe is let through while the
+    breaker is half-open. A successful probe closes the breaker, and a failed one
+    opens it again with the timeout doubled, up to `max_reset_timeout`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        max_reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+        register: bool = True,
+    ) -> None:
+        """Constructor for CircuitBreaker.
+
+        Pass `register=False` for breakers that are reported somewhere else, so
+        they are not listed twice.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.clock = clock
+
+        self.state = CLOSED
+        self.failures = 0
+        self.current_timeout = reset_timeout
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+        if register:
+            breakers[name] = self
+
+    def allow_request(self) -> bool:
+        """Check if a call may go through right now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.current_timeout:
+                # Let exactly one probe through.
+                self._transition(HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Record a successful call."""
+        with self._lock:
+            self.failures = 0
+            self.current_timeout = self.reset_timeout
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        """Record a failed call."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.current_timeout = min(self.current_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def status(self) -> dict:
+        """Return the breaker state for monitoring."""
+        with self._lock:
+            retry_in = max(self.opened_at + self.current_timeout - self.clock(), 0.0) if self.state == OPEN else 0.0
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": round(retry_in, 1),
+            }
+
+    def _open(self) -> None:
+        """Open the breaker and start the reset timer."""
+        self.opened_at = self.clock()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        """Move to a new state and log it."""
+        log.warning("🔌 Circuit breaker %s: %s → %s", self.name, self.state, state)
+        self.state = state
+
+
+def breaker_status() -> dict[str, dict]:
+    """Return the state of every circuit breaker."""
+    return {name: breaker.status() for name, breaker in breakers.items()}
@@ -1,8 +1,14 @@
 """Configuration for the project using pydantic-settings."""
 
+from datetime import date, time
+from typing import Literal
+
 from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Features kept in Redis, off by default when the trade statuses are not.
+REDIS_FEATURES = ("aggregates_enabled", "open_interest_enabled", "trade_index_enabled")
+
 
 class Settings(BaseSettings):
     """Application settings using pydantic-settings."""
@@ -12,8 +18,75 @@ class Settings(BaseSettings):
     # Redis connection details
     redis_host: str = Field(default="localhost", description="Redis host")
     redis_port: int = Field(default=6379, description="Redis port")
+    redis_mode: Literal["single", "cluster"] = Field(default="single", description="Single Redis node or Redis Cluster")
+    redis_hash_tag_buckets: int = Field(
+        default=1,
+        ge=1,
+        description=(
+            "Hash tag buckets for dedupe keys in cluster mode (1 keeps every key on one slot). "
+            "After a change the old keys are still read for a week."
+        ),
+    )
+    redis_socket_timeout: float = Field(default=5.0, gt=0, description="Seconds to wait on a Redis connection or reply")
+
+    # Where the trade statuses used for dedupe are kept
+    state_backend: Literal["redis", "sqlite", "lmdb"] = Field(default="redis", description="Store for trade statuses")
+    state_path: str = Field(default="trade_state.db", description="SQLite file or LMDB directory for trade statuses")
+    state_lmdb_map_size: int = Field(default=1 << 30, gt=0, description="Largest size in bytes of the LMDB map")
+
+    # Local journal of trade statuses while Redis is down
+    journal_path: str = Field(default="trade_statuses.journal", description="File for statuses decided during an outage")
+    journal_replay_batch_size: int = Field(default=500, gt=0, description="Statuses per pipeline when replaying")
+    redis_retry_interval: float = Field(default=10.0, gt=0, description="Seconds before probing Redis after a failure")
+    redis_max_retry_interval: float = Field(default=120.0, gt=0, description="Longest wait between failed Redis probes")
+
+    # Leader lease so that several replicas can run as hot standbys
+    lease_enabled: bool = Field(default=False, description="Only poll and notify while holding the leader lease")
+    lease_key: str = Field(default="thetagang:leader", description="Redis key for the leader lease")
+    lease_ttl: float = Field(default=5.0, description="Seconds before an unrenewed lease expires")
+    lease_renew_interval: float = Field(default=1.0, description="Seconds between lease renewals")
+
+    # Adaptive polling schedule for the patrons API
+    poll_min_interval: float = Field(default=5.0, gt=0, description="Shortest seconds between polls")
+    poll_max_interval: float = Field(default=300.0, gt=0, description="Longest seconds between polls")
+    poll_market_interval: float = Field(default=15.0, gt=0, description="Base seconds between polls during market hours")
+    poll_closed_interval: float = Field(default=60.0, gt=0, description="Base seconds between polls outside market hours")
+    poll_idle_backoff: float = Field(default=1.5, ge=1, description="Interval multiplier for each poll that finds no trades")
+    market_timezone: str = Field(default="America/New_York", description="Timezone of the market hours")
+    market_open: time = Field(default=time(9, 30), description="Market open time")
+    market_close: time = Field(default=time(16, 0), description="Market close time")
+    market_holidays: str = Field(default="", description="Comma-separated market holidays (YYYY-MM-DD)")
+
+    # Optional HTTP receiver for trades pushed to the bot
+    ingest_enabled: bool = Field(default=False, description="Accept trade events pushed over HTTP")
+    ingest_host: str = Field(default="0.0.0.0", description="Address for the push receiver")
+    ingest_port: int = Field(default=8080, description="Port for the push receiver")
+    ingest_secret: str = Field(default="", description="Shared secret for push signatures")
+    ingest_reconcile_interval: float = Field(
+        default=300.0, gt=0, description="Seconds between reconciliation polls while push is enabled"
+    )
+
+    # Shared HTTP transport for the thetagang.com API
+    http2: bool = Field(default=False, description="Use HTTP/2 when the h2 package is installed")
+    http_connect_timeout: float = Field(default=5.0, gt=0, description="Seconds to wait for a connection")
+    http_read_timeout: float = Field(default=15.0, gt=0, description="Seconds to wait for response data")
+    http_max_connections: int = Field(default=10, ge=1, description="Maximum open connections")
+    http_keepalive_expiry: float = Field(default=60.0, ge=0, description="Seconds to keep idle connections open")
+
+    # Circuit breaker, retries and hedging for the patrons feed
+    feed_failure_threshold: int = Field(default=3, ge=1, description="Failed fetches in a row that open the breaker")
+    feed_reset_timeout: float = Field(default=30.0, gt=0, description="Seconds before an open breaker sends a probe")
+    feed_max_reset_timeout: float = Field(default=300.0, gt=0, description="Longest wait between failed probes")
+    feed_retries: int = Field(default=2, ge=0, description="Retries for a failed fetch within one cycle")
+    feed_backoff_base: float = Field(default=0.5, ge=0, description="Base seconds for retry backoff")
+    feed_backoff_cap: float = Field(default=5.0, ge=0, description="Longest seconds between retries")
+    feed_deadline: float = Field(default=20.0, gt=0, description="Longest seconds one fetch may spend across retries")
+    feed_hedge_percentile: float = Field(
+        default=0.95, ge=0, le=1, description="Latency percentile that triggers a hedged request (0 disables)"
+    )
 
     # thetagang.com URLs
+    api_base_url: str = Field(default="https://api3.thetagang.com", description="thetagang.com API base URL")
     trades_json_url: str = Field(default="https://api3.thetagang.com/trades", description="Trades API URL")
 
     # Spec file with trade properties
@@ -28,6 +101,10 @@ class Settings(BaseSettings):
         default=None,
         description="Comma-separated Discord webhook URLs for trades"
     )
+    # Routes send trades to other webhooks; trades no route wants go to the URLs above
+    webhook_routes_file: str = Field(
+        default="", description="YAML file routing trades to webhooks by user, symbol, sentiment or status"
+    )
 
     # API key for secret thetagang.com API endpoints
     trades_api_key: str = Field(default="api_key_missing", description="ThetaGang API key")
@@ -55,18 +132,113 @@ class Settings(BaseSettings):
     # Wide and transparent PNG to make the notifications the same width each time
     transparent_png: str = Field(default="https://major.io/transparent.png", description="Transparent PNG URL")
     
+    # Where rendered notifications go: Discord, a JSON lines file, or memory
+    notification_sink: Literal["discord", "jsonl", "memory"] = Field(default="discord", description="Notification sink")
+    notification_sink_path: str = Field(default="notifications.jsonl", description="File for the jsonl sink")
+
+    # Health tracking and quarantine for each Discord webhook
+    webhook_timeout: float = Field(default=10.0, gt=0, description="Seconds to wait for a webhook to respond")
+    webhook_failure_threshold: int = Field(default=3, ge=1, description="Failures in a row that quarantine a webhook")
+    webhook_reset_timeout: float = Field(default=60.0, gt=0, description="Seconds before probing a quarantined webhook")
+    webhook_max_reset_timeout: float = Field(default=900.0, gt=0, description="Longest wait between failed probes")
+    webhook_health_window: int = Field(default=50, ge=1, description="Deliveries kept for error rate and latency")
+
+    # Per-symbol logo and company name cache
+    symbol_cache_size: int = Field(default=2048, ge=1, description="Symbols kept in the in-memory cache")
+    symbol_cache_ttl: int = Field(default=7 * 24 * 3600, ge=1, description="Seconds to keep symbol metadata in Redis")
+    symbol_retry_ttl: int = Field(
+        default=3600, ge=1, description="Seconds before looking up a symbol again when its logo or name was not found"
+    )
+    symbol_prefetch_concurrency: int = Field(default=8, ge=1, description="Concurrent symbol lookups")
+    symbol_name_url: str = Field(
+        default="https://query1.finance.yahoo.com/v1/finance/search",
+        description="Search API used to look up company names",
+    )
+    symbol_fallback_logo: str = Field(
+        default="https://images.emojiterra.com/google/noto-emoji/v2.034/512px/1f4c8.png",
+        description="Thumbnail for symbols without a logo",
+    )
+
     # Discord username
     discord_username: str = Field(default="🤠 🤖", description="Discord bot username")
+
+    # Collapse rolls and trades opened and closed within one cycle into one notification
+    collapse_related_trades: bool = Field(default=True, description="Combine rolled and same-cycle trades")
+    roll_window: float = Field(default=300.0, gt=0, description="Longest seconds from a close to the open that rolls it")
+
+    # Pack the embeds for a cycle into as few webhook messages as Discord allows
+    pack_embeds: bool = Field(default=False, description="Send multiple trade embeds per webhook message")
     
+    # Per-cycle memory report from tracemalloc (also toggled at runtime with SIGUSR1)
+    memory_report: bool = Field(default=False, description="Log memory growth by module after every cycle")
+    memory_report_top: int = Field(default=10, ge=1, description="Modules listed in each memory report")
+
+    # Supervisor that recycles the daemon before it grows too large or slow
+    supervisor_enabled: bool = Field(default=False, description="Run the daemon in a child process that gets recycled")
+    supervisor_max_rss_mb: float = Field(default=256.0, ge=0, description="Child RSS that triggers a recycle (0 disables)")
+    supervisor_max_cycle_seconds: float = Field(
+        default=120.0, ge=0, description="Cycle duration that triggers a recycle (0 disables)"
+    )
+    supervisor_drain_timeout: float = Field(default=60.0, gt=0, description="Seconds to let a child finish its cycle")
+    supervisor_check_interval: float = Field(default=5.0, gt=0, description="Seconds between child health checks")
+
+    # Reload settings, trade specs and rule files without a restart
+    config_reload_enabled: bool = Field(default=True, description="Watch the configuration files and reload on change")
+    config_reload_interval: float = Field(default=5.0, gt=0, description="Seconds between checks for changed files")
+
+    # Running leaderboards per user and per symbol
+    aggregates_enabled: bool = Field(default=True, description="Update the performance aggregates for closed trades")
+    aggregates_prefix: str = Field(default="agg", description="Prefix for the aggregate keys in Redis")
+    aggregates_min_trades: int = Field(
+        default=5, ge=1, description="Closed trades needed before a name appears on the rate leaderboards"
+    )
+    aggregates_counted_ttl: int = Field(
+        default=90 * 86400, gt=0, description="Seconds to remember that a closed trade was counted"
+    )
+
+    # Open positions by symbol and expiry
+    open_interest_enabled: bool = Field(default=True, description="Keep the open interest index up to date")
+    open_interest_prefix: str = Field(default="oi", description="Prefix for the open interest keys in Redis")
+
+    # Lookups of trades by user, symbol, type and day
+    trade_index_enabled: bool = Field(default=True, description="Keep the secondary trade indexes up to date")
+    trade_index_prefix: str = Field(default="idx", description="Prefix for the trade index keys in Redis")
+    trade_index_max_age: float = Field(
+        default=180 * 86400, gt=0, description="Seconds a trade stays in the indexes after its last update"
+    )
+    trade_index_max_trades: int = Field(
+        default=100_000, ge=1, description="Most trades kept in the indexes, the oldest are dropped first"
+    )
+
+    # Local columnar archive of every processed trade
+    archive_enabled: bool = Field(default=False, description="Archive every processed trade on local disk")
+    archive_dir: str = Field(default="archive", description="Directory for the trade archive segments")
+    archive_batch_size: int = Field(default=1000, gt=0, description="Trades per archive segment")
+    archive_max_age: float = Field(
+        default=3600.0, gt=0, description="Seconds a buffered trade may wait before its segment is written"
+    )
+
     # Some users are patrons but do not regularly participate in Discord
     # We skip their trades (comma-separated list)
     skipped_users: str = Field(default="", description="Comma-separated list of users to skip")
+    allowed_roles: str = Field(default="patron,joonie", description="Comma-separated list of user roles to notify")
+    trade_filters_file: str = Field(default="", description="YAML file with extra rules for which trades to notify")
     
     @property
     def skipped_users_list(self) -> list[str]:
         """Return skipped users as a list."""
         return [user.strip() for user in self.skipped_users.split(",") if user.strip()]
 
+    @property
+    def allowed_roles_list(self) -> list[str]:
+        """Return allowed roles as a list."""
+        return [role.strip() for role in self.allowed_roles.split(",") if role.strip()]
+
+    @property
+    def market_holidays_list(self) -> list[date]:
+        """Return market holidays as a list of dates."""
+        return [date.fromisoformat(day.strip()) for day in self.market_holidays.split(",") if day.strip()]
+
     @model_validator(mode="after")
     def validate_webhook_config(self) -> "Settings":
         """
@@ -94,6 +266,42 @@ class Settings(BaseSettings):
                 raise ValueError(msg)
         return self
 
+    @model_validator(mode="after")
+    def validate_lease_timing(self) -> "Settings":
+        """
+        ⏱️ Validate that the leader lease is renewed before it expires.
+
+        Returns:
+            Self with validated lease timing
+
+        Raises:
+            ValueError: If the lease would expire between two renewals
+        """
+        if self.lease_renew_interval >= self.lease_ttl:
+            msg = (
+                f"LEASE_RENEW_INTERVAL ({self.lease_renew_interval}s) must be shorter than "
+                f"LEASE_TTL ({self.lease_ttl}s), or the lease expires between renewals"
+            )
+            raise ValueError(msg)
+        return self
+
+    @model_validator(mode="after")
+    def disable_redis_features(self) -> "Settings":
+        """
+        🔌 Turn off the Redis-backed features for deployments without Redis.
+
+        The aggregates, open interest and trade indexes live in Redis, so with an
+        embedded state store they stay off unless they were enabled explicitly.
+
+        Returns:
+            Self with the Redis-backed features matching the state backend
+        """
+        if self.state_backend != "redis":
+            for field in REDIS_FEATURES:
+                if field not in self.model_fields_set:
+                    setattr(self, field, False)
+        return self
+
     def get_webhook_urls(self) -> list[str]:
         """
         📋 Get list of Discord webhook URLs from configuration.
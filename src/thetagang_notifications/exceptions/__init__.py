@@ -23,3 +23,27 @@ class PotentialReturnError(Exception):
     def __init__(self, trade_type: str) -> None:
         """Initialize the exception."""
         super().__init__(f"Potential return not available for: {trade_type}")
+
+
+class LeaseLostError(Exception):
+    """Exception when this replica no longer holds the leader lease."""
+
+    def __init__(self, owner: str) -> None:
+        """Initialize the exception."""
+        super().__init__(f"Leader lease is no longer held by: {owner}")
+
+
+class StateBackendError(Exception):
+    """Exception when the configured trade state backend cannot be used."""
+
+    def __init__(self, backend: str, reason: str) -> None:
+        """Initialize the exception."""
+        super().__init__(f"State backend {backend} is not available: {reason}")
+
+
+class StateStoreError(Exception):
+    """Exception when an embedded trade state store fails to read or write."""
+
+    def __init__(self, backend: str, reason: str) -> None:
+        """Initialize the exception."""
+        super().__init__(f"State store {backend} failed: {reason}")
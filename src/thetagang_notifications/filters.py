@@ -0,0 +1,175 @@
+"""Declarative rules that decide which trades from the feed get notifications."""
+
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, field_validator
+from ruyaml import YAML
+
+from thetagang_notifications.config import Settings, settings
+
+log = logging.getLogger(__name__)
+
+# Trade fields the rules can match on, with the rule attribute that lists the values.
+DIMENSIONS = ("users", "symbols", "trade_types", "roles")
+LOW_CARDINALITY = frozenset({"trade_types", "roles"})
+
+
+class FilterRule(BaseModel):
+    """One rule: the trades it matches and whether they are allowed or denied.
+
+    A rule matches a trade when every condition it sets holds, so a rule with
+    `symbols` and `roles` matches patrons trading those symbols. A rule with no
+    conditions matches every trade.
+    """
+
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+    action: Literal["allow", "deny"]
+    users: frozenset[str] = frozenset()
+    symbols: frozenset[str] = frozenset()
+    trade_types: frozenset[str] = frozenset()
+    roles: frozenset[str] = frozenset()
+    min_quantity: int | None = None
+    max_quantity: int | None = None
+
+    @field_validator("symbols", mode="after")
+    @classmethod
+    def upper_symbols(cls, value: frozenset[str]) -> frozenset[str]:
+        """Match symbols regardless of case."""
+        return frozenset(x.upper() for x in value)
+
+    @property
+    def quantity_bounded(self) -> bool:
+        """Check if the rule limits the quantity."""
+        return self.min_quantity is not None or self.max_quantity is not None
+
+    def matches(self, user: str, symbol: str, trade_type: str, role: str, quantity: int) -> bool:
+        """Check every condition of the rule against a trade."""
+        return (
+            (not self.users or user in self.users)
+            and (not self.symbols or symbol in self.symbols)
+            and (not self.trade_types or trade_type in self.trade_types)
+            and (not self.roles or role in self.roles)
+            and (self.min_quantity is None or quantity >= self.min_quantity)
+            and (self.max_quantity is None or quantity <= self.max_quantity)
+        )
+
+
+@dataclass
+class Bucket:
+    """Rules indexed under one value of one dimension."""
+
+    # Position of the first rule that matches on this value alone.
+    first_simple: float = math.inf
+    # Positions of rules that have more conditions to check.
+    compound: list[int] = field(default_factory=list)
+
+
+class TradeFilter:
+    """Rules compiled into a predicate whose cost does not grow with the rule count.
+
+    Rules are checked in order and the first match decides, like a firewall; a
+    trade that matches nothing is denied. Compiling indexes every rule under the
+    values of one of its conditions, so a trade only looks at rules that name its
+    user, symbol, type or role. Rules that match on that one value alone are
+    folded into the position of the first of them, which makes the common case a
+    handful of dictionary lookups whether there are ten rules or ten thousand.
+    Only rules that name nothing but trade types or roles share a few big buckets.
+    """
+
+    def __init__(self, rules: list[FilterRule]) -> None:
+        """Compile the rules."""
+        self.rules = rules
+        self.index: dict[str, dict[str, Bucket]] = {x: {} for x in DIMENSIONS}
+        # Position of the first rule that matches every trade.
+        self.first_catch_all: float = math.inf
+        # Rules without a value to be indexed under, only limiting the quantity.
+        self.unindexed: list[int] = []
+
+        for position, rule in enumerate(rules):
+            conditions = [x for x in DIMENSIONS if getattr(rule, x)]
+            if not conditions:
+                if rule.quantity_bounded:
+                    self.unindexed.append(position)
+                else:
+                    self.first_catch_all = min(self.first_catch_all, position)
+                continue
+
+            # Users and symbols have thousands of values and types and roles only a few,
+            # so index under the first of those and keep each bucket short.
+            dimension = min(conditions, key=lambda x: (x in LOW_CARDINALITY, len(getattr(rule, x))))
+            simple = len(conditions) == 1 and not rule.quantity_bounded
+            for value in getattr(rule, dimension):
+                bucket = self.index[dimension].setdefault(value, Bucket())
+                if simple:
+                    bucket.first_simple = min(bucket.first_simple, position)
+                else:
+                    bucket.compound.append(position)
+
+        # Compound rules behind a simple rule on the same value can never win.
+        for buckets in self.index.values():
+            for bucket in buckets.values():
+                bucket.compound = [x for x in bucket.compound if x < bucket.first_simple]
+        self.unindexed = [x for x in self.unindexed if x < self.first_catch_all]
+        log.info("🧮 Compiled %s trade filter rules", len(rules))
+
+    def decide(self, trade: dict) -> FilterRule | None:
+        """Return the rule that decides a trade, or None if no rule matches."""
+        user = trade["User"]["username"]
+        role = trade["User"]["role"]
+        symbol = (trade.get("symbol") or "").upper()
+        trade_type = trade.get("type") or ""
+        quantity = trade.get("quantity") or 0
+
+        best = self.first_catch_all
+        candidates: list[int] = []
+        for dimension, value in (("users", user), ("symbols", symbol), ("trade_types", trade_type), ("roles", role)):
+            bucket = self.index[dimension].get(value)
+            if bucket is not None:
+                best = min(best, bucket.first_simple)
+                candidates.extend(bucket.compound)
+        candidates.extend(self.unindexed)
+
+        for position in sorted(x for x in candidates if x < best):
+            if self.rules[position].matches(user, symbol, trade_type, role, quantity):
+                best = position
+                break
+        return None if best == math.inf else self.rules[int(best)]
+
+    def __call__(self, trade: dict) -> bool:
+        """Check if a trade is allowed."""
+        rule = self.decide(trade)
+        return rule is not None and rule.action == "allow"
+
+
+def load_filter_rules(path: str) -> list[FilterRule]:
+    """Load the rules from a YAML file holding a list of rules."""
+    yaml = YAML(typ="safe", pure=True)
+    with open(path, encoding="utf-8") as file_handle:
+        raw_rules = yaml.load(file_handle) or []
+    if not isinstance(raw_rules, list):
+        raise ValueError(f"{path} must contain a list of filter rules")
+    return [FilterRule(**x) for x in raw_rules]
+
+
+def build_trade_filter(config: Settings | None = None) -> TradeFilter:
+    """Compile the configured rules into a trade filter.
+
+    Skipped users are denied first, then the rules from `TRADE_FILTERS_FILE` apply
+    in order, and anything left is allowed when the user has one of the allowed
+    roles. An empty `ALLOWED_ROLES` allows no role, so only the file's rules can
+    allow trades. Pass `config` to compile from settings that are not live yet.
+    """
+    config = config or settings
+    rules = []
+    if config.skipped_users_list:
+        rules.append(FilterRule(action="deny", users=frozenset(config.skipped_users_list)))
+    if config.trade_filters_file:
+        rules.extend(load_filter_rules(config.trade_filters_file))
+    # A rule without roles would match everyone, so no roles means no allow rule.
+    if config.allowed_roles_list:
+        rules.append(FilterRule(action="allow", roles=frozenset(config.allowed_roles_list)))
+    return TradeFilter(rules)
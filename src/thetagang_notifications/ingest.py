@@ -0,0 +1,204 @@
+"""Receive trade events pushed to the bot over HTTP."""
+
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dateutil import parser
+from pydantic import ValidationError
+
+from thetagang_notifications.circuit import breaker_status
+from thetagang_notifications.config import settings
+from thetagang_notifications.models import TradeData
+from thetagang_notifications.webhook_health import webhook_health_status
+
+log = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Signature-256"
+INGEST_PATH = "/trades"
+STATUS_PATH = "/status"
+# Trade events are small, so anything bigger than this is not one of ours.
+MAX_BODY_BYTES = 1024 * 1024
+# Fields the queue reads straight from the payload, on top of the ones TradeData checks.
+QUEUE_FIELDS = ("mistake", "close_date", "updatedAt")
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    """Return the signature header value for a request body."""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body: bytes, signature: str | None, secret: str) -> bool:
+    """Check a request signature in constant time.
+
+    Without a shared secret every request is rejected, so the receiver never runs
+    open by accident.
+    """
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign_payload(body, secret), signature)
+
+
+def parse_trades(body: bytes) -> list[dict]:
+    """Parse pushed trades from a request body.
+
+    The body can hold one trade, a list of trades, or the same `{"data": [...]}`
+    envelope that the patrons API returns.
+    """
+    payload = json.loads(body)
+    if isinstance(payload, dict) and "data" in payload:
+        payload = payload["data"]
+    trades = payload if isinstance(payload, list) else [payload]
+    for trade in trades:
+        validate_trade(trade)
+    return trades
+
+
+def validate_trade(trade: object) -> None:
+    """Check that a pushed trade has everything the queue and the notifications read.
+
+    A signed payload is trusted to come from the sender, not to be well formed, and
+    a bad trade would otherwise fail in the main loop instead of at the receiver.
+
+    Raises:
+        ValueError: The trade is not one the bot can process.
+    """
+    if not isinstance(trade, dict) or "guid" not in trade:
+        raise ValueError("Pushed trades must be objects with a guid")
+    missing = [x for x in QUEUE_FIELDS if x not in trade]
+    if missing:
+        raise ValueError(f"Pushed trade {trade['guid']} is missing {', '.join(missing)}")
+    try:
+        TradeData.model_validate(trade)
+    except ValidationError as e:
+        fields = sorted({".".join(str(x) for x in error["loc"]) for error in e.errors()})
+        raise ValueError(f"Pushed trade {trade['guid']} has invalid fields: {', '.join(fields)}") from None
+    if not isinstance(trade["updatedAt"], str):
+        raise ValueError(f"Pushed trade {trade['guid']} has no updatedAt timestamp")
+    parser.parse(trade["updatedAt"])
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    """Handle pushed trade events."""
+
+    server: "IngestServer"
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Report the state of the bot's circuit breakers and webhooks for monitoring."""
+        if self.path != STATUS_PATH:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        body = json.dumps({"circuit_breakers": breaker_status(), "webhooks": webhook_health_status()}).encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Accept a signed batch of trades."""
+        if self.path != INGEST_PATH:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        # Check the length before reading, since the body is read before the signature is checked.
+        if self.headers.get("Content-Length") is None:
+            self.send_error(HTTPStatus.LENGTH_REQUIRED)
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_error(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+            return
+        if length > MAX_BODY_BYTES:
+            self.send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            return
+
+        body = self.rfile.read(length)
+        if not verify_signature(body, self.headers.get(SIGNATURE_HEADER), self.server.secret):
+            log.warning("🚫 Rejected pushed trades with a bad signature from %s", self.client_address[0])
+            self.send_error(HTTPStatus.UNAUTHORIZED)
+            return
+
+        try:
+            trades = parse_trades(body)
+        except ValueError as e:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+
+        self.server.trades.put(trades)
+        self.send_response(HTTPStatus.ACCEPTED)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        """Send access logs to our logger instead of stderr."""
+        log.debug(format, *args)
+
+
+class IngestServer(ThreadingHTTPServer):
+    """HTTP receiver that queues pushed trades for the main loop.
+
+    The receiver only verifies and queues events. The main loop drains the queue
+    and runs the trades through the same `build_queue` → notify pipeline as a
+    poll, so dedupe state is only ever touched from one thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str | None = None, port: int | None = None, secret: str | None = None) -> None:
+        """Constructor for IngestServer."""
+        host = settings.ingest_host if host is None else host
+        port = settings.ingest_port if port is None else port
+        super().__init__((host, port), IngestHandler)
+        self.secret = settings.ingest_secret if secret is None else secret
+        self.trades: queue.Queue[list[dict]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+        if not self.secret:
+            log.warning("⚠️ INGEST_SECRET is not set, so every pushed trade will be rejected")
+
+    @property
+    def url(self) -> str:
+        """Return the URL that senders should post trades to."""
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}{INGEST_PATH}"
+
+    def start(self) -> None:
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="ingest", daemon=True)
+        self._thread.start()
+        log.info("📥 Receiving pushed trades on %s", self.url)
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def wait_for_trades(self, timeout: float) -> list[dict]:
+        """Wait up to `timeout` seconds for pushed trades and drain the queue.
+
+        Returns:
+            Every trade pushed since the last call, in arrival order.
+        """
+        try:
+            trades = list(self.trades.get(timeout=timeout))
+        except queue.Empty:
+            return []
+
+        while True:
+            try:
+                trades.extend(self.trades.get_nowait())
+            except queue.Empty:
+                return trades
@@ -0,0 +1,135 @@
+"""Local journal of trade statuses for riding out a Redis outage."""
+
+import json
+import logging
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from thetagang_notifications.exceptions import StateStoreError
+
+log = logging.getLogger(__name__)
+
+# Errors that mean Redis is unreachable, as opposed to a bad command.
+REDIS_OUTAGE_ERRORS = (RedisConnectionError, RedisTimeoutError)
+# Errors that mean the trade state store is unusable, whether Redis or embedded.
+STORE_OUTAGE_ERRORS = (*REDIS_OUTAGE_ERRORS, StateStoreError)
+
+
+class StatusJournal:
+    """Append-only file of GUID status decisions with an in-memory view.
+
+    While Redis is down every decision is appended to the journal and fsynced
+    before the notifications go out, so a crash during the outage cannot cause
+    duplicates after a restart either. The journal is loaded on startup, and once
+    Redis is reachable again it is replayed in pipelined batches and truncated.
+
+    Next to the journal sits a snapshot of the statuses last read from Redis, so a
+    process that starts while Redis is down still knows the trades in the feed.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Constructor for StatusJournal."""
+        self.path = Path(path)
+        self.snapshot_path = self.path.with_name(f"{self.path.name}.snapshot")
+        self.statuses: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        """Return the number of trades waiting to be replayed."""
+        return len(self.statuses)
+
+    def get(self, guid: str) -> str | None:
+        """Return the journaled status of a trade."""
+        return self.statuses.get(guid)
+
+    def record(self, statuses: dict[str, str]) -> None:
+        """Append status decisions to the journal and make them durable."""
+        if not statuses:
+            return
+        lines = "".join(json.dumps({"guid": guid, "status": status}) + "\n" for guid, status in statuses.items())
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as journal:
+                journal.write(lines)
+                journal.flush()
+                os.fsync(journal.fileno())
+            self.statuses.update(statuses)
+
+    def replay(self, write_batch: Callable[[list[tuple[str, str]]], None], batch_size: int = 500) -> int:
+        """
+        Write every journaled status through `write_batch`, then empty the journal.
+
+        If a batch fails the error propagates and the journal is kept, so the next
+        replay starts over. Replaying a status twice is harmless.
+
+        Returns:
+            Number of statuses replayed
+        """
+        with self._lock:
+            items = list(self.statuses.items())
+            for start in range(0, len(items), batch_size):
+                write_batch(items[start : start + batch_size])
+            self.statuses.clear()
+            self.path.unlink(missing_ok=True)
+        return len(items)
+
+    def save_snapshot(self, statuses: dict[str, str]) -> None:
+        """Replace the snapshot of the statuses last read from Redis."""
+        partial = self.snapshot_path.with_name(f"{self.snapshot_path.name}.tmp")
+        with self._lock:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(partial, "w", encoding="utf-8") as snapshot:
+                json.dump(statuses, snapshot)
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(partial, self.snapshot_path)
+
+    def load_snapshot(self) -> dict[str, str]:
+        """
+        Read the snapshot of the statuses last read from Redis.
+
+        Returns:
+            Status of each trade in the snapshot, oldest first
+        """
+        try:
+            snapshot = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            snapshot = None
+        if not isinstance(snapshot, dict):
+            log.warning("⚠️ Ignoring an unreadable status snapshot %s", self.snapshot_path)
+            return {}
+        return snapshot
+
+    def _load(self) -> None:
+        """Read a journal left behind by an earlier run.
+
+        A crash can leave half a line at the end. That tail is cut off, so the next
+        record starts on a line of its own instead of being glued onto it.
+        """
+        if not self.path.exists():
+            return
+        data = self.path.read_bytes()
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].splitlines():
+            try:
+                entry = json.loads(line)
+                guid, status = entry["guid"], entry["status"]
+            except (ValueError, TypeError, KeyError):
+                log.warning("⚠️ Ignoring a malformed line in the status journal %s", self.path)
+                continue
+            self.statuses[guid] = status
+        if complete < len(data):
+            log.warning("⚠️ Cutting a torn line off the end of the status journal %s", self.path)
+            with open(self.path, "r+b") as journal:
+                journal.truncate(complete)
+                os.fsync(journal.fileno())
+        if self.statuses:
+            log.info("📓 Loaded %s trade statuses from the journal, waiting to replay them", len(self.statuses))
@@ -0,0 +1,179 @@
+"""Leader lease in Redis so only one replica polls and notifies."""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from redis import Redis
+from redis.cluster import RedisCluster
+from redis.exceptions import RedisError
+
+from thetagang_notifications.config import settings
+from thetagang_notifications.exceptions import LeaseLostError
+
+log = logging.getLogger(__name__)
+
+# Extend or delete the lease only while it still holds our value. A script runs
+# atomically on the node that owns the key, so this works on a cluster too.
+RENEW_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderLease:
+    """Hold a leader lease in Redis with a fencing token.
+
+    Every replica tries to acquire the same key with `SET NX PX`. The winner takes
+    the next value of a counter as its fencing token and stores it in the lease, so
+    a replica that stalled past its lease can tell that a newer leader exists. A
+    standby that keeps calling `acquire` takes over as soon as the lease expires.
+
+    `start_renewing` keeps calling `acquire` from a background thread, so a slow
+    poll cycle on the main thread cannot let the lease expire under it.
+    """
+
+    def __init__(
+        self,
+        db_conn: Redis | RedisCluster,
+        key: str | None = None,
+        ttl: float | None = None,
+        owner: str | None = None,
+    ) -> None:
+        """Constructor for LeaderLease."""
+        self.db_conn = db_conn
+        self._renew_script = db_conn.register_script(RENEW_SCRIPT)
+        self._release_script = db_conn.register_script(RELEASE_SCRIPT)
+        self.key = key or settings.lease_key
+        self.fence_key = f"{self.key}:fence"
+        self.ttl = settings.lease_ttl if ttl is None else ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.token: int | None = None
+        # Local deadline so a stalled process stops acting as leader even before
+        # it can reach Redis again.
+        self._deadline = 0.0
+        self._lock = threading.RLock()
+        # Set when the renewer thread wins the lease, until the main loop picks it up
+        self._took_over = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def value(self) -> str:
+        """Return the lease value written to Redis."""
+        return f"{self.token}:{self.owner}"
+
+    @property
+    def is_leader(self) -> bool:
+        """Check if this replica holds an unexpired lease."""
+        return self.token is not None and time.monotonic() < self._deadline
+
+    def acquire(self) -> bool:
+        """Acquire the lease, or renew it if we already hold it."""
+        with self._lock:
+            if self.token is not None:
+                return self.renew()
+
+            started = time.monotonic()
+            if not self.db_conn.set(self.key, self.owner, nx=True, px=self._ttl_ms()):
+                return False
+
+            # Nobody else can win the lease while the key exists, so it is safe to
+            # take the next fencing token and write it into the lease.
+            self.token = int(self.db_conn.incr(self.fence_key))
+            self.db_conn.set(self.key, self.value, xx=True, px=self._ttl_ms())
+            self._deadline = started + self.ttl
+            self._took_over.set()
+            log.info("👑 Acquired leader lease %s with fencing token %s", self.key, self.token)
+            return True
+
+    def renew(self) -> bool:
+        """Extend the lease if we still hold it."""
+        with self._lock:
+            if self.token is None:
+                return False
+
+            started = time.monotonic()
+            if self._renew_script(keys=[self.key], args=[self.value, self._ttl_ms()]):
+                self._deadline = started + self.ttl
+                return True
+
+            log.warning("⚠️ Lost leader lease %s (fencing token %s)", self.key, self.token)
+            self._reset()
+            return False
+
+    def release(self) -> None:
+        """Stop renewing and give up the lease so a standby can take over right away."""
+        self.stop_renewing()
+        with self._lock:
+            if self.token is None:
+                return
+
+            if self._release_script(keys=[self.key], args=[self.value]):
+                log.info("👋 Released leader lease %s", self.key)
+            self._reset()
+
+    def ensure(self) -> None:
+        """Verify that our fencing token is still the current one.
+
+        Raises:
+            LeaseLostError: If the lease expired or another replica took over
+        """
+        with self._lock:
+            if not self.is_leader or self.db_conn.get(self.key) != self.value:
+                self._reset()
+                raise LeaseLostError(self.owner)
+
+    def took_over(self) -> bool:
+        """Check if the lease was won since the last call, then forget it."""
+        took_over = self._took_over.is_set()
+        self._took_over.clear()
+        return took_over
+
+    def start_renewing(self, interval: float | None = None) -> None:
+        """Acquire or renew the lease every `interval` seconds on a background thread."""
+        if self._thread is None:
+            interval = settings.lease_renew_interval if interval is None else interval
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._renew_forever, args=(interval,), name="lease", daemon=True)
+            self._thread.start()
+
+    def stop_renewing(self) -> None:
+        """Stop the background renewals."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _renew_forever(self, interval: float) -> None:
+        """Keep acquiring or renewing the lease until stopped."""
+        while not self._stopping.is_set():
+            try:
+                self.acquire()
+            except RedisError as e:
+                # The local deadline still runs out, so an unreachable Redis ends our leadership on time.
+                log.warning("⚠️ Could not renew leader lease %s: %s", self.key, e)
+            except Exception:
+                # Anything else would end the thread silently while we still act as leader.
+                log.exception("💥 Unexpected error renewing leader lease %s", self.key)
+            self._stopping.wait(interval)
+
+    def _reset(self) -> None:
+        """Forget the lease."""
+        self.token = None
+        self._deadline = 0.0
+
+    def _ttl_ms(self) -> int:
+        """Return the lease TTL in milliseconds."""
+        return max(1, int(self.ttl * 1000))
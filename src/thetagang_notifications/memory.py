@@ -0,0 +1,140 @@
+"""Report memory growth by module for each cycle with tracemalloc."""
+
+import logging
+import sys
+import tracemalloc
+from dataclasses import dataclass
+
+from thetagang_notifications.config import settings
+
+log = logging.getLogger(__name__)
+
+# The snapshots themselves would otherwise show up as growth.
+TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+@dataclass(frozen=True)
+class ModuleGrowth:
+    """Memory growth for one module between two cycles."""
+
+    module: str
+    size: int
+    size_diff: int
+    count_diff: int
+
+
+def module_names() -> dict[str, str]:
+    """Map the source file of every loaded module to the module name."""
+    names = {}
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if filename:
+            names[filename] = name
+    return names
+
+
+def format_size(size: int) -> str:
+    """Return a byte count in KiB."""
+    return f"{size / 1024:+.1f} KiB"
+
+
+class MemoryReporter:
+    """Compare tracemalloc snapshots after each cycle and log growth by module.
+
+    Tracing is expensive, so it is only switched on when the `memory_report` setting
+    is enabled or a toggle is requested. Toggles wait for the end of the current
+    cycle so each report covers whole cycles.
+    """
+
+    def __init__(self, top: int | None = None) -> None:
+        """Constructor for MemoryReporter."""
+        self.top = top or settings.memory_report_top
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self.toggle_requested = False
+        if settings.memory_report:
+            self.start()
+
+    @property
+    def enabled(self) -> bool:
+        """Return True while memory reports are being made."""
+        return self.snapshot is not None
+
+    def start(self) -> None:
+        """Start tracing allocations and take the baseline snapshot."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.snapshot = self.take_snapshot()
+        log.info("🧠 Memory reports enabled")
+
+    def stop(self) -> None:
+        """Stop tracing allocations."""
+        self.snapshot = None
+        tracemalloc.stop()
+        log.info("🧠 Memory reports disabled")
+
+    def request_toggle(self, *_args: object) -> None:
+        """Switch reports on or off at the end of the current cycle (safe to use as a signal handler)."""
+        self.toggle_requested = True
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        """Take a snapshot without tracemalloc's own allocations."""
+        return tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+
+    def compare(self, snapshot: tracemalloc.Snapshot) -> list[ModuleGrowth]:
+        """
+        Group the growth since the last snapshot by module, largest first.
+
+        Returns:
+            Growth for every module that allocated or freed memory
+        """
+        names = module_names()
+        growth: dict[str, list[int]] = {}
+        for stat in snapshot.compare_to(self.snapshot, "filename"):
+            filename = stat.traceback[0].filename
+            totals = growth.setdefault(names.get(filename, filename), [0, 0, 0])
+            totals[0] += stat.size
+            totals[1] += stat.size_diff
+            totals[2] += stat.count_diff
+
+        stats = [ModuleGrowth(module, *totals) for module, totals in growth.items() if totals[1] or totals[2]]
+        return sorted(stats, key=lambda x: x.size_diff, reverse=True)
+
+    def report_cycle(self) -> list[ModuleGrowth]:
+        """
+        Log the memory growth by module since the last cycle.
+
+        Returns:
+            Growth by module, or an empty list while reports are off
+        """
+        if self.toggle_requested:
+            self.toggle_requested = False
+            if self.enabled:
+                self.stop()
+            else:
+                self.start()
+            return []
+
+        if not self.enabled:
+            return []
+
+        snapshot = self.take_snapshot()
+        stats = self.compare(snapshot)
+        self.snapshot = snapshot
+
+        total = sum(x.size_diff for x in stats)
+        current, peak = tracemalloc.get_traced_memory()
+        log.info(
+            "🧠 Memory %s this cycle (%.1f KiB traced, %.1f KiB peak)", format_size(total), current / 1024, peak / 1024
+        )
+        for stat in stats[: self.top]:
+            log.info("🧠   %s %s (%+d blocks)", format_size(stat.size_diff), stat.module, stat.count_diff)
+        return stats
+
+
+memory_reporter = MemoryReporter()
@@ -120,4 +120,23 @@ class TradeSpec(BaseModel):
     @property
     def is_long(self) -> bool:
         """Check if this is a long trade."""
-        return not self.short
\ No newline at end of file
+        return not self.short
+
+
+class SymbolMetadata(BaseModel):
+    """Cached details about a ticker symbol."""
+    symbol: str
+    logo_url: Optional[str] = None
+    fallback_logo_url: str
+    company_name: Optional[str] = None
+
+    @computed_field
+    @property
+    def thumbnail_url(self) -> str:
+        """Get the best thumbnail for the symbol."""
+        return self.logo_url or self.fallback_logo_url
+
+    @property
+    def complete(self) -> bool:
+        """Check if both the logo and the company name were found."""
+        return self.logo_url is not None and self.company_name is not None
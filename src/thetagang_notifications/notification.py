@@ -1,5 +1,6 @@
 """Send notifications to discord for trades."""
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING, Any
 
 from discord_webhook import DiscordEmbed, DiscordWebhook
@@ -8,8 +9,17 @@ if TYPE_CHECKING:
     from thetagang_notifications.trade import Trade
 
 from thetagang_notifications.config import settings
+from thetagang_notifications.routing import get_router
+from thetagang_notifications.sinks import get_sink
+from thetagang_notifications.symbols import symbol_cache
 
-STOCK_LOGO = "https://static.stocktitan.net/company-logo/%s.webp"
+# Discord allows up to 10 embeds per webhook message, and the text across all of
+# those embeds must stay under 6000 characters.
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+# Deliveries to each webhook run side by side.
+_delivery_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="webhook")
 
 
 class Notification:
@@ -40,32 +50,20 @@ class Notification:
 
         embed.set_author(**self.generate_action())
         embed.set_image(url=settings.transparent_png)
-        embed.set_thumbnail(url=STOCK_LOGO % self.trade.symbol.lower())
+        embed.set_thumbnail(url=symbol_cache.thumbnail_url(self.trade.symbol))
         embed.set_footer(text=self.trade_note)
 
         return embed
 
     def notify(self) -> list[DiscordWebhook]:
         """
-        📤 Send the notification to all configured webhooks.
+        📤 Send the notification to the webhooks the trade is routed to.
 
         Returns:
             List of executed webhook objects
         """
-        webhooks: list[DiscordWebhook] = []
-        webhook_urls = settings.get_webhook_urls()
-
-        for webhook_url in webhook_urls:
-            webhook = DiscordWebhook(
-                url=webhook_url,
-                rate_limit_retry=True,
-                username=settings.discord_username,
-            )
-            webhook.add_embed(self.generate_embeds())
-            webhook.execute()
-            webhooks.append(webhook)
-
-        return webhooks
+        embed = self.generate_embeds()
+        return deliver_routed({url: [[embed]] for url in webhooks_for(self.trade)})
 
 
 class OpenedNotification(Notification):
@@ -76,15 +74,18 @@ class OpenedNotification(Notification):
         super().__init__(trade)
 
 
+def result_color(trade: "Trade") -> str:
+    """Pick the embed color for the result of a closed trade."""
+    return settings.color_assigned if trade.is_assigned else settings.color_winner if trade.is_winner else settings.color_loser
+
+
 class ClosedNotification(Notification):
     """Handle closing notifications."""
 
     def __init__(self, trade: "Trade"):
         """Initialization method."""
         super().__init__(trade)
-        self.trade_color = (
-            settings.color_assigned if self.trade.is_assigned else settings.color_winner if self.trade.is_winner else settings.color_loser
-        )
+        self.trade_color = result_color(self.trade)
 
     def generate_embeds(self) -> DiscordEmbed:
         """Generate the embeds for the notification."""
@@ -95,16 +96,140 @@ class ClosedNotification(Notification):
         )
         embed.set_author(**self.generate_action())
         embed.set_image(url=settings.transparent_png)
-        embed.set_thumbnail(url=STOCK_LOGO % self.trade.symbol.lower())
+        embed.set_thumbnail(url=symbol_cache.thumbnail_url(self.trade.symbol))
         embed.set_footer(text=self.trade_note)
 
         return embed
 
 
+class RolledNotification(Notification):
+    """Handle a closed trade that was rolled into a new trade."""
+
+    def __init__(self, trade: "Trade"):
+        """Initialization method."""
+        super().__init__(trade)
+        self.rolled_from: "Trade" = self.trade.rolled_from  # type: ignore[assignment]
+        self.trade_color = result_color(self.rolled_from)
+
+    def generate_embeds(self) -> DiscordEmbed:
+        """Generate the embeds for the notification."""
+        closed_position = self.rolled_from.notification_title().splitlines()[-1]
+        description = f"Closed {closed_position}\n{self.rolled_from.closing_description()}"
+        if opening_description := self.trade.opening_description():
+            description += f"\n\n{opening_description}"
+
+        embed = DiscordEmbed(
+            title=self.trade.notification_title(),
+            description=description,
+            color=self.trade_color,
+        )
+        embed.set_author(**self.generate_action())
+        embed.set_image(url=settings.transparent_png)
+        embed.set_thumbnail(url=symbol_cache.thumbnail_url(self.trade.symbol))
+        embed.set_footer(text=self.trade_note)
+
+        return embed
+
+
+def embed_size(embed: DiscordEmbed) -> int:
+    """Count the characters in an embed that Discord applies to the message limit."""
+    size = len(embed.title or "") + len(embed.description or "")
+    size += len((embed.author or {}).get("name") or "")
+    size += len((embed.footer or {}).get("text") or "")
+    for field in embed.fields:
+        size += len(field.get("name") or "") + len(field.get("value") or "")
+    return size
+
+
+def pack_embeds(embeds: list[DiscordEmbed]) -> list[list[DiscordEmbed]]:
+    """
+    📦 Group embeds into as few webhook messages as Discord allows.
+
+    Embeds keep their original order. A new message starts whenever adding the
+    next embed would go over the embed count or character limits.
+
+    Args:
+        embeds: Embeds in the order they should be delivered
+
+    Returns:
+        List of messages, each one a list of embeds
+    """
+    messages: list[list[DiscordEmbed]] = []
+    current: list[DiscordEmbed] = []
+    current_size = 0
+
+    for embed in embeds:
+        size = embed_size(embed)
+        if current and (len(current) >= MAX_EMBEDS_PER_MESSAGE or current_size + size > MAX_EMBED_CHARS_PER_MESSAGE):
+            messages.append(current)
+            current, current_size = [], 0
+        current.append(embed)
+        current_size += size
+
+    if current:
+        messages.append(current)
+
+    return messages
+
+
+def webhooks_for(trade: "Trade") -> tuple[str, ...]:
+    """Return the webhooks a trade is routed to, or every configured webhook if no route wants it."""
+    return get_router().route(trade) or tuple(settings.get_webhook_urls())
+
+
+def notify_packed(notifications: list[Notification]) -> list[DiscordWebhook]:
+    """
+    📤 Send a batch of notifications to their webhooks using packed messages.
+
+    Each notification is rendered once, however many webhooks it is routed to, and
+    the embeds for each webhook are packed so that a burst of trades needs far fewer
+    webhook requests. Webhooks that receive the same embeds share one packing.
+
+    Returns:
+        List of executed webhook objects
+    """
+    embeds_by_webhook: dict[str, list[DiscordEmbed]] = {}
+    for notification in notifications:
+        embed = notification.generate_embeds()
+        for url in webhooks_for(notification.trade):
+            embeds_by_webhook.setdefault(url, []).append(embed)
+    if not embeds_by_webhook:
+        return []
+
+    packed: dict[tuple[int, ...], list[list[DiscordEmbed]]] = {}
+    messages_by_webhook = {}
+    for url, embeds in embeds_by_webhook.items():
+        key = tuple(id(x) for x in embeds)
+        if key not in packed:
+            packed[key] = pack_embeds(embeds)
+        messages_by_webhook[url] = packed[key]
+    return deliver_routed(messages_by_webhook)
+
+
+def deliver_routed(messages_by_webhook: dict[str, list[list[DiscordEmbed]]]) -> list[DiscordWebhook]:
+    """
+    📤 Send each webhook its own messages through the notification sink.
+
+    Each webhook gets its own worker, so a slow or dead channel never holds up
+    the healthy ones.
+
+    Returns:
+        List of executed webhook objects
+    """
+    sink = get_sink()
+    if len(messages_by_webhook) == 1:
+        return sink.deliver(*next(iter(messages_by_webhook.items())))
+
+    results = _delivery_pool.map(sink.deliver, messages_by_webhook.keys(), messages_by_webhook.values())
+    return [webhook for webhooks in results for webhook in webhooks]
+
+
 def get_notifier(trade: Any) -> Notification:
     """Create a trade object."""
     available_notifications = {
         "opened": OpenedNotification,
         "closed": ClosedNotification,
+        "opened and closed": ClosedNotification,
+        "rolled": RolledNotification,
     }
     return available_notifications[trade.status](trade)
@@ -0,0 +1,193 @@
+"""Index of the positions the community holds by symbol and expiry."""
+
+import json
+import logging
+import time
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from dateutil import parser
+from redis import Redis
+from redis.cluster import RedisCluster
+
+from thetagang_notifications.config import settings
+from thetagang_notifications.models import TradeData
+from thetagang_notifications.trade import Trade
+
+log = logging.getLogger(__name__)
+
+
+def expiry_day(expiry_date: str) -> str:
+    """Return the expiration day of an option as YYYY-MM-DD.
+
+    The API sends expirations as midnight Eastern time in UTC, so the UTC date is
+    the expiration day.
+    """
+    return parser.isoparse(expiry_date).astimezone(timezone.utc).date().isoformat()
+
+
+def expires_at(day: str) -> float:
+    """Return the timestamp after which positions expiring on a day are gone."""
+    start = datetime.fromisoformat(day).replace(tzinfo=timezone.utc)
+    return (start + timedelta(days=1)).timestamp()
+
+
+@dataclass(frozen=True)
+class Position:
+    """One open option trade as it appears in the index."""
+
+    guid: str
+    username: str
+    trade_type: str
+    quantity: int
+    short: bool
+    strikes: dict[str, float] = field(default_factory=dict)
+
+
+class OpenInterestIndex:
+    """Keep the open option positions per symbol and expiry in Redis.
+
+    Each symbol and expiration day has a hash of positions keyed by guid, so opening
+    a trade is one `HSET`, closing it is one `HDEL` and answering "what is open on
+    TSLA this Friday" is one `HGETALL`. A sorted set per symbol lists its live
+    expirations, and a global sorted set scored by expiration time lets `prune`
+    drop expired positions without looking at anything still open.
+    """
+
+    def __init__(self, db_conn: Redis | RedisCluster, prefix: str | None = None) -> None:
+        """Constructor for OpenInterestIndex."""
+        self.db_conn = db_conn
+        self.prefix = prefix or settings.open_interest_prefix
+
+    def positions_key(self, symbol: str, day: str) -> str:
+        """Return the key of the positions for a symbol and expiration day."""
+        # The hash tag keeps every key of one symbol on the same cluster slot.
+        return f"{self.prefix}:{{{symbol.upper()}}}:{day}"
+
+    def expiries_key(self, symbol: str) -> str:
+        """Return the key of the live expirations for a symbol."""
+        return f"{self.prefix}:{{{symbol.upper()}}}:expiries"
+
+    @property
+    def schedule_key(self) -> str:
+        """Return the key of every symbol and expiration, scored by expiration time."""
+        return f"{self.prefix}:schedule"
+
+    def update(self, trades: Iterable[Trade]) -> int:
+        """
+        Add opened trades to the index and remove closed ones, including the closed side of any roll.
+
+        Takes the trades already parsed for the notifications, so nothing is
+        validated twice. Stock trades and trades without an expiration are ignored.
+
+        Returns:
+            Number of trades that changed the index
+        """
+        opened: list[tuple[TradeData, Position]] = []
+        closed: list[TradeData] = []
+        for trade in trades:
+            for related in (trade.rolled_from, trade):
+                if related is None or not related.is_option_trade or not related.expiry_date:
+                    continue
+                if related.data.close_date:
+                    closed.append(related.data)
+                    continue
+                position = Position(
+                    guid=related.guid,
+                    username=related.username,
+                    trade_type=related.trade_type,
+                    quantity=related.quantity,
+                    short=related.spec.short,
+                    strikes=related.strikes,
+                )
+                opened.append((related.data, position))
+
+        if not opened and not closed:
+            return 0
+
+        now = time.time()
+        indexed = 0
+        emptied: list[tuple[str, str]] = []
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for data, position in opened:
+                day = expiry_day(data.expiry_date)
+                score = expires_at(day)
+                if score <= now:
+                    continue
+                indexed += 1
+                pipe.hset(self.positions_key(data.symbol, day), data.guid, json.dumps(asdict(position)))
+                pipe.zadd(self.expiries_key(data.symbol), {day: score})
+                pipe.zadd(self.schedule_key, {f"{data.symbol.upper()}:{day}": score})
+            for data in closed:
+                day = expiry_day(data.expiry_date)
+                pipe.hdel(self.positions_key(data.symbol, day), data.guid)
+                emptied.append((data.symbol, day))
+            pipe.execute()
+
+        self._drop_empty(emptied)
+        log.info("📊 Updated open interest with %s opened and %s closed trades", indexed, len(closed))
+        return indexed + len(closed)
+
+    def positions(self, symbol: str, expiry: str) -> list[Position]:
+        """Return the open positions on a symbol that expire on a day (YYYY-MM-DD)."""
+        raw = self.db_conn.hgetall(self.positions_key(symbol, expiry))
+        return sorted((Position(**json.loads(x)) for x in raw.values()), key=lambda x: x.guid)
+
+    def expiries(self, symbol: str) -> list[str]:
+        """Return the expiration days with open positions on a symbol, soonest first."""
+        return self.db_conn.zrangebyscore(self.expiries_key(symbol), time.time(), "+inf")
+
+    def contracts(self, symbol: str, expiry: str) -> dict[float, int]:
+        """Return the contracts held at each strike for a symbol and expiration day."""
+        totals: dict[float, int] = {}
+        for position in self.positions(symbol, expiry):
+            for strike in position.strikes.values():
+                totals[strike] = totals.get(strike, 0) + position.quantity
+        return dict(sorted(totals.items()))
+
+    def prune(self, now: float | None = None, limit: int = 1000) -> int:
+        """
+        Drop positions whose expiration has passed.
+
+        Only the expired entries of the schedule are read, so the cost depends on
+        what expired since the last prune and not on the size of the index.
+
+        Returns:
+            Number of symbol and expiration pairs removed
+        """
+        now = time.time() if now is None else now
+        expired = self.db_conn.zrangebyscore(self.schedule_key, "-inf", now, start=0, num=limit)
+        if not expired:
+            return 0
+
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for entry in expired:
+                symbol, day = entry.rsplit(":", 1)
+                pipe.delete(self.positions_key(symbol, day))
+                pipe.zrem(self.expiries_key(symbol), day)
+            pipe.zrem(self.schedule_key, *expired)
+            pipe.execute()
+
+        log.info("🧹 Pruned %s expired open interest entries", len(expired))
+        return len(expired)
+
+    def _drop_empty(self, entries: list[tuple[str, str]]) -> None:
+        """Forget expirations whose last position was just closed."""
+        entries = list(dict.fromkeys(entries))
+        if not entries:
+            return
+
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for symbol, day in entries:
+                pipe.exists(self.positions_key(symbol, day))
+            remaining = pipe.execute()
+
+        empty = [entry for entry, exists in zip(entries, remaining, strict=True) if not exists]
+        if not empty:
+            return
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for symbol, day in empty:
+                pipe.zrem(self.expiries_key(symbol), day)
+                pipe.zrem(self.schedule_key, f"{symbol.upper()}:{day}")
+            pipe.execute()
@@ -0,0 +1,227 @@
+"""Reload settings, trade specs and compiled rules without restarting the daemon."""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from thetagang_notifications.config import Settings, settings
+from thetagang_notifications.filters import TradeFilter, build_trade_filter
+from thetagang_notifications.models import TradeSpec
+from thetagang_notifications.routing import Router, create_router, set_router
+from thetagang_notifications.trade import load_trade_specs, read_trade_specs, set_trade_specs
+
+if TYPE_CHECKING:
+    from thetagang_notifications.trade_queue import TradeQueue
+
+log = logging.getLogger(__name__)
+
+# Settings that are only read at startup, or when a long-lived object is built,
+# so a change needs a restart to apply.
+RESTART_FIELDS = frozenset({
+    "redis_host",
+    "redis_port",
+    "redis_mode",
+    "redis_hash_tag_buckets",
+    "redis_socket_timeout",
+    "state_backend",
+    "state_path",
+    "state_lmdb_map_size",
+    "journal_path",
+    "redis_retry_interval",
+    "redis_max_retry_interval",
+    "lease_enabled",
+    "lease_key",
+    "lease_ttl",
+    "lease_renew_interval",
+    "market_timezone",
+    "market_holidays",
+    "ingest_enabled",
+    "ingest_host",
+    "ingest_port",
+    "ingest_secret",
+    "http2",
+    "http_connect_timeout",
+    "http_read_timeout",
+    "http_max_connections",
+    "http_keepalive_expiry",
+    "feed_failure_threshold",
+    "feed_reset_timeout",
+    "feed_max_reset_timeout",
+    "notification_sink",
+    "notification_sink_path",
+    "webhook_failure_threshold",
+    "webhook_reset_timeout",
+    "webhook_max_reset_timeout",
+    "webhook_health_window",
+    "memory_report",
+    "memory_report_top",
+    "supervisor_enabled",
+    "supervisor_max_rss_mb",
+    "supervisor_max_cycle_seconds",
+    "supervisor_drain_timeout",
+    "supervisor_check_interval",
+    "config_reload_enabled",
+    "config_reload_interval",
+    "aggregates_prefix",
+    "aggregates_min_trades",
+    "archive_dir",
+    "archive_batch_size",
+    "archive_max_age",
+})
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """A complete, validated configuration ready to be swapped in."""
+
+    settings: Settings
+    specs: dict[str, TradeSpec]
+    trade_filter: TradeFilter
+    router: Router
+    mtimes: dict[str, int | None]
+
+
+def watched_files(config: Settings) -> list[str]:
+    """Return the files a configuration was built from."""
+    env_file = Settings.model_config.get("env_file")
+    files = [str(env_file)] if isinstance(env_file, (str, os.PathLike)) else []
+    files.append(config.trade_spec_file)
+    files.extend(x for x in (config.trade_filters_file, config.webhook_routes_file) if x)
+    return files
+
+
+def file_mtimes(config: Settings) -> dict[str, int | None]:
+    """Return the modification time of every watched file, or None if it is missing."""
+    mtimes: dict[str, int | None] = {}
+    for path in watched_files(config):
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+def build_snapshot(current_specs: dict[str, TradeSpec]) -> ConfigSnapshot:
+    """Read and compile a new configuration, raising if any part of it is invalid."""
+    candidate = Settings()
+    specs = read_trade_specs(candidate.trade_spec_file)
+    missing = sorted(set(current_specs) - set(specs))
+    if missing:
+        raise ValueError(f"trade specs are missing: {', '.join(missing)}")
+    return ConfigSnapshot(
+        settings=candidate,
+        specs=specs,
+        trade_filter=build_trade_filter(candidate),
+        router=create_router(candidate),
+        mtimes=file_mtimes(candidate),
+    )
+
+
+class ConfigReloader:
+    """Watch the configuration files and swap in new configurations between cycles.
+
+    A background thread polls the modification times of `.env`, the trade spec
+    file and the rule files, and `request_reload` (the SIGHUP handler) wakes it up
+    right away. New configurations are fully parsed, validated and compiled on
+    that thread, so a cycle never waits on YAML. `apply_pending` then swaps the
+    staged configuration in from the main loop between cycles. A configuration
+    that fails to load is logged and dropped, and the old one keeps running.
+    """
+
+    def __init__(self, interval: float | None = None) -> None:
+        """Constructor for ConfigReloader."""
+        self.interval = interval or settings.config_reload_interval
+        # Bumped every time a new configuration goes live
+        self.generation = 0
+        self.pending: ConfigSnapshot | None = None
+        self.mtimes = file_mtimes(settings)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start watching the configuration files."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="config-reload", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching the configuration files."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def request_reload(self, signum: int | None = None, frame: object = None) -> None:
+        """Reload on the next check even if no file changed, usable as a signal handler."""
+        self._wake.set()
+
+    def check(self, force: bool = False) -> bool:
+        """
+        Build and stage a new configuration if a watched file changed.
+
+        Returns:
+            True if a new configuration was staged
+        """
+        mtimes = file_mtimes(settings)
+        if not force and mtimes == self.mtimes:
+            return False
+        # Remember the failed files too, so a bad edit is reported once and not every poll.
+        self.mtimes = mtimes
+
+        try:
+            snapshot = build_snapshot(load_trade_specs())
+        except Exception as e:  # noqa: BLE001 - any failure rejects the candidate, never the daemon
+            log.error("❌ Rejected new configuration, keeping generation %s: %s", self.generation, e)
+            return False
+
+        self.mtimes = snapshot.mtimes
+        with self._lock:
+            self.pending = snapshot
+        log.info("📝 Staged a new configuration")
+        return True
+
+    def apply_pending(self, trade_queue: "TradeQueue | None" = None) -> bool:
+        """
+        Swap in the staged configuration. Call this between cycles.
+
+        Returns:
+            True if a new configuration went live
+        """
+        # Without the watcher thread, a requested reload is built here instead.
+        if self._thread is None and self._wake.is_set():
+            self._wake.clear()
+            self.check(force=True)
+
+        with self._lock:
+            snapshot, self.pending = self.pending, None
+        if snapshot is None:
+            return False
+
+        changed = [x for x in Settings.model_fields if getattr(settings, x) != getattr(snapshot.settings, x)]
+        # Every module shares the one settings object, so update it in place in one step.
+        settings.__dict__.update(snapshot.settings.__dict__)
+        set_trade_specs(snapshot.specs)
+        set_router(snapshot.router)
+        if trade_queue is not None:
+            trade_queue.trade_filter = snapshot.trade_filter
+        self.generation += 1
+
+        log.info("🔄 Configuration generation %s is live (%s settings changed)", self.generation, len(changed))
+        needs_restart = sorted(set(changed) & RESTART_FIELDS)
+        if needs_restart:
+            log.warning("⚠️ These settings only take effect after a restart: %s", ", ".join(needs_restart))
+        return True
+
+    def _run(self) -> None:
+        """Check for changes until stopped."""
+        while not self._stopping.is_set():
+            forced = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            self.check(force=forced)
@@ -0,0 +1,146 @@
+"""Route each trade to the webhooks that want it."""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Literal
+
+from pydantic import BaseModel, ConfigDict, field_validator
+from ruyaml import YAML
+
+from thetagang_notifications.config import Settings, settings
+
+if TYPE_CHECKING:
+    from thetagang_notifications.trade import Trade
+
+log = logging.getLogger(__name__)
+
+# Trade attributes a route can match on, most distinct values first.
+DIMENSIONS = ("users", "symbols", "sentiments", "statuses")
+
+
+class Route(BaseModel):
+    """Webhooks that receive the trades matching every condition of the route.
+
+    A route without conditions receives every trade.
+    """
+
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+    webhooks: frozenset[str]
+    users: frozenset[str] = frozenset()
+    symbols: frozenset[str] = frozenset()
+    sentiments: frozenset[Literal["bullish", "bearish", "neutral"]] = frozenset()
+    statuses: frozenset[Literal["open", "closed"]] = frozenset()
+
+    @field_validator("symbols", mode="after")
+    @classmethod
+    def upper_symbols(cls, value: frozenset[str]) -> frozenset[str]:
+        """Match symbols regardless of case."""
+        return frozenset(x.upper() for x in value)
+
+    def matches(self, values: dict[str, str]) -> bool:
+        """Check every condition of the route against the attributes of a trade."""
+        return all(not getattr(self, x) or values[x] in getattr(self, x) for x in DIMENSIONS)
+
+
+@dataclass
+class RouteBucket:
+    """Routes indexed under one value of one attribute."""
+
+    # Webhooks of the routes that match on this value alone.
+    webhooks: frozenset[str] = frozenset()
+    # Routes that have more conditions to check.
+    compound: list[Route] = field(default_factory=list)
+
+
+def trade_attributes(trade: "Trade") -> dict[str, str]:
+    """Return the value of every routing attribute for a trade."""
+    return {
+        "users": trade.username,
+        "symbols": trade.symbol.upper(),
+        "sentiments": trade.spec.sentiment,
+        "statuses": "open" if trade.is_open else "closed",
+    }
+
+
+class Router:
+    """Routes compiled into an index from attribute values to webhook sets.
+
+    Each route is indexed under the values of one of its conditions, and routes
+    with a single condition are merged into one webhook set per value. Finding a
+    trade's destinations is then four dictionary lookups plus a check of the few
+    compound routes under the same values, however many routes there are.
+    """
+
+    def __init__(self, routes: list[Route]) -> None:
+        """Compile the routes."""
+        self.routes = routes
+        self.index: dict[str, dict[str, RouteBucket]] = {x: {} for x in DIMENSIONS}
+        self.everywhere: frozenset[str] = frozenset()
+
+        for route in routes:
+            conditions = [x for x in DIMENSIONS if getattr(route, x)]
+            if not conditions:
+                self.everywhere |= route.webhooks
+                continue
+            # Sentiments and statuses have a handful of values, so prefer users and symbols.
+            dimension = min(conditions, key=lambda x: (DIMENSIONS.index(x) >= 2, len(getattr(route, x))))
+            for value in getattr(route, dimension):
+                bucket = self.index[dimension].setdefault(value, RouteBucket())
+                if len(conditions) == 1:
+                    bucket.webhooks |= route.webhooks
+                else:
+                    bucket.compound.append(route)
+        log.info("🧭 Compiled %s webhook routes", len(routes))
+
+    def route(self, trade: "Trade") -> tuple[str, ...]:
+        """Return the webhooks for a trade in a stable order, or nothing if no route wants it."""
+        values = trade_attributes(trade)
+        destinations = set(self.everywhere)
+        for dimension in DIMENSIONS:
+            bucket = self.index[dimension].get(values[dimension])
+            if bucket is None:
+                continue
+            destinations |= bucket.webhooks
+            for route in bucket.compound:
+                if not route.webhooks <= destinations and route.matches(values):
+                    destinations |= route.webhooks
+        return tuple(sorted(destinations))
+
+
+def load_routes(path: str) -> list[Route]:
+    """Load the routes from a YAML file holding a list of routes."""
+    yaml = YAML(typ="safe", pure=True)
+    with open(path, encoding="utf-8") as file_handle:
+        raw_routes = yaml.load(file_handle) or []
+    if not isinstance(raw_routes, list):
+        raise ValueError(f"{path} must contain a list of webhook routes")
+    return [Route(**x) for x in raw_routes]
+
+
+def create_router(config: Settings | None = None) -> Router:
+    """Compile the routes from `WEBHOOK_ROUTES_FILE`, optionally from settings that are not live yet."""
+    config = config or settings
+    return Router(load_routes(config.webhook_routes_file) if config.webhook_routes_file else [])
+
+
+_router: Router | None = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> Router:
+    """Get or create the configured router."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = create_router()
+        return _router
+
+
+def set_router(router: Router | None) -> Router | None:
+    """Replace the router, or pass None to rebuild it from the settings on next use."""
+    global _router
+    with _router_lock:
+        _router = router
+        return router
@@ -0,0 +1,110 @@
+"""Adaptive polling schedule for the patrons API."""
+
+import logging
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from thetagang_notifications.config import settings
+
+log = logging.getLogger(__name__)
+
+# Weight of the latest cycle in the moving average of the trade arrival rate.
+ARRIVAL_RATE_ALPHA = 0.3
+
+# Stop counting idle polls once the backoff is far past any sensible maximum.
+MAX_IDLE_CYCLES = 32
+
+
+class PollScheduler:
+    """Decide how long to wait before the next poll.
+
+    The base interval depends on whether the market is open. Trades flowing in
+    shorten it, and every poll that finds nothing backs it off, always within the
+    configured minimum and maximum.
+    """
+
+    def __init__(self) -> None:
+        """Constructor for PollScheduler."""
+        self.timezone = ZoneInfo(settings.market_timezone)
+        self.holidays: set[date] = set(settings.market_holidays_list)
+        # Moving average of trades per minute.
+        self.arrival_rate = 0.0
+        self.idle_cycles = 0
+        self._last_cycle: float | None = None
+        # Whether the market was open at the last schedule, to notice the opening bell.
+        self._was_open: bool | None = None
+
+    def market_is_open(self, now: datetime | None = None) -> bool:
+        """Check if the market is open."""
+        local = self._local(now)
+        return self.is_trading_day(local.date()) and settings.market_open <= local.time() < settings.market_close
+
+    def is_trading_day(self, day: date) -> bool:
+        """Check if the market trades on a day."""
+        return day.weekday() < 5 and day not in self.holidays
+
+    def seconds_until_open(self, now: datetime | None = None) -> float:
+        """Return the seconds until the market next opens."""
+        local = self._local(now)
+        day = local.date()
+        # Long weekends plus holidays never span more than a couple of weeks.
+        for _ in range(14):
+            if self.is_trading_day(day):
+                opens = datetime.combine(day, settings.market_open, tzinfo=self.timezone)
+                if opens > local:
+                    return (opens - local).total_seconds()
+            day += timedelta(days=1)
+        return settings.poll_max_interval
+
+    def record_cycle(self, trade_count: int) -> None:
+        """Update the arrival rate and idle streak after a poll."""
+        now = time.monotonic()
+        if self._last_cycle is not None:
+            minutes = max(now - self._last_cycle, 1.0) / 60
+            self.arrival_rate += ARRIVAL_RATE_ALPHA * (trade_count / minutes - self.arrival_rate)
+        self._last_cycle = now
+        self.idle_cycles = 0 if trade_count else min(self.idle_cycles + 1, MAX_IDLE_CYCLES)
+
+    def reset(self) -> None:
+        """Forget the idle streak, as after taking over from another replica."""
+        self.idle_cycles = 0
+        self._last_cycle = None
+
+    def state(self) -> dict:
+        """Return the learned state so a replacement process can pick it up."""
+        return {"arrival_rate": self.arrival_rate, "idle_cycles": self.idle_cycles}
+
+    def restore(self, state: dict) -> None:
+        """Pick up the learned state from a previous process."""
+        self.arrival_rate = float(state.get("arrival_rate", self.arrival_rate))
+        self.idle_cycles = min(int(state.get("idle_cycles", self.idle_cycles)), MAX_IDLE_CYCLES)
+
+    def next_interval(self, now: datetime | None = None) -> float:
+        """Return the seconds to wait before the next poll."""
+        is_open = self.market_is_open(now)
+        if is_open and self._was_open is False:
+            # A quiet night says nothing about the session, so start it without the backoff.
+            self.idle_cycles = 0
+        self._was_open = is_open
+        interval = settings.poll_market_interval if is_open else settings.poll_closed_interval
+
+        # Expecting one trade per base interval halves the interval, two thirds it,
+        # and so on, while each empty poll in a row backs it off again.
+        interval /= 1 + self.arrival_rate * interval / 60
+        interval *= settings.poll_idle_backoff**self.idle_cycles
+
+        interval = min(max(interval, settings.poll_min_interval), settings.poll_max_interval)
+
+        # Pushed trades arrive on their own, so polling only has to catch anything missed.
+        if settings.ingest_enabled:
+            interval = max(interval, settings.ingest_reconcile_interval)
+
+        # Never sleep through the opening bell, whatever the backoff.
+        if not is_open:
+            interval = min(interval, self.seconds_until_open(now))
+        return interval
+
+    def _local(self, now: datetime | None) -> datetime:
+        """Return the current time in the market timezone."""
+        return (now or datetime.now(self.timezone)).astimezone(self.timezone)
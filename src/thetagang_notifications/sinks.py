@@ -0,0 +1,165 @@
+"""Destinations that rendered notifications are delivered to."""
+
+import json
+import logging
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from http.client import HTTPException
+
+from discord_webhook import DiscordEmbed, DiscordWebhook
+
+from thetagang_notifications.config import settings
+from thetagang_notifications.webhook_health import get_webhook_health, redact_webhook
+
+log = logging.getLogger(__name__)
+
+# Most messages a memory sink keeps before dropping the oldest.
+MEMORY_SINK_MAX_MESSAGES = 10_000
+
+
+def build_webhook(webhook_url: str, message: list[DiscordEmbed]) -> DiscordWebhook:
+    """Build the webhook message for a list of embeds."""
+    webhook = DiscordWebhook(
+        url=webhook_url,
+        rate_limit_retry=True,
+        username=settings.discord_username,
+        timeout=settings.webhook_timeout,
+    )
+    for embed in message:
+        webhook.add_embed(embed)
+    return webhook
+
+
+class NotificationSink(ABC):
+    """Abstract destination for rendered notifications."""
+
+    @abstractmethod
+    def deliver(self, webhook_url: str, messages: list[list[DiscordEmbed]]) -> list[DiscordWebhook]:
+        """Deliver messages for one webhook in order and return the webhook objects."""
+        pass
+
+    def close(self) -> None:
+        """Release any resources held by the sink."""
+        pass
+
+
+class DiscordSink(NotificationSink):
+    """Send notifications to Discord while tracking the health of each webhook."""
+
+    def deliver(self, webhook_url: str, messages: list[list[DiscordEmbed]]) -> list[DiscordWebhook]:
+        """
+        📬 Send messages to one webhook in order while tracking its health.
+
+        A quarantined webhook is skipped without any network calls, except for the
+        occasional probe that checks whether it has recovered. Skipped messages are
+        logged and counted as dropped.
+
+        Returns:
+            List of executed webhook objects
+        """
+        health = get_webhook_health(webhook_url)
+        webhooks: list[DiscordWebhook] = []
+
+        for position, message in enumerate(messages):
+            if not health.allow_delivery():
+                skipped = len(messages) - position
+                health.record_skipped(skipped)
+                log.warning("🚧 Dropped %s messages for quarantined webhook %s", skipped, health.name)
+                break
+
+            webhook = build_webhook(webhook_url, message)
+            started = time.perf_counter()
+            try:
+                response = webhook.execute()
+                success = response.ok
+            except (OSError, ValueError, HTTPException) as e:
+                log.warning("⚠️ Webhook %s failed: %s", health.name, e)
+                success = False
+            health.record(success, time.perf_counter() - started)
+            webhooks.append(webhook)
+
+        return webhooks
+
+
+class JsonlFileSink(NotificationSink):
+    """Write each webhook message as a JSON line instead of sending it.
+
+    A path of `-` writes to stdout.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        """Constructor for JsonlFileSink."""
+        self.path = path or settings.notification_sink_path
+        self._file = sys.stdout if self.path == "-" else open(self.path, "a", encoding="utf-8")  # noqa: SIM115
+        self._lock = threading.Lock()
+
+    def deliver(self, webhook_url: str, messages: list[list[DiscordEmbed]]) -> list[DiscordWebhook]:
+        """Append one JSON line per message."""
+        webhooks = [build_webhook(webhook_url, message) for message in messages]
+        lines = [json.dumps({"webhook": redact_webhook(webhook_url), **webhook.json}) + "\n" for webhook in webhooks]
+        with self._lock:
+            self._file.writelines(lines)
+            self._file.flush()
+        return webhooks
+
+    def close(self) -> None:
+        """Close the file."""
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class MemorySink(NotificationSink):
+    """Keep the latest messages in memory, for tests and benchmarks.
+
+    Only the newest `max_messages` are kept so a long run does not grow without
+    bound, and `delivered` counts every message seen.
+    """
+
+    def __init__(self, max_messages: int = MEMORY_SINK_MAX_MESSAGES) -> None:
+        """Constructor for MemorySink."""
+        self.messages: deque[tuple[str, list[DiscordEmbed]]] = deque(maxlen=max_messages)
+        self.delivered = 0
+        self._lock = threading.Lock()
+
+    def deliver(self, webhook_url: str, messages: list[list[DiscordEmbed]]) -> list[DiscordWebhook]:
+        """Record the messages, dropping the oldest ones past the limit."""
+        with self._lock:
+            self.messages.extend((webhook_url, message) for message in messages)
+            self.delivered += len(messages)
+        return [build_webhook(webhook_url, message) for message in messages]
+
+
+_sink: NotificationSink | None = None
+_sink_lock = threading.Lock()
+
+
+def create_sink() -> NotificationSink:
+    """Create the sink chosen in the settings."""
+    available_sinks = {
+        "discord": DiscordSink,
+        "jsonl": JsonlFileSink,
+        "memory": MemorySink,
+    }
+    return available_sinks[settings.notification_sink]()
+
+
+def get_sink() -> NotificationSink:
+    """Get or create the configured sink."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = create_sink()
+        return _sink
+
+
+def set_sink(sink: NotificationSink | None) -> NotificationSink | None:
+    """Replace the sink, closing the old one, and return the new sink."""
+    global _sink
+    with _sink_lock:
+        if _sink is not None and _sink is not sink:
+            _sink.close()
+        _sink = sink
+        return sink
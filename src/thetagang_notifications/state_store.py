@@ -0,0 +1,351 @@
+"""Stores for the trade statuses used to dedupe notifications."""
+
+import importlib.util
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from redis import Redis
+from redis.cluster import RedisCluster
+
+from thetagang_notifications.config import Settings, settings
+from thetagang_notifications.exceptions import StateBackendError, StateStoreError
+
+log = logging.getLogger(__name__)
+
+# Most GUIDs bound to one SQLite statement, well under the variable limit.
+SQLITE_CHUNK_SIZE = 500
+# SQLite errors from bad statements or data, as opposed to a locked, full or corrupt database.
+SQLITE_BUGS = (sqlite3.IntegrityError, sqlite3.ProgrammingError, sqlite3.InterfaceError)
+# Key layout of the stored statuses, and the one used before the last change.
+LAYOUT_KEY = "tg:state:layout"
+PREVIOUS_LAYOUT_KEY = "tg:state:previous_layout"
+# Seconds to keep reading the previous layout's keys, well past the feed window.
+LAYOUT_FALLBACK_TTL = 7 * 86400
+
+
+def key_bucket(guid: str, buckets: int) -> int:
+    """Return the hash tag bucket for a trade in cluster mode."""
+    return zlib.crc32(guid.encode()) % buckets
+
+
+def status_key(guid: str, cluster_mode: bool, buckets: int) -> str:
+    """Return the Redis key for the status of a trade.
+
+    In cluster mode the key carries a hash tag so trades in the same bucket share
+    a slot, and single node mode keeps the bare GUIDs used so far.
+    """
+    if not cluster_mode:
+        return guid
+    return f"{{tg:{key_bucket(guid, buckets)}}}:{guid}"
+
+
+def parse_layout(layout: str) -> tuple[bool, int]:
+    """
+    Parse a key layout name such as "single" or "cluster:4".
+
+    Returns:
+        Whether the layout is for a cluster, and its number of hash tag buckets
+    """
+    if layout == "single":
+        return False, 1
+    return True, int(layout.removeprefix("cluster:"))
+
+
+@contextmanager
+def store_errors(
+    backend: str, errors: tuple[type[Exception], ...], bugs: tuple[type[Exception], ...] = ()
+) -> Iterator[None]:
+    """Raise the failures of an embedded store as `StateStoreError`, handled like a Redis outage.
+
+    Errors in `bugs` are subclasses of `errors` that mean bad data rather than an
+    unusable store, so they are raised unchanged.
+    """
+    try:
+        yield
+    except bugs:
+        raise
+    except errors as e:
+        raise StateStoreError(backend, str(e)) from e
+
+
+class StateStore(ABC):
+    """Key-value store of GUID to "open" or "closed", read and written in batches."""
+
+    # Name of the store in log messages
+    name = "state store"
+
+    @abstractmethod
+    def get_many(self, guids: list[str]) -> dict[str, str | None]:
+        """
+        Read the status of many trades at once.
+
+        Returns:
+            Status of every unique GUID, None for trades never stored
+        """
+
+    @abstractmethod
+    def set_many(self, statuses: list[tuple[str, str]]) -> None:
+        """Write the status of many trades in one batch."""
+
+    def close(self) -> None:  # noqa: B027
+        """Release the resources held by the store."""
+
+
+class RedisStateStore(StateStore):
+    """Trade statuses as plain Redis strings, one key per trade.
+
+    The key layout (bare GUIDs on a single node, hash-tagged keys in cluster mode)
+    is recorded in Redis. When the layout changes, trades missing under the new
+    keys are looked up under the old ones and copied forward for a while, so the
+    switch does not announce every trade in the feed window again.
+    """
+
+    name = "Redis"
+
+    def __init__(self, db_conn: Redis | RedisCluster, cluster_mode: bool = False, key_buckets: int = 1) -> None:
+        """Constructor for RedisStateStore."""
+        self.db_conn = db_conn
+        self.cluster_mode = cluster_mode
+        self.key_buckets = key_buckets
+        self._previous_layout: str | None = None
+        self._fallback_until: float | None = None
+
+    @property
+    def layout(self) -> str:
+        """Name of the key layout this store writes."""
+        return f"cluster:{self.key_buckets}" if self.cluster_mode else "single"
+
+    def previous_layout(self) -> str | None:
+        """
+        Return the layout to fall back to for trades missing under the current keys.
+
+        The first call records the current layout. Deployments without a recorded
+        layout predate cluster support and stored bare GUIDs.
+
+        Returns:
+            Previous layout while its keys are still read, otherwise None
+        """
+        if self._fallback_until is None:
+            recorded = self.db_conn.get(LAYOUT_KEY)
+            stored_layout = recorded or "single"
+            if stored_layout != self.layout:
+                log.warning(
+                    "⚠️ Trade status keys now use the %s layout, reading keys from the %s layout for %s days",
+                    self.layout,
+                    stored_layout,
+                    LAYOUT_FALLBACK_TTL // 86400,
+                )
+                self.db_conn.set(PREVIOUS_LAYOUT_KEY, stored_layout, ex=LAYOUT_FALLBACK_TTL)
+            if recorded != self.layout:
+                self.db_conn.set(LAYOUT_KEY, self.layout)
+            previous = self.db_conn.get(PREVIOUS_LAYOUT_KEY)
+            if previous is not None and previous != self.layout:
+                self._previous_layout = previous
+                self._fallback_until = time.monotonic() + max(int(self.db_conn.ttl(PREVIOUS_LAYOUT_KEY)), 0)
+            else:
+                self._fallback_until = 0.0
+
+        return self._previous_layout if time.monotonic() < self._fallback_until else None
+
+    def get_many(self, guids: list[str]) -> dict[str, str | None]:
+        """
+        Read the status of many trades at once.
+
+        Trades missing under the current keys are read under the previous layout's
+        keys, if there is one, and copied forward.
+
+        Returns:
+            Status of every unique GUID, None for trades never stored
+        """
+        unique = list(dict.fromkeys(guids))
+        if not unique:
+            return {}
+
+        statuses = dict(zip(unique, self._read(unique, self.cluster_mode, self.key_buckets), strict=True))
+        missing = [guid for guid, status in statuses.items() if status is None]
+        previous = self.previous_layout() if missing else None
+        if previous:
+            cluster_mode, buckets = parse_layout(previous)
+            found = {
+                guid: status
+                for guid, status in zip(missing, self._read(missing, cluster_mode, buckets), strict=True)
+                if status is not None
+            }
+            if found:
+                self.set_many(list(found.items()))
+                statuses.update(found)
+        return statuses
+
+    def _read(self, guids: list[str], cluster_mode: bool, buckets: int) -> list[str | None]:
+        """Read the keys of some trades in one round trip, or one per node in a cluster."""
+        keys = [status_key(x, cluster_mode, buckets) for x in guids]
+        if not self.cluster_mode:
+            return self.db_conn.mget(keys)
+
+        # Cluster pipelines refuse MGET, so queue one GET per key; the pipeline
+        # still sends a single batch to each node.
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.get(key)
+            return pipe.execute()
+
+    def set_many(self, statuses: list[tuple[str, str]]) -> None:
+        """Write the status of many trades in one pipeline."""
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for guid, status in statuses:
+                pipe.set(status_key(guid, self.cluster_mode, self.key_buckets), status)
+            pipe.execute()
+
+
+class SQLiteStateStore(StateStore):
+    """Trade statuses in a local SQLite file, for deployments without Redis.
+
+    The database runs in WAL mode so reads never wait on the writer, and every
+    batch is written in a single transaction with one fsync at checkpoint time
+    instead of one per trade. A locked, full or unreadable database raises
+    `StateStoreError`.
+    """
+
+    name = "SQLite"
+
+    def __init__(self, path: str | Path) -> None:
+        """Constructor for SQLiteStateStore."""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        # The file is first read on use, so a corrupt one is a store failure rather than a crash at startup.
+        self._prepared = False
+
+    def _prepare(self) -> None:
+        """Switch to WAL mode and create the table on first use. The lock must be held."""
+        if self._prepared:
+            return
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS trade_status (guid TEXT PRIMARY KEY, status TEXT NOT NULL) WITHOUT ROWID"
+        )
+        self._prepared = True
+
+    def get_many(self, guids: list[str]) -> dict[str, str | None]:
+        """
+        Read the status of many trades with one query per chunk of GUIDs.
+
+        Returns:
+            Status of every unique GUID, None for trades never stored
+        """
+        statuses: dict[str, str | None] = dict.fromkeys(guids)
+        unique = list(statuses)
+        with self._lock, store_errors("sqlite", (sqlite3.DatabaseError,), SQLITE_BUGS):
+            self._prepare()
+            for start in range(0, len(unique), SQLITE_CHUNK_SIZE):
+                chunk = unique[start : start + SQLITE_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(f"SELECT guid, status FROM trade_status WHERE guid IN ({placeholders})", chunk)
+                statuses.update(rows)
+        return statuses
+
+    def set_many(self, statuses: list[tuple[str, str]]) -> None:
+        """Write the status of many trades in one transaction."""
+        if not statuses:
+            return
+        with self._lock, store_errors("sqlite", (sqlite3.DatabaseError,), SQLITE_BUGS):
+            self._prepare()
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO trade_status (guid, status) VALUES (?, ?) "
+                    "ON CONFLICT (guid) DO UPDATE SET status = excluded.status",
+                    statuses,
+                )
+            except BaseException:
+                # Some failures, such as a full disk, already rolled the transaction back.
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """Close the database, folding the WAL back into the main file."""
+        with self._lock:
+            self.conn.close()
+
+
+class LMDBStateStore(StateStore):
+    """Trade statuses in a memory-mapped LMDB environment.
+
+    Reads go straight to the page cache through the memory map without a query
+    layer, and each batch is one write transaction. Needs the `lmdb` extra, and
+    LMDB failures such as a full map raise `StateStoreError`.
+    """
+
+    name = "LMDB"
+
+    def __init__(self, path: str | Path, map_size: int) -> None:
+        """Constructor for LMDBStateStore."""
+        if importlib.util.find_spec("lmdb") is None:
+            raise StateBackendError("lmdb", "the lmdb package is not installed")
+        import lmdb
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.env = lmdb.open(str(self.path), map_size=map_size, max_dbs=0)
+        self._errors = (lmdb.Error,)
+
+    def get_many(self, guids: list[str]) -> dict[str, str | None]:
+        """
+        Read the status of many trades in one read transaction.
+
+        Returns:
+            Status of every unique GUID, None for trades never stored
+        """
+        statuses: dict[str, str | None] = {}
+        with store_errors("lmdb", self._errors), self.env.begin() as txn:
+            for guid in dict.fromkeys(guids):
+                value = txn.get(guid.encode())
+                statuses[guid] = value.decode() if value is not None else None
+        return statuses
+
+    def set_many(self, statuses: list[tuple[str, str]]) -> None:
+        """Write the status of many trades in one write transaction."""
+        if not statuses:
+            return
+        with store_errors("lmdb", self._errors), self.env.begin(write=True) as txn:
+            txn.cursor().putmulti([(guid.encode(), status.encode()) for guid, status in statuses])
+
+    def close(self) -> None:
+        """Close the LMDB environment."""
+        self.env.close()
+
+
+def create_state_store(db_conn: Redis | RedisCluster | None, config: Settings | None = None) -> StateStore:
+    """
+    Create the trade status store picked by `STATE_BACKEND`.
+
+    The Redis store shares the connection it is given, and the embedded stores
+    keep their data at `STATE_PATH` and need no connection.
+
+    Returns:
+        Store for the trade statuses
+
+    Raises:
+        StateBackendError: If the Redis backend is picked without a connection
+    """
+    config = config or settings
+    if config.state_backend == "sqlite":
+        log.info("🗄️ Keeping trade statuses in SQLite at %s", config.state_path)
+        return SQLiteStateStore(config.state_path)
+    if config.state_backend == "lmdb":
+        log.info("🗄️ Keeping trade statuses in LMDB at %s", config.state_path)
+        return LMDBStateStore(config.state_path, config.state_lmdb_map_size)
+    if db_conn is None:
+        raise StateBackendError("redis", "no Redis connection was given")
+    return RedisStateStore(db_conn, config.redis_mode == "cluster", config.redis_hash_tag_buckets)
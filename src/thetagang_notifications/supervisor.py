@@ -0,0 +1,269 @@
+"""Run the daemon in a child process and recycle it before it outgrows its limits.
+
+The supervisor starts the daemon as a child and reads a report from it after
+every cycle. When the child's RSS or cycle time crosses a limit, the supervisor
+asks it to drain. The child finishes the cycle it is in, releases its resources
+and exits, and a fresh child takes over. The dedupe state lives in Redis, so the
+new child neither misses nor repeats trades. The small amount of state that only
+lives in memory, like the learned poll schedule, is handed over through the
+environment.
+"""
+
+import json
+import logging
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from typing import IO
+
+from thetagang_notifications.config import settings
+
+log = logging.getLogger(__name__)
+
+# The child writes its cycle reports to this file descriptor.
+REPORT_FD_ENV = "THETAGANG_SUPERVISOR_FD"
+# State handed over from the previous child, as JSON.
+HANDOVER_ENV = "THETAGANG_HANDOVER"
+# Signal that asks a child to exit after its current cycle.
+DRAIN_SIGNAL = signal.SIGUSR2
+# Longest a supervised child sleeps before checking for a drain request.
+DRAIN_CHECK_INTERVAL = 1.0
+# Longest wait before restarting a child that keeps crashing.
+MAX_RESTART_BACKOFF = 60.0
+# Seconds a child must run before its crash starts the restart backoff over.
+STABLE_RUN_SECONDS = 300.0
+
+MIB = 1024 * 1024
+
+
+def read_rss(pid: int) -> int:
+    """Return the resident set size of a process in bytes, or 0 if it is unknown."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+class SupervisorLink:
+    """The child's side of the supervisor: cycle reports, drain requests and handover state.
+
+    Outside a supervisor every method is a no-op, so the daemon runs unchanged.
+    """
+
+    def __init__(self, environ: dict[str, str] | None = None) -> None:
+        """Constructor for SupervisorLink."""
+        environ = os.environ if environ is None else environ
+        report_fd = environ.get(REPORT_FD_ENV)
+        self.stream: IO[str] | None = os.fdopen(int(report_fd), "w", buffering=1) if report_fd else None
+        self.handover: dict = json.loads(environ.get(HANDOVER_ENV) or "{}")
+        self.draining = False
+
+    @property
+    def supervised(self) -> bool:
+        """Check if a supervisor started this process."""
+        return self.stream is not None
+
+    def install(self) -> None:
+        """Listen for drain requests from the supervisor."""
+        if self.supervised:
+            signal.signal(DRAIN_SIGNAL, self.request_drain)
+
+    def request_drain(self, *_args: object) -> None:
+        """Exit after the current cycle (safe to use as a signal handler)."""
+        self.draining = True
+
+    def sleep_interval(self, delay: float) -> float:
+        """Cap sleeps so a drain request is noticed quickly."""
+        return min(delay, DRAIN_CHECK_INTERVAL) if self.supervised else delay
+
+    def cycle_started(self) -> None:
+        """Tell the supervisor that a cycle has started."""
+        self._send({"event": "cycle_started"})
+
+    def cycle_finished(self, seconds: float, trades: int, state: dict) -> None:
+        """Tell the supervisor how long the cycle took and what to hand over."""
+        self._send({"event": "cycle_finished", "seconds": seconds, "trades": trades, "state": state})
+
+    def _send(self, message: dict) -> None:
+        """Write one report line to the supervisor."""
+        if self.stream is None:
+            return
+        try:
+            self.stream.write(json.dumps(message) + "\n")
+        except OSError as e:
+            log.warning("⚠️ Lost the supervisor: %s", e)
+            self.stream = None
+
+
+class Supervisor:
+    """Keep one child running and recycle it when it crosses a limit."""
+
+    def __init__(
+        self,
+        command: list[str],
+        max_rss: float | None = None,
+        max_cycle_seconds: float | None = None,
+        drain_timeout: float | None = None,
+        check_interval: float | None = None,
+    ) -> None:
+        """Constructor for Supervisor."""
+        self.command = command
+        self.max_rss = (settings.supervisor_max_rss_mb * MIB) if max_rss is None else max_rss
+        self.max_cycle_seconds = settings.supervisor_max_cycle_seconds if max_cycle_seconds is None else max_cycle_seconds
+        self.drain_timeout = drain_timeout or settings.supervisor_drain_timeout
+        self.check_interval = check_interval or settings.supervisor_check_interval
+        self.child: subprocess.Popen | None = None
+        # Reports are tagged with the generation of the child that sent them.
+        self.reports: queue.Queue[tuple[int, dict]] = queue.Queue()
+        self.generation = 0
+        self.started_at = 0.0
+        self.handover: dict = {}
+        self.cycle_started_at: float | None = None
+        self.recycles = 0
+        self.crashes = 0
+        self.stopping = False
+
+    def start_child(self) -> None:
+        """Start a child with a report pipe and the handover state."""
+        read_fd, write_fd = os.pipe()
+        env = {**os.environ, REPORT_FD_ENV: str(write_fd), HANDOVER_ENV: json.dumps(self.handover)}
+        self.child = subprocess.Popen(self.command, env=env, pass_fds=(write_fd,))
+        os.close(write_fd)
+        self.generation += 1
+        self.started_at = time.monotonic()
+        self.cycle_started_at = None
+        # The reader thread ends by itself when the child closes its end of the pipe.
+        threading.Thread(target=self._read_reports, args=(os.fdopen(read_fd), self.generation), daemon=True).start()
+        log.info("👶 Started child %s", self.child.pid)
+
+    def _read_reports(self, stream: IO[str], generation: int) -> None:
+        """Queue every report line from a child, tagged with its generation."""
+        with stream:
+            for line in stream:
+                try:
+                    self.reports.put((generation, json.loads(line)))
+                except ValueError:
+                    log.warning("⚠️ Ignoring a bad report from the child: %r", line)
+
+    def next_report(self, timeout: float = 0.0) -> dict | None:
+        """
+        Wait up to timeout seconds for the next report from the current child.
+
+        Reports still queued from an earlier child are dropped, so a late report
+        from a drained child cannot recycle its replacement or overwrite the
+        handover state.
+
+        Returns:
+            Next report from the current child, or None if none arrived in time
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                generation, report = self.reports.get(timeout=remaining) if remaining > 0 else self.reports.get_nowait()
+            except queue.Empty:
+                return None
+            if generation == self.generation:
+                return report
+            log.debug("Ignoring a report from an earlier child: %r", report)
+
+    def recycle_reason(self, now: float | None = None) -> str | None:
+        """Return why the child should be recycled, or None if it is healthy."""
+        if self.child is None:
+            return None
+
+        rss = read_rss(self.child.pid)
+        if self.max_rss and rss > self.max_rss:
+            return f"RSS {rss / MIB:.0f} MiB is over {self.max_rss / MIB:.0f} MiB"
+
+        now = time.monotonic() if now is None else now
+        if self.max_cycle_seconds and self.cycle_started_at is not None:
+            running = now - self.cycle_started_at
+            if running > self.max_cycle_seconds:
+                return f"the current cycle has run for {running:.1f}s"
+        return None
+
+    def handle_report(self, report: dict) -> str | None:
+        """Track a report from the child and return a recycle reason if it has one."""
+        if report.get("event") == "cycle_started":
+            self.cycle_started_at = time.monotonic()
+            return None
+
+        self.cycle_started_at = None
+        self.handover = report.get("state", self.handover)
+        seconds = report.get("seconds", 0.0)
+        if self.max_cycle_seconds and seconds > self.max_cycle_seconds:
+            return f"the last cycle took {seconds:.1f}s"
+        return self.recycle_reason()
+
+    def step(self) -> None:
+        """Wait for the next report or health check and act on it."""
+        if self.child is None:
+            self.start_child()
+
+        report = self.next_report(self.check_interval)
+        reason = self.recycle_reason() if report is None else self.handle_report(report)
+
+        if reason is not None:
+            log.warning("♻️ Recycling child %s: %s", self.child.pid, reason)
+            self.drain()
+            self.recycles += 1
+            return
+
+        returncode = self.child.poll()
+        if returncode is not None:
+            if time.monotonic() - self.started_at >= STABLE_RUN_SECONDS:
+                # The child ran fine for a while, so this is a fresh failure rather than a crash loop.
+                self.crashes = 0
+            self.crashes += 1
+            backoff = min(2.0 ** (self.crashes - 1), MAX_RESTART_BACKOFF)
+            log.error("💥 Child %s exited with code %s, restarting in %.0fs", self.child.pid, returncode, backoff)
+            self.child = None
+            time.sleep(backoff)
+
+    def drain(self) -> None:
+        """Ask the child to exit after its cycle, and kill it if it takes too long."""
+        if self.child is None:
+            return
+
+        if self.child.poll() is None:
+            self.child.send_signal(DRAIN_SIGNAL)
+            try:
+                self.child.wait(timeout=self.drain_timeout)
+            except subprocess.TimeoutExpired:
+                log.error("🔪 Child %s did not drain within %.0fs, killing it", self.child.pid, self.drain_timeout)
+                self.child.kill()
+                self.child.wait()
+
+        # Keep the handover state from any report that arrived while draining.
+        while (report := self.next_report()) is not None:
+            self.handle_report(report)
+        self.child = None
+        self.crashes = 0
+
+    def forward_reload(self, *_args: object) -> None:
+        """Pass a reload request on to the child, which owns the configuration (safe to use as a signal handler)."""
+        if self.child is not None and self.child.poll() is None:
+            self.child.send_signal(signal.SIGHUP)
+
+    def stop(self, *_args: object) -> None:
+        """Stop supervising after draining the child (safe to use as a signal handler)."""
+        self.stopping = True
+
+    def run(self) -> None:
+        """Supervise children until asked to stop."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self.forward_reload)
+        log.info("🛡️ Supervising %s", " ".join(self.command))
+        while not self.stopping:
+            self.step()
+        self.drain()
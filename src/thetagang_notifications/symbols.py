@@ -0,0 +1,178 @@
+"""Cache logos and company names for ticker symbols."""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from pydantic import ValidationError
+from redis import Redis
+from redis.cluster import RedisCluster
+
+from thetagang_notifications.config import settings
+from thetagang_notifications.journal import REDIS_OUTAGE_ERRORS
+from thetagang_notifications.models import SymbolMetadata
+from thetagang_notifications.transport import get_http_client
+
+log = logging.getLogger(__name__)
+
+STOCK_LOGO = "https://static.stocktitan.net/company-logo/%s.webp"
+
+# One hash tag for every symbol key keeps bulk reads on one Redis Cluster slot.
+SYMBOL_KEY = "{symbols}:%s"
+
+
+class SymbolCache:
+    """Symbol metadata in an in-memory LRU backed by Redis with a TTL.
+
+    Rendering only ever reads the in-memory cache. The symbols in a cycle are
+    prefetched in bulk before rendering, first from Redis and then with
+    concurrent lookups for anything Redis does not know about. A lookup that
+    found no logo or name may have hit a passing outage, so it is only kept for
+    `symbol_retry_ttl` before the symbol is looked up again.
+    """
+
+    def __init__(self, db_conn: Redis | RedisCluster | None = None) -> None:
+        """Constructor for SymbolCache."""
+        self.db_conn = db_conn
+        self._lru: OrderedDict[str, SymbolMetadata] = OrderedDict()
+        # When to look up again the symbols whose metadata is incomplete
+        self._retry_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str) -> SymbolMetadata | None:
+        """Return cached metadata for a symbol without any I/O."""
+        symbol = symbol.upper()
+        with self._lock:
+            retry_at = self._retry_at.get(symbol)
+            if retry_at is not None and time.monotonic() >= retry_at:
+                del self._retry_at[symbol]
+                self._lru.pop(symbol, None)
+                return None
+            metadata = self._lru.get(symbol)
+            if metadata is not None:
+                self._lru.move_to_end(symbol)
+            return metadata
+
+    def thumbnail_url(self, symbol: str) -> str:
+        """Return the thumbnail for a symbol, guessing the logo if it is not cached."""
+        metadata = self.get(symbol)
+        return metadata.thumbnail_url if metadata else STOCK_LOGO % symbol.lower()
+
+    def put(self, metadata: SymbolMetadata) -> None:
+        """Add metadata to the in-memory cache, for a short while if it is incomplete."""
+        with self._lock:
+            self._lru[metadata.symbol] = metadata
+            self._lru.move_to_end(metadata.symbol)
+            if metadata.complete:
+                self._retry_at.pop(metadata.symbol, None)
+            else:
+                self._retry_at[metadata.symbol] = time.monotonic() + settings.symbol_retry_ttl
+            while len(self._lru) > settings.symbol_cache_size:
+                evicted, _ = self._lru.popitem(last=False)
+                self._retry_at.pop(evicted, None)
+
+    def prefetch(self, symbols: Iterable[str]) -> None:
+        """Load metadata for every symbol that is not cached in memory yet."""
+        missing = sorted({x.upper() for x in symbols if self.get(x) is None})
+        if not missing:
+            return
+
+        missing = self._load_from_redis(missing)
+        if not missing:
+            return
+
+        with ThreadPoolExecutor(max_workers=settings.symbol_prefetch_concurrency) as pool:
+            resolved = list(pool.map(resolve_symbol, missing))
+
+        for metadata in resolved:
+            self.put(metadata)
+        self._store_in_redis(resolved)
+        log.info("🏷️ Prefetched metadata for %s symbols", len(resolved))
+
+    def _load_from_redis(self, symbols: list[str]) -> list[str]:
+        """Fill the in-memory cache from Redis and return the symbols still missing."""
+        if self.db_conn is None:
+            return symbols
+
+        try:
+            values = self.db_conn.mget([SYMBOL_KEY % x for x in symbols])
+        except REDIS_OUTAGE_ERRORS as e:
+            log.warning("⚠️ Could not read symbol metadata from Redis: %s", e)
+            return symbols
+        missing = []
+        corrupt = []
+        for symbol, value in zip(symbols, values, strict=True):
+            if value is None:
+                missing.append(symbol)
+                continue
+            try:
+                self.put(SymbolMetadata.model_validate_json(value))
+            except ValidationError:
+                # A stale or corrupt entry is looked up again like any other miss.
+                missing.append(symbol)
+                corrupt.append(SYMBOL_KEY % symbol)
+        if corrupt:
+            log.warning("⚠️ Dropping unreadable symbol metadata from Redis: %s", ", ".join(corrupt))
+            try:
+                self.db_conn.delete(*corrupt)
+            except REDIS_OUTAGE_ERRORS as e:
+                log.warning("⚠️ Could not delete symbol metadata from Redis: %s", e)
+        return missing
+
+    def _store_in_redis(self, resolved: list[SymbolMetadata]) -> None:
+        """Save resolved metadata to Redis, with a short TTL when it is incomplete."""
+        if self.db_conn is None:
+            return
+
+        try:
+            with self.db_conn.pipeline(transaction=False) as pipe:
+                for metadata in resolved:
+                    ttl = settings.symbol_cache_ttl if metadata.complete else settings.symbol_retry_ttl
+                    pipe.set(SYMBOL_KEY % metadata.symbol, metadata.model_dump_json(), ex=ttl)
+                pipe.execute()
+        except REDIS_OUTAGE_ERRORS as e:
+            log.warning("⚠️ Could not save symbol metadata to Redis: %s", e)
+
+
+def resolve_symbol(symbol: str) -> SymbolMetadata:
+    """Look up the logo and company name for a symbol."""
+    return SymbolMetadata(
+        symbol=symbol,
+        logo_url=find_logo(symbol),
+        fallback_logo_url=settings.symbol_fallback_logo,
+        company_name=find_company_name(symbol),
+    )
+
+
+def find_logo(symbol: str) -> str | None:
+    """Return the logo URL for a symbol if the logo exists."""
+    url = STOCK_LOGO % symbol.lower()
+    try:
+        response = get_http_client().head(url)
+    except httpx.HTTPError as e:
+        log.debug("Logo lookup failed for %s: %s", symbol, e)
+        return None
+    return url if response.is_success else None
+
+
+def find_company_name(symbol: str) -> str | None:
+    """Return the company name for a symbol."""
+    try:
+        response = get_http_client().get(settings.symbol_name_url, params={"q": symbol, "quotesCount": 1})
+        quotes = response.raise_for_status().json().get("quotes", [])
+    except (httpx.HTTPError, ValueError) as e:
+        log.debug("Company name lookup failed for %s: %s", symbol, e)
+        return None
+
+    quote = next((x for x in quotes if x.get("symbol", "").upper() == symbol), None)
+    if quote is None:
+        return None
+    return quote.get("longname") or quote.get("shortname")
+
+
+# Shared cache used while rendering notifications.
+symbol_cache = SymbolCache()
@@ -1,7 +1,6 @@
 """Parse trades and send notifications."""
 
 import logging
-from functools import lru_cache
 
 from pydantic import ValidationError
 from ruyaml import YAML
@@ -39,18 +38,43 @@ __all__ = [
 # Exceptions are already imported and available for export
 
 
-@lru_cache(maxsize=32)
-def get_spec_data(trade_type: str) -> TradeSpec:
-    """Get the spec data for a trade type.
-
-    🔧 Cached to avoid repeated YAML file I/O on every Trade creation.
-    The trade_specs.yml file is static, so caching is safe.
-    """
+def read_trade_specs(path: str) -> dict[str, TradeSpec]:
+    """Parse and validate every trade spec in a file, keyed by trade type."""
     yaml = YAML(typ='safe', pure=True)
-    with open(settings.trade_spec_file, encoding="utf-8") as file_handle:
+    with open(path, encoding="utf-8") as file_handle:
         spec_data = yaml.load(file_handle)
-    raw_spec = next(x for x in spec_data if x["type"] == trade_type)
-    return TradeSpec(**raw_spec)
+    return {x["type"]: TradeSpec(**x) for x in spec_data}
+
+
+# Validated specs for every trade type, loaded on first use
+_trade_specs: dict[str, TradeSpec] | None = None
+
+
+def load_trade_specs() -> dict[str, TradeSpec]:
+    """Return every trade spec, keyed by trade type.
+
+    🔧 The spec file is parsed once per process, since the pure Python YAML parser
+    is by far the slowest part of rendering the first trade of each type.
+    """
+    global _trade_specs
+    if _trade_specs is None:
+        _trade_specs = read_trade_specs(settings.trade_spec_file)
+    return _trade_specs
+
+
+def set_trade_specs(specs: dict[str, TradeSpec] | None) -> None:
+    """Swap in new trade specs, or pass None to reload the spec file on next use.
+
+    The registry is replaced with one assignment, so a trade sees either the old
+    specs or the new ones and never a mix.
+    """
+    global _trade_specs
+    _trade_specs = specs
+
+
+def get_spec_data(trade_type: str) -> TradeSpec:
+    """Get the spec data for a trade type."""
+    return load_trade_specs()[trade_type]
 
 
 class Trade:
@@ -106,6 +130,13 @@ class Trade:
         self.is_loser = not self.data.win
         self.status = self.data.status
         self.result = self.data.result
+        # Related trades that the queue collapsed into this notification
+        self.rolled_from = get_trade_class(trade["rolled_from"]) if trade.get("rolled_from") else None
+        if self.rolled_from is not None:
+            self.status = "rolled"
+        elif trade.get("opened_and_closed") and self.is_closed:
+            self.status = "opened and closed"
+
         self.trade_emoji = settings.emoji_assigned if self.is_assigned else settings.emoji_winner if self.is_winner else settings.emoji_loser
         
         # Calculate percentage profit for closed option trades
@@ -0,0 +1,229 @@
+"""Secondary indexes for looking up trades by user, symbol, type and day."""
+
+import logging
+import time
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+from dateutil import parser
+from redis import Redis
+from redis.cluster import RedisCluster
+
+from thetagang_notifications.config import settings
+
+log = logging.getLogger(__name__)
+
+# The index each supported combination of filters is answered from.
+LOOKUPS = {
+    frozenset({"user"}): "user",
+    frozenset({"symbol"}): "symbol",
+    frozenset({"trade_type"}): "type",
+    frozenset({"day"}): "date",
+    frozenset({"user", "symbol"}): "user_symbol",
+}
+
+
+@dataclass(frozen=True)
+class IndexedTrade:
+    """The fields of a trade kept alongside the indexes."""
+
+    guid: str
+    username: str
+    symbol: str
+    trade_type: str
+    status: str
+    updated_at: float
+
+    @classmethod
+    def from_trade(cls, trade: dict) -> "IndexedTrade":
+        """Build the index entry for a trade from the patrons feed."""
+        return cls(
+            guid=trade["guid"],
+            username=trade["User"]["username"],
+            symbol=trade["symbol"].upper(),
+            trade_type=trade["type"],
+            status="closed" if trade["close_date"] else "open",
+            updated_at=parser.isoparse(trade["updatedAt"]).timestamp(),
+        )
+
+    @classmethod
+    def from_hash(cls, raw: dict[str, str]) -> "IndexedTrade":
+        """Build the index entry from its Redis hash."""
+        return cls(**{**raw, "updated_at": float(raw["updated_at"])})
+
+    @property
+    def day(self) -> str:
+        """Return the day the trade was last updated, in UTC."""
+        return datetime.fromtimestamp(self.updated_at, timezone.utc).date().isoformat()
+
+    def index_values(self) -> dict[str, str]:
+        """Return the value this trade has in every index."""
+        return {
+            "user": self.username,
+            "symbol": self.symbol,
+            "type": self.trade_type,
+            "date": self.day,
+            "user_symbol": f"{self.username}:{self.symbol}",
+        }
+
+
+class TradeIndex:
+    """Keep sorted sets of trade GUIDs per user, symbol, type, day and user and symbol.
+
+    Every index is scored by `updatedAt`, so a page of the newest trades for any
+    supported filter is one `ZREVRANGE` in O(log n + page size). The last indexed
+    state of each trade is kept in a small hash so that when a trade closes, the
+    entries it left under its old day are moved instead of going stale. One more
+    sorted set holds every indexed trade by `updatedAt`, so `prune` finds the
+    oldest trades without scanning the buckets.
+    """
+
+    def __init__(self, db_conn: Redis | RedisCluster, prefix: str | None = None) -> None:
+        """Constructor for TradeIndex."""
+        self.db_conn = db_conn
+        self.prefix = prefix or settings.trade_index_prefix
+
+    def index_key(self, index: str, value: str) -> str:
+        """Return the key of one index bucket."""
+        return f"{self.prefix}:{index}:{value}"
+
+    def entry_key(self, guid: str) -> str:
+        """Return the key of the indexed state of a trade."""
+        return f"{self.prefix}:trade:{guid}"
+
+    @property
+    def all_key(self) -> str:
+        """Return the key of every indexed trade, scored by update time."""
+        return f"{self.prefix}:all"
+
+    def update(self, trades: Iterable[dict]) -> int:
+        """
+        Index new trades and move changed ones to their new buckets.
+
+        Returns:
+            Number of trades indexed
+        """
+        entries: dict[str, IndexedTrade] = {}
+        for trade in trades:
+            for related in (trade, trade.get("rolled_from")):
+                if related:
+                    entry = IndexedTrade.from_trade(related)
+                    if entry.guid not in entries or entry.updated_at >= entries[entry.guid].updated_at:
+                        entries[entry.guid] = entry
+        if not entries:
+            return 0
+
+        previous = self._fetch_entries(list(entries))
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for guid, entry in entries.items():
+                values = entry.index_values()
+                old = previous.get(guid)
+                if old is not None:
+                    for index, value in old.index_values().items():
+                        if values[index] != value:
+                            pipe.zrem(self.index_key(index, value), guid)
+                for index, value in values.items():
+                    pipe.zadd(self.index_key(index, value), {guid: entry.updated_at})
+                pipe.zadd(self.all_key, {guid: entry.updated_at})
+                pipe.hset(self.entry_key(guid), mapping=asdict(entry))
+            pipe.execute()
+
+        log.info("🗂️ Indexed %s trades", len(entries))
+        return len(entries)
+
+    def remove(self, guids: Iterable[str]) -> int:
+        """
+        Drop trades from every index.
+
+        Returns:
+            Number of trades that were indexed
+        """
+        guids = list(dict.fromkeys(guids))
+        if not guids:
+            return 0
+
+        previous = self._fetch_entries(guids)
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for guid, entry in previous.items():
+                for index, value in entry.index_values().items():
+                    pipe.zrem(self.index_key(index, value), guid)
+                pipe.delete(self.entry_key(guid))
+            pipe.zrem(self.all_key, *guids)
+            pipe.execute()
+        return len(previous)
+
+    def prune(self, now: float | None = None, limit: int = 1000) -> int:
+        """
+        Drop trades not updated within `trade_index_max_age`, then the oldest beyond `trade_index_max_trades`.
+
+        Only the trades being dropped are read, so the cost depends on what aged
+        out since the last prune and not on the size of the indexes.
+
+        Returns:
+            Number of trades dropped
+        """
+        now = time.time() if now is None else now
+        cutoff = now - settings.trade_index_max_age
+        expired = self.db_conn.zrangebyscore(self.all_key, "-inf", cutoff, start=0, num=limit)
+        over_limit = self.db_conn.zcard(self.all_key) - len(expired) - settings.trade_index_max_trades
+        excess = min(over_limit, limit - len(expired))
+        if excess > 0:
+            # The expired trades are the oldest, so the excess starts right after them.
+            expired += self.db_conn.zrange(self.all_key, len(expired), len(expired) + excess - 1)
+        if not expired:
+            return 0
+
+        self.remove(expired)
+        log.info("🧹 Pruned %s trades from the trade indexes", len(expired))
+        return len(expired)
+
+    def lookup(
+        self,
+        user: str | None = None,
+        symbol: str | None = None,
+        trade_type: str | None = None,
+        day: str | None = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> list[IndexedTrade]:
+        """
+        Return a page of trades matching the filters, newest first.
+
+        Supported filters are a user, a symbol, a trade type, a day (YYYY-MM-DD) or a
+        user and symbol together.
+
+        Returns:
+            Up to `limit` trades starting at `offset`
+        """
+        key = self._lookup_key(user=user, symbol=symbol, trade_type=trade_type, day=day)
+        guids = self.db_conn.zrevrange(key, offset, offset + limit - 1) if limit > 0 else []
+        entries = self._fetch_entries(guids)
+        return [entries[x] for x in guids if x in entries]
+
+    def count(
+        self, user: str | None = None, symbol: str | None = None, trade_type: str | None = None, day: str | None = None
+    ) -> int:
+        """Return how many trades match the filters."""
+        return self.db_conn.zcard(self._lookup_key(user=user, symbol=symbol, trade_type=trade_type, day=day))
+
+    def _lookup_key(self, **filters: str | None) -> str:
+        """Return the index bucket that answers a combination of filters."""
+        given = {name: value for name, value in filters.items() if value is not None}
+        index = LOOKUPS.get(frozenset(given))
+        if index is None:
+            raise ValueError(f"Unsupported trade lookup: {', '.join(sorted(given)) or 'no filters'}")
+        if "symbol" in given:
+            given["symbol"] = given["symbol"].upper()
+        value = f"{given['user']}:{given['symbol']}" if index == "user_symbol" else next(iter(given.values()))
+        return self.index_key(index, value)
+
+    def _fetch_entries(self, guids: list[str]) -> dict[str, IndexedTrade]:
+        """Read the indexed state of many trades in one pipeline."""
+        if not guids:
+            return {}
+        with self.db_conn.pipeline(transaction=False) as pipe:
+            for guid in guids:
+                pipe.hgetall(self.entry_key(guid))
+            results = pipe.execute()
+        return {guid: IndexedTrade.from_hash(raw) for guid, raw in zip(guids, results, strict=True) if raw}
@@ -1,16 +1,104 @@
 """Build queues for trade notifications from thetagang.com."""
 
 import logging
+import random
+import time
+from collections import defaultdict, deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
 
 import httpx
 from dateutil import parser
 from redis import Redis
+from redis.cluster import RedisCluster
 
+from thetagang_notifications.circuit import OPEN, CircuitBreaker
 from thetagang_notifications.config import settings
+from thetagang_notifications.filters import build_trade_filter
+from thetagang_notifications.journal import STORE_OUTAGE_ERRORS, StatusJournal
+from thetagang_notifications.state_store import RedisStateStore, create_state_store
+from thetagang_notifications.transport import create_http_client, prewarm
 
 log = logging.getLogger(__name__)
 
+# Recent feed latencies used to decide when to send a hedged request.
+MAX_LATENCY_SAMPLES = 100
+MIN_HEDGE_SAMPLES = 10
+# Feed requests in flight at once, counting hedges and the losers left to finish.
+FEED_WORKERS = 4
+# Stock trades always show as open, which would hide the closed side of a roll.
+STOCK_TRADE_TYPES = frozenset({"BUY COMMON STOCK", "SELL COMMON STOCK"})
+# Statuses remembered from the state store to dedupe against while it is down.
+MAX_KNOWN_STATUSES = 5000
+# Shortest seconds between snapshots of those statuses while the store is healthy.
+SNAPSHOT_INTERVAL = 300.0
+
+
+def related_trade_key(trade: dict) -> tuple[str, str | None, str | None]:
+    """Return the key used to match related trades: user, symbol and trade type."""
+    return (trade["User"]["username"], trade.get("symbol"), trade.get("type"))
+
+
+def is_roll(closed: dict, opened: dict) -> bool:
+    """Check if a trade was opened no earlier than `roll_window` seconds after another closed."""
+    try:
+        gap = parser.parse(opened["updatedAt"]) - parser.parse(closed["close_date"])
+    except (ValueError, TypeError, OverflowError):
+        return False
+    return timedelta(0) <= gap <= timedelta(seconds=settings.roll_window)
+
+
+def collapse_related_trades(trades: list[dict], new_guids: set[str]) -> list[dict]:
+    """Collapse related trades from one cycle into combined notifications.
+
+    A closed trade followed within `roll_window` by a new open trade for the same
+    user, symbol and trade type is a roll, so the two become one trade with a
+    `rolled_from` key. A trade we had never seen that is already closed was opened
+    and closed inside one poll window, so it is flagged with `opened_and_closed`.
+    Matching uses an index keyed by `related_trade_key`, so a busy cycle never needs
+    a pairwise scan. Stock trades are never rolled, since they always show as open.
+    """
+    closed_index: dict[tuple[str, str | None, str | None], list[int]] = defaultdict(list)
+    for position, trade in enumerate(trades):
+        if trade["close_date"] and trade.get("type") not in STOCK_TRADE_TYPES:
+            closed_index[related_trade_key(trade)].append(position)
+
+    # Map the position of each opening trade to the position of the trade it rolled from.
+    rolls: dict[int, int] = {}
+    for position, trade in enumerate(trades):
+        if trade["close_date"] or trade["guid"] not in new_guids:
+            continue
+        candidates = closed_index.get(related_trade_key(trade), [])
+        match = next((x for x in candidates if is_roll(trades[x], trade)), None)
+        if match is not None:
+            candidates.remove(match)
+            rolls[position] = match
+
+    rolled_from = set(rolls.values())
+    collapsed = []
+    for position, trade in enumerate(trades):
+        if position in rolled_from:
+            continue
+        if position in rolls:
+            collapsed.append({**trade, "rolled_from": trades[rolls[position]]})
+        elif trade["close_date"] and trade["guid"] in new_guids:
+            collapsed.append({**trade, "opened_and_closed": True})
+        else:
+            collapsed.append(trade)
+
+    if rolls:
+        log.info("Collapsed %s rolled trades", len(rolls))
+    return collapsed
+
+
+def connect_redis() -> Redis | RedisCluster:
+    """Connect to a single Redis node or to a Redis Cluster."""
+    timeouts = {"socket_timeout": settings.redis_socket_timeout, "socket_connect_timeout": settings.redis_socket_timeout}
+    if settings.redis_mode == "cluster":
+        return RedisCluster(host=settings.redis_host, port=settings.redis_port, decode_responses=True, **timeouts)
+    return Redis(host=settings.redis_host, port=settings.redis_port, decode_responses=True, **timeouts)
+
 
 class TradeQueue:
     """Set up a queue of trades to work through.
@@ -21,78 +109,341 @@ class TradeQueue:
 
     def __init__(self) -> None:
         """Constructor for TradeQueue."""
-        self.db_conn = Redis(host=settings.redis_host, port=settings.redis_port, decode_responses=True)
-        self.skipped_users = settings.skipped_users_list
+        # Redis is connected to on first use, so deployments with an embedded store never touch it
+        self._db_conn: Redis | RedisCluster | None = None
+        # 🗄️ Trade statuses for dedupe, in Redis or in an embedded store
+        self.state_store = create_state_store(self.db_conn if settings.state_backend == "redis" else None)
+        # Skipped users, roles and the rules file, compiled once into one predicate
+        self.trade_filter = build_trade_filter()
         self.latest_trades: list = []
-        # 🔧 Create a persistent HTTP client to avoid connection pool leaks
-        self._http_client = httpx.Client(timeout=15)
+        # GUIDs seen for the first time in the current cycle
+        self.new_guids: set[str] = set()
+        # 🔧 The feed gets its own pooled client, so symbol lookups cannot take all of its connections
+        self._http_client = create_http_client(max_connections=FEED_WORKERS)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=FEED_WORKERS, thread_name_prefix="feed")
+        self.feed_latencies: deque[float] = deque(maxlen=MAX_LATENCY_SAMPLES)
+        self.feed_breaker = CircuitBreaker(
+            "patrons-api",
+            failure_threshold=settings.feed_failure_threshold,
+            reset_timeout=settings.feed_reset_timeout,
+            max_reset_timeout=settings.feed_max_reset_timeout,
+        )
+        # 📓 Trade statuses decided while the state store was down, and the last ones read from it
+        self.journal = StatusJournal(settings.journal_path)
+        self.known_statuses: dict[str, str] = self.journal.load_snapshot()
+        self._snapshot_dirty = False
+        self._snapshot_at: float | None = None
+        self.store_breaker = CircuitBreaker(
+            settings.state_backend,
+            failure_threshold=1,
+            reset_timeout=settings.redis_retry_interval,
+            max_reset_timeout=settings.redis_max_retry_interval,
+        )
 
     def close(self) -> None:
         """Clean up resources - call when shutting down."""
+        self._hedge_pool.shutdown(wait=False, cancel_futures=True)
         self._http_client.close()
-        self.db_conn.close()
+        self.save_snapshot()
+        self.state_store.close()
+        if self._db_conn is not None:
+            self._db_conn.close()
+
+    def prewarm(self) -> None:
+        """Open a connection to the patrons API ahead of the first poll."""
+        prewarm(settings.api_base_url, self._http_client)
+
+    @property
+    def db_conn(self) -> Redis | RedisCluster:
+        """Redis connection shared by the leader lease, the caches and the indexes."""
+        if self._db_conn is None:
+            self._db_conn = connect_redis()
+        return self._db_conn
+
+    @db_conn.setter
+    def db_conn(self, db_conn: Redis | RedisCluster) -> None:
+        """Swap the Redis connection, including the one under the Redis state store."""
+        self._db_conn = db_conn
+        if isinstance(self.state_store, RedisStateStore):
+            self.state_store.db_conn = db_conn
+
+    @property
+    def redis_down(self) -> bool:
+        """Whether Redis keeps the trade statuses and its circuit breaker is open."""
+        return isinstance(self.state_store, RedisStateStore) and self.store_breaker.state == OPEN
 
     def update_trades(self) -> list:
-        """Get the most recently updated trades."""
-        headers: dict[str, str] = {"Authorization": settings.trades_api_key}
-        url = "https://api3.thetagang.com/api/patrons"
-        resp = self._http_client.get(url, headers=headers)
+        """Get the most recently updated trades.
+
+        While the patrons API is failing the circuit breaker stays open and the
+        cycle becomes a cheap no-op with no trades, instead of waiting on timeouts.
+        """
+        self.latest_trades = []
+        if not self.feed_breaker.allow_request():
+            log.info("⏸️ Skipping the patrons API while its circuit breaker is open")
+            return []
+
+        try:
+            payload = self.fetch_feed().json()
+            if not isinstance(payload, dict) or not isinstance(payload.get("data"), list):
+                raise ValueError(f"Unexpected response from the patrons API: {str(payload)[:100]}")
+            trades = payload["data"]
+        except (httpx.HTTPError, ValueError) as e:
+            self.feed_breaker.record_failure()
+            log.warning("⚠️ Could not fetch trades from the patrons API: %s", e)
+            return []
 
-        self.latest_trades = resp.json()["data"]
+        self.feed_breaker.record_success()
+        self.latest_trades = trades
 
         # Ensure we always have the latest trades first
         self.latest_trades.reverse()
 
         return list(self.latest_trades)
 
-    def build_queue(self) -> list:
+    def fetch_feed(self) -> httpx.Response:
+        """Fetch the patrons feed, retrying failures with capped, jittered backoff.
+
+        Every attempt and the waits between them share one `feed_deadline`, so a
+        slow API cannot hold up the cycle for several full timeouts.
+        """
+        deadline = time.monotonic() + settings.feed_deadline
+        attempt = 0
+        while True:
+            try:
+                return self.hedged_get(f"{settings.api_base_url}/api/patrons", deadline - time.monotonic())
+            except httpx.HTTPError as e:
+                delay = random.uniform(0, min(settings.feed_backoff_cap, settings.feed_backoff_base * 2**attempt))
+                if attempt >= settings.feed_retries or time.monotonic() + delay >= deadline:
+                    raise
+                log.info("🔁 Retrying the patrons API in %.2fs after: %s", delay, e)
+                time.sleep(delay)
+                attempt += 1
+
+    def hedged_get(self, url: str, timeout: float | None = None) -> httpx.Response:
+        """Send a request, and a second one if the first is slower than usual.
+
+        The hedge goes out once the first request takes longer than the configured
+        percentile of recent latencies. Whichever response arrives first wins and
+        the other one is left to finish in the background.
+
+        Args:
+            url: URL to fetch
+            timeout: Longest seconds for each request to connect and for each read,
+                on top of the transport's own timeouts
+        """
+        hedge_after = self.hedge_delay()
+        first = self._hedge_pool.submit(self._timed_get, url, timeout)
+        if hedge_after is None:
+            return first.result()
+
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+
+        log.info("🏃 Patrons API is slower than %.2fs, sending a hedged request", hedge_after)
+        pending = {first, self._hedge_pool.submit(self._timed_get, url, timeout)}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded = [x for x in done if x.exception() is None]
+            if succeeded:
+                return succeeded[0].result()
+            if not pending:
+                # Both requests failed, so raise the error from one of them.
+                return done.pop().result()
+
+    def hedge_delay(self) -> float | None:
+        """Return the latency after which to hedge, or None without enough history."""
+        if not settings.feed_hedge_percentile or len(self.feed_latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        latencies = sorted(self.feed_latencies)
+        index = min(int(len(latencies) * settings.feed_hedge_percentile), len(latencies) - 1)
+        return latencies[index]
+
+    def _timed_get(self, url: str, timeout: float | None = None) -> httpx.Response:
+        """Fetch a URL, raise for HTTP errors and record the latency."""
+        request_timeout = self._http_client.timeout
+        if timeout is not None:
+            timeout = max(timeout, 0.001)
+            request_timeout = httpx.Timeout(
+                min(settings.http_read_timeout, timeout), connect=min(settings.http_connect_timeout, timeout)
+            )
+        started = time.perf_counter()
+        resp = self._http_client.get(url, headers={"Authorization": settings.trades_api_key}, timeout=request_timeout)
+        resp.raise_for_status()
+        self.feed_latencies.append(time.perf_counter() - started)
+        return resp
+
+    def build_queue(self, before_store: Callable[[list[dict]], None] | None = None) -> list:
         """Assemble a queue of trades to process.
 
+        The stored status for every valid trade is read in one batch and the new
+        statuses are written back in one batch, so each cycle costs a couple of
+        round trips to the state store instead of several per trade.
+
+        Args:
+            before_store: Called with the queued trades right before their statuses
+                are written. If it raises, nothing is stored.
+
         Returns:
             list: Trades in the queue to be processed.
         """
-        valid_trades = [
-            x
-            for x in self.latest_trades
-            if x["User"]["username"] not in self.skipped_users
-            and x["User"]["role"] in ["patron", "joonie"]
-            and x["mistake"] is not True
-        ]
+        valid_trades = [x for x in self.latest_trades if x["mistake"] is not True and self.trade_filter(x)]
         log.info("Found %s valid trades", len(valid_trades))
-        return [x for x in valid_trades if self.process_trade(x)]
+        self.new_guids = set()
+
+        stored_statuses = self.fetch_statuses([x["guid"] for x in valid_trades])
+        queued = []
+        for trade in valid_trades:
+            if self.needs_notification(trade, stored_statuses.get(trade["guid"])):
+                # Remember the new status in case the feed repeats this trade.
+                stored_statuses[trade["guid"]] = self.trade_status(trade)
+                queued.append(trade)
+        if before_store is not None:
+            before_store(queued)
+        self.store_trades(queued)
+
+        if settings.collapse_related_trades:
+            queued = collapse_related_trades(queued, self.new_guids)
+
+        return queued
 
     def process_trade(self, trade: dict) -> dict | None:
-        """Determine how to handle a trade returned by the API.
+        """Determine how to handle a single trade returned by the API."""
+        stored_status = self.fetch_statuses([trade["guid"]])[trade["guid"]]
+        if not self.needs_notification(trade, stored_status):
+            return None
+
+        self.store_trade(trade)
+        return trade
+
+    def needs_notification(self, trade: dict, stored_status: str | None) -> bool:
+        """Decide if a trade needs a notification given its stored status.
 
         We're looking for a trade that we haven't seen before, and if we haven't seen it
         before, then it shouldn't be an old trade. If we have seen it before, then we
         only alert on it if it changed status, such as opened to closed.
         """
-        if not self.trade_exists(trade):
-            # We haven't seen this trade before.
-            if not self.trade_is_old(trade):
-                # This trade isn't a old trade from long ago.
-                self.store_trade(trade)
-                return trade
+        if stored_status is None:
+            # We haven't seen this trade before, so it must not be an old trade
+            # from long ago.
+            if self.trade_is_old(trade):
+                return False
+            self.new_guids.add(trade["guid"])
+            return True
 
-        elif self.trade_has_new_status(trade):
-            # We've seen this trade before, but it has a new status.
-            self.store_trade(trade)
-            return trade
+        # We've seen this trade before, so only alert if it has a new status.
+        return stored_status != self.trade_status(trade)
+
+    def fetch_statuses(self, guids: list[str]) -> dict[str, str | None]:
+        """Read the stored status of many trades at once.
+
+        The whole batch is one round trip to the state store. While the store is
+        down the statuses come from the journal and from what the store last said
+        about each trade, so the feed window is still deduped.
+        """
+        unique = list(dict.fromkeys(guids))
+        if not unique:
+            return {}
 
-        return None
+        if self.store_available():
+            try:
+                statuses = self.state_store.get_many(unique)
+            except STORE_OUTAGE_ERRORS as e:
+                self.store_failed(e)
+            else:
+                self.store_breaker.record_success()
+                self.remember_statuses({guid: status for guid, status in statuses.items() if status is not None})
+                return statuses
+
+        return {guid: self.journal.get(guid) or self.known_statuses.get(guid) for guid in unique}
+
+    def store_trades(self, trades: list[dict]) -> None:
+        """Store the status of many trades in one batch, or in the journal while the store is down."""
+        if not trades:
+            return
+
+        statuses = {trade["guid"]: self.trade_status(trade) for trade in trades}
+        if self.store_available():
+            try:
+                self.write_statuses(list(statuses.items()))
+            except STORE_OUTAGE_ERRORS as e:
+                self.store_failed(e)
+            else:
+                self.store_breaker.record_success()
+                self.remember_statuses(statuses)
+                return
+        self.journal.record(statuses)
 
     def store_trade(self, trade: dict) -> None:
         """Store a trade in the database."""
-        self.db_conn.set(trade["guid"], self.trade_status(trade))
+        self.store_trades([trade])
 
     def trade_exists(self, trade: dict) -> bool:
         """Check if a trade exists in the database."""
-        return bool(self.db_conn.exists(trade["guid"]))
+        return self.fetch_statuses([trade["guid"]])[trade["guid"]] is not None
 
     def trade_has_new_status(self, trade: dict) -> bool:
         """Determine if the trade has a new status."""
-        return self.db_conn.get(trade["guid"]) != self.trade_status(trade)
+        return self.fetch_statuses([trade["guid"]])[trade["guid"]] != self.trade_status(trade)
+
+    def write_statuses(self, statuses: list[tuple[str, str]]) -> None:
+        """Write trade statuses to the state store in one batch."""
+        self.state_store.set_many(statuses)
+
+    def remember_statuses(self, statuses: dict[str, str]) -> None:
+        """Keep the most recent statuses seen in the state store for deduping during an outage.
+
+        The view is saved next to the journal at most every `SNAPSHOT_INTERVAL`
+        seconds while the store is healthy, and again when an outage starts and at
+        shutdown, so a restart in the middle of an outage does not forget the
+        trades already announced.
+        """
+        for guid, status in statuses.items():
+            self._snapshot_dirty = self._snapshot_dirty or self.known_statuses.get(guid) != status
+            self.known_statuses.pop(guid, None)
+            self.known_statuses[guid] = status
+        while len(self.known_statuses) > MAX_KNOWN_STATUSES:
+            del self.known_statuses[next(iter(self.known_statuses))]
+        if self._snapshot_at is None or time.monotonic() - self._snapshot_at >= SNAPSHOT_INTERVAL:
+            self.save_snapshot()
+
+    def save_snapshot(self) -> None:
+        """Save the statuses last seen in the state store if they changed since the last snapshot."""
+        if not self._snapshot_dirty:
+            return
+        self.journal.save_snapshot(self.known_statuses)
+        self._snapshot_dirty = False
+        self._snapshot_at = time.monotonic()
+
+    def store_available(self) -> bool:
+        """Check if the state store should be used, replaying the journal first after an outage.
+
+        The store's circuit breaker opens on the first failure, so during an outage
+        cycles skip the store entirely until the next probe is due.
+        """
+        if not self.store_breaker.allow_request():
+            return False
+        if not len(self.journal):
+            return True
+
+        try:
+            replayed = self.journal.replay(self.write_statuses, settings.journal_replay_batch_size)
+        except STORE_OUTAGE_ERRORS as e:
+            self.store_failed(e)
+            return False
+        self.store_breaker.record_success()
+        log.info("✅ %s is back, replayed %s trade statuses from the journal", self.state_store.name, replayed)
+        return True
+
+    def store_failed(self, error: Exception) -> None:
+        """Switch to the journal after the state store failed."""
+        if self.store_breaker.state != OPEN:
+            log.warning(
+                "⚠️ %s is unavailable, keeping trade statuses in the local journal: %s", self.state_store.name, error
+            )
+            self.save_snapshot()
+        self.store_breaker.record_failure()
 
     def trade_is_old(self, trade: dict) -> bool:
         """Detect when a new trade appears, but it is actually really old.
@@ -0,0 +1,159 @@
+"""Shared HTTP transport for every thetagang.com API caller."""
+
+import importlib.util
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import httpx
+
+from thetagang_notifications.config import settings
+
+log = logging.getLogger(__name__)
+
+# Keep enough timings to see trends without holding on to every request.
+MAX_TIMINGS = 256
+
+
+@dataclass
+class RequestTiming:
+    """Timing details for one request."""
+
+    method: str
+    url: str
+    status_code: int = 0
+    http_version: str = ""
+    # Seconds from sending the request until the response headers arrived.
+    elapsed: float = 0.0
+    # Seconds spent opening a new connection. Both stay at zero on a reused connection.
+    connect: float = 0.0
+    tls: float = 0.0
+    _started: dict[str, float] = field(default_factory=dict, repr=False)
+
+    @property
+    def reused_connection(self) -> bool:
+        """Check if the request went over a kept-alive connection."""
+        return not self.connect and not self.tls
+
+    def trace(self, event_name: str, info: dict) -> None:
+        """Record connection events from httpcore."""
+        step, _, phase = event_name.removeprefix("connection.").rpartition(".")
+        if phase == "started":
+            self._started[step] = time.perf_counter()
+        elif phase == "complete" and step in self._started:
+            duration = time.perf_counter() - self._started.pop(step)
+            if step == "connect_tcp":
+                self.connect = duration
+            elif step == "start_tls":
+                self.tls = duration
+
+
+# Timings for the most recent requests, newest last.
+recent_timings: deque[RequestTiming] = deque(maxlen=MAX_TIMINGS)
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def http2_available() -> bool:
+    """Check if HTTP/2 was requested and the h2 package is installed."""
+    if not settings.http2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        log.warning("⚠️ HTTP2 is enabled but the h2 package is missing, falling back to HTTP/1.1")
+        return False
+    return True
+
+
+def _start_timing(request: httpx.Request) -> None:
+    """Attach a timing record to a request."""
+    timing = RequestTiming(method=request.method, url=str(request.url.copy_with(query=None)))
+    timing._started["request"] = time.perf_counter()
+    request.extensions["timing"] = timing
+    request.extensions["trace"] = timing.trace
+
+
+def _finish_timing(response: httpx.Response) -> None:
+    """Complete the timing record once the response headers arrive."""
+    timing: RequestTiming | None = response.request.extensions.get("timing")
+    if timing is None:
+        return
+
+    timing.elapsed = time.perf_counter() - timing._started.pop("request")
+    timing.status_code = response.status_code
+    timing.http_version = response.http_version
+    recent_timings.append(timing)
+    log.debug(
+        "🌐 %s %s %s %s in %.0fms (connect %.0fms, tls %.0fms)",
+        timing.method,
+        timing.url,
+        timing.status_code,
+        timing.http_version,
+        timing.elapsed * 1000,
+        timing.connect * 1000,
+        timing.tls * 1000,
+    )
+
+
+def create_http_client(max_connections: int | None = None) -> httpx.Client:
+    """Create an HTTP client tuned for repeated calls to the thetagang.com API.
+
+    httpx asks for gzip responses by default, and for brotli when the brotli
+    package is installed, and decodes them transparently.
+
+    Args:
+        max_connections: Connection limit, defaulting to `http_max_connections`
+    """
+    max_connections = max_connections or settings.http_max_connections
+    return httpx.Client(
+        http2=http2_available(),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            settings.http_read_timeout,
+            connect=settings.http_connect_timeout,
+        ),
+        event_hooks={"request": [_start_timing], "response": [_finish_timing]},
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Get or create the shared HTTP client."""
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = create_http_client()
+        return _client
+
+
+def close_http_client() -> None:
+    """Close the shared HTTP client and its pooled connections."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def prewarm(url: str | None = None, client: httpx.Client | None = None) -> None:
+    """Open a pooled connection ahead of the first poll.
+
+    This pays for DNS, the TCP connect and the TLS handshake at startup, so the
+    first real request goes over a kept-alive connection.
+
+    Args:
+        url: URL to send a HEAD request to, defaulting to the API base URL
+        client: Client whose pool gets the connection, defaulting to the shared one
+    """
+    url = url or settings.api_base_url
+    try:
+        (client or get_http_client()).head(url)
+    except httpx.HTTPError as e:
+        log.warning("⚠️ Could not pre-warm a connection to %s: %s", url, e)
+        return
+    log.info("🔥 Pre-warmed a connection to %s", url)
@@ -0,0 +1,101 @@
+"""Track the health of each Discord webhook and quarantine failing ones."""
+
+import re
+import statistics
+import threading
+from collections import deque
+
+from thetagang_notifications.circuit import OPEN, CircuitBreaker
+from thetagang_notifications.config import settings
+
+# Webhook URLs carry a secret token, so only the webhook ID is ever shown.
+WEBHOOK_TOKEN = re.compile(r"(/webhooks/[^/]+)/[^/?]+")
+
+_health: dict[str, "WebhookHealth"] = {}
+_health_lock = threading.Lock()
+
+
+def redact_webhook(url: str) -> str:
+    """Hide the secret token in a webhook URL."""
+    return WEBHOOK_TOKEN.sub(r"\1/***", url)
+
+
+class WebhookHealth:
+    """Rolling error rate and latency for one webhook.
+
+    A circuit breaker quarantines the webhook after repeated failures, probes it
+    with a growing backoff, and reinstates it after the first good delivery. Every
+    message that never reached the webhook, failed or skipped, is counted as dropped.
+    """
+
+    def __init__(self, url: str) -> None:
+        """Constructor for WebhookHealth."""
+        self.name = redact_webhook(url)
+        self.outcomes: deque[bool] = deque(maxlen=settings.webhook_health_window)
+        self.latencies: deque[float] = deque(maxlen=settings.webhook_health_window)
+        self.dropped = 0
+        # The breaker state is part of the webhook status, so it stays out of the breaker list.
+        self.breaker = CircuitBreaker(
+            f"webhook {self.name}",
+            failure_threshold=settings.webhook_failure_threshold,
+            reset_timeout=settings.webhook_reset_timeout,
+            max_reset_timeout=settings.webhook_max_reset_timeout,
+            register=False,
+        )
+
+    @property
+    def quarantined(self) -> bool:
+        """Check if deliveries to this webhook are being skipped."""
+        return self.breaker.state == OPEN
+
+    def allow_delivery(self) -> bool:
+        """Check if we should deliver now, letting a probe through when one is due."""
+        return self.breaker.allow_request()
+
+    @property
+    def error_rate(self) -> float:
+        """Return the share of recent deliveries that failed."""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def record(self, success: bool, latency: float) -> None:
+        """Record the outcome of a delivery."""
+        self.outcomes.append(success)
+        self.latencies.append(latency)
+        if success:
+            self.breaker.record_success()
+        else:
+            self.dropped += 1
+            self.breaker.record_failure()
+
+    def record_skipped(self, count: int) -> None:
+        """Record messages dropped without a delivery attempt while quarantined."""
+        self.dropped += count
+
+    def status(self) -> dict:
+        """Return the webhook health for operators."""
+        latencies = sorted(self.latencies)
+        return {
+            **self.breaker.status(),
+            "deliveries": len(self.outcomes),
+            "dropped": self.dropped,
+            "error_rate": round(self.error_rate, 3),
+            "latency_p50": round(statistics.median(latencies), 3) if latencies else None,
+            "latency_max": round(latencies[-1], 3) if latencies else None,
+        }
+
+
+def get_webhook_health(url: str) -> WebhookHealth:
+    """Get or create the health tracker for a webhook."""
+    with _health_lock:
+        if url not in _health:
+            _health[url] = WebhookHealth(url)
+        return _health[url]
+
+
+def webhook_health_status() -> dict[str, dict]:
+    """Return the health of every webhook we have delivered to."""
+    with _health_lock:
+        trackers = list(_health.values())
+    return {health.name: health.status() for health in trackers}
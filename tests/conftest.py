@@ -1,5 +1,11 @@
 """Pytest fixtures for the tests."""
 
+import gzip
+import importlib
+import json
+from pathlib import Path
+from unittest import mock
+
 import httpx
 import pytest
 import vcr
@@ -8,6 +14,22 @@ from ruyaml import YAML
 from thetagang_notifications.config import settings
 
 
+@pytest.fixture(autouse=True)
+def status_journal(tmp_path):
+    """Keep the status journal and its snapshot out of the working tree."""
+    with mock.patch.object(settings, "journal_path", str(tmp_path / "trade_statuses.journal")):
+        yield
+
+
+@pytest.fixture
+def run_trades():
+    """Import the bot without letting it take over the test runner's signals."""
+    with mock.patch("signal.signal"):
+        module = importlib.import_module("run_trades")
+    yield module
+    module.trade_queue = None
+
+
 def get_trade_types():
     """Return a trade type."""
     yaml = YAML(typ='safe', pure=True)
@@ -35,3 +57,16 @@ def real_trades(request):
         trade = httpx.get(url, timeout=15).json()["data"]
 
     return trade
+
+
+def load_recorded_trades():
+    """Return every recorded example trade without going through the cassettes."""
+    yaml = YAML(typ='safe', pure=True)
+    trades = []
+    for cassette in sorted(Path("tests/fixtures/trades").glob("*.yaml")):
+        response = yaml.load(cassette.read_text(encoding="utf-8"))["interactions"][0]["response"]
+        body = response["body"]["string"] if "body" in response else response["content"]
+        if isinstance(body, bytes):
+            body = gzip.decompress(body)
+        trades.append(json.loads(body)["data"])
+    return trades
@@ -0,0 +1,147 @@
+"""Test the running performance aggregates."""
+
+from unittest import mock
+
+import fakeredis
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from thetagang_notifications import aggregates as aggregates_module
+from thetagang_notifications.aggregates import PerformanceAggregates, TradeOutcome, trade_periods
+from thetagang_notifications.trade import get_trade_class
+
+from .conftest import load_recorded_trades
+
+
+@pytest.fixture
+def trades():
+    """Return every recorded example trade."""
+    return [get_trade_class(trade) for trade in load_recorded_trades()]
+
+
+@pytest.fixture
+def aggregates():
+    """Return aggregates backed by fakeredis."""
+    return PerformanceAggregates(fakeredis.FakeRedis(decode_responses=True), prefix="agg", min_trades=3)
+
+
+def test_trade_periods(trades) -> None:
+    """Verify that a trade counts toward all time, its year and its month."""
+    closed = next(x for x in trades if x.data.type == "CASH SECURED PUT")
+    assert trade_periods(closed.data.close_date) == ["all", "2022", "2022-02"]
+
+
+def test_outcome_only_for_closed_trades(trades) -> None:
+    """Verify that open trades and stock trades are left out."""
+    outcomes = {x.data.type: TradeOutcome.from_trade(x) for x in trades}
+
+    assert outcomes["LONG PUT"] is None
+    assert outcomes["BUY COMMON STOCK"] is None
+    assert outcomes["CASH SECURED PUT"].pnl == 140.0
+    assert outcomes["CASH SECURED PUT"].assigned
+    assert outcomes["PUT CREDIT SPREAD"].pnl == -351.0
+    assert not outcomes["PUT CREDIT SPREAD"].won
+
+
+def test_record_user_stats(aggregates, trades) -> None:
+    """Verify the running totals for one user."""
+    assert aggregates.record(trades) == 14
+
+    stats = aggregates.stats("user", "major")
+    assert stats["trades"] == 5
+    assert stats["wins"] == 3
+    assert stats["assigned"] == 1
+    assert stats["pnl"] == pytest.approx(-130.0)
+    assert stats["win_rate"] == pytest.approx(0.6)
+    assert aggregates.stats("user", "major", "2022-02")["trades"] == 2
+    assert aggregates.stats("user", "nobody")["trades"] == 0
+
+
+def test_leaderboards(aggregates, trades) -> None:
+    """Verify the leaderboard order and the minimum trades for rate boards."""
+    aggregates.record(trades)
+
+    assert aggregates.leaderboard("user", "pnl", limit=1) == [("jrue", 294.0)]
+    assert aggregates.leaderboard("user", "trades", limit=2) == [("major", 5.0), ("jrue", 3.0)]
+    assert aggregates.leaderboard("user", "win_rate") == [("jrue", 1.0), ("major", 0.6)]
+    assert aggregates.leaderboard("symbol", "trades", limit=1) == [("SPY", 3.0)]
+    assert aggregates.leaderboard("user", "pnl", period="2023", limit=1) == [("jrue", 294.0)]
+    assert aggregates.leaderboard("user", "pnl", offset=100) == []
+
+    with pytest.raises(ValueError):
+        aggregates.leaderboard("user", "guid")
+
+
+def test_rate_board_waits_for_min_trades(aggregates, trades) -> None:
+    """Verify that a name joins the rate boards only once it has enough trades."""
+    jrue = [x for x in trades if x.username == "jrue"]
+
+    aggregates.record(jrue[:2])
+    assert aggregates.leaderboard("user", "win_rate") == []
+
+    aggregates.record(jrue[2:])
+    assert aggregates.leaderboard("user", "win_rate") == [("jrue", 1.0)]
+
+
+def test_record_includes_rolled_from(aggregates, trades) -> None:
+    """Verify that the closed side of a roll is counted."""
+    raw = load_recorded_trades()
+    opened = next(x for x in raw if x["type"] == "LONG PUT")
+    closed = next(x for x in raw if x["type"] == "LONG CALL")
+    rolled = get_trade_class({**opened, "rolled_from": closed})
+
+    assert aggregates.record([rolled]) == 1
+    assert aggregates.stats("user", "jcvalhalla")["trades"] == 1
+
+
+def test_closes_are_counted_once(aggregates, trades) -> None:
+    """Verify that replaying closes, in one batch or across batches, never counts them twice."""
+    assert aggregates.record([*trades, *trades]) == 14
+    assert aggregates.record(trades) == 0
+
+    stats = aggregates.stats("user", "major")
+    assert stats["trades"] == 5
+    assert stats["pnl"] == pytest.approx(-130.0)
+    assert aggregates.db_conn.ttl(aggregates.counted_key(trades[0].guid)) > 0
+
+
+def test_closes_during_an_outage_are_recorded_later(aggregates, trades) -> None:
+    """Verify that closes held while Redis was down, or lost to a failed write, are counted once it is back."""
+    assert aggregates.hold(trades[:4]) > 0
+    with mock.patch.object(aggregates.db_conn, "pipeline", side_effect=RedisConnectionError("down")):
+        with pytest.raises(RedisConnectionError):
+            aggregates.record(trades[4:])
+    assert len(aggregates.pending) == 14
+
+    assert aggregates.record([]) == 14
+    assert aggregates.pending == []
+    assert aggregates.stats("user", "major")["trades"] == 5
+
+
+def test_held_closes_are_bounded(aggregates, trades, caplog) -> None:
+    """Verify that the closes held during a long outage stop at the limit."""
+    with mock.patch.object(aggregates_module, "MAX_PENDING_OUTCOMES", 10):
+        aggregates.hold(trades)
+
+    assert len(aggregates.pending) == 10
+    assert "rebuild_aggregates.py" in caplog.text
+
+
+def test_rebuild_is_idempotent(aggregates, trades) -> None:
+    """Verify that rebuilding twice gives the same aggregates as recording once."""
+    aggregates.record(trades)
+    expected = aggregates.leaderboard("symbol", "pnl", limit=100)
+
+    assert aggregates.rebuild(trades, batch_size=4) == 14
+    assert aggregates.rebuild(trades, batch_size=4) == 14
+    assert aggregates.leaderboard("symbol", "pnl", limit=100) == expected
+    assert aggregates.stats("user", "major")["trades"] == 5
+
+
+def test_clear(aggregates, trades) -> None:
+    """Verify that clearing removes only the aggregate keys."""
+    aggregates.db_conn.set("trade:abc", "keep")
+    aggregates.record(trades)
+
+    assert aggregates.clear() > 0
+    assert aggregates.db_conn.keys() == ["trade:abc"]
@@ -0,0 +1,97 @@
+"""Test the columnar trade archive."""
+
+import math
+import zlib
+
+import pytest
+
+from thetagang_notifications.archive import COLUMNS, ArchiveReader, Segment, TradeArchive
+from thetagang_notifications.models import TradeData
+
+from .conftest import load_recorded_trades
+
+
+@pytest.fixture
+def records():
+    """Return every recorded example trade as validated trade data."""
+    return [TradeData(**x) for x in load_recorded_trades()]
+
+
+def test_round_trip(tmp_path, records) -> None:
+    """Verify that every column reads back what was archived."""
+    archive = TradeArchive(tmp_path, batch_size=5)
+    assert archive.append(records) == len(records)
+
+    with ArchiveReader(tmp_path) as reader:
+        assert len(reader) == len(records)
+        data = reader.read([x.name for x in COLUMNS])
+
+    assert data["guid"] == [x.guid for x in records]
+    assert data["username"] == [x.user.username for x in records]
+    assert list(data["quantity"]) == [x.quantity for x in records]
+    assert list(data["win"]) == [int(x.win) for x in records]
+    assert data["expiry_date"] == [x.expiry_date for x in records]
+    for value, record in zip(data["profit_loss"], records, strict=True):
+        assert value == record.profit_loss_raw or (math.isnan(value) and record.profit_loss_raw is None)
+    for value, record in zip(data["close_date"], records, strict=True):
+        assert math.isnan(value) if record.close_date is None else value == record.close_date.timestamp()
+
+
+def test_nullable_text_keeps_empty_and_missing_apart(tmp_path, records) -> None:
+    """Verify that a missing value and an empty string in a nullable column both survive."""
+    expiry_dates = [None, "", "2024-01-19", None]
+    batch = [x.model_copy(update={"expiry_date": y}) for x, y in zip(records, expiry_dates, strict=False)]
+    archive = TradeArchive(tmp_path)
+    archive.append(batch)
+    archive.flush()
+
+    with ArchiveReader(tmp_path) as reader:
+        assert reader.read(["expiry_date"])["expiry_date"] == expiry_dates
+
+
+def test_batches_until_full_or_flushed(tmp_path, records) -> None:
+    """Verify that trades wait for a full batch or a flush."""
+    archive = TradeArchive(tmp_path, batch_size=10)
+
+    assert archive.append(records[:4]) == 0
+    assert not list(tmp_path.glob("*.tga"))
+    assert archive.append(records[4:10]) == 10
+    assert archive.append(records[10:12]) == 0
+    archive.close()
+
+    with ArchiveReader(tmp_path) as reader:
+        assert [x.rows for x in reader.segments] == [10, 2]
+        assert reader.read(["guid"])["guid"] == [x.guid for x in records[:12]]
+
+
+def test_flushes_old_batches(tmp_path, records) -> None:
+    """Verify that a batch older than the maximum age is written."""
+    archive = TradeArchive(tmp_path, batch_size=1000, max_age=0)
+    assert archive.append(records[:1]) == 1
+
+
+def test_reads_only_requested_columns(tmp_path, records) -> None:
+    """Verify that a corrupt chunk does not matter when its column is not read."""
+    archive = TradeArchive(tmp_path)
+    archive.append(records)
+    archive.flush()
+    path = next(tmp_path.glob("*.tga"))
+
+    chunk = Segment(path).chunks["note"]
+    contents = bytearray(path.read_bytes())
+    contents[chunk["offset"] : chunk["offset"] + chunk["length"]] = b"\0" * chunk["length"]
+    path.write_bytes(bytes(contents))
+
+    with ArchiveReader(tmp_path) as reader:
+        assert reader.read(["symbol"])["symbol"] == [x.symbol for x in records]
+        with pytest.raises(zlib.error):
+            reader.read(["note"])
+        with pytest.raises(KeyError):
+            reader.read(["strike"])
+
+
+def test_rejects_foreign_files(tmp_path) -> None:
+    """Verify that files without the archive trailer are refused."""
+    (tmp_path / "bogus.tga").write_bytes(b"not an archive at all")
+    with pytest.raises(ValueError):
+        ArchiveReader(tmp_path)
@@ -0,0 +1,60 @@
+"""Test bulk rendering across worker processes."""
+
+import io
+import json
+from unittest import mock
+
+from thetagang_notifications import bulk_render
+from thetagang_notifications.notification import get_notifier
+from thetagang_notifications.trade import get_trade_class
+
+from .conftest import load_recorded_trades
+
+
+def test_render_record_matches_notification() -> None:
+    """Verify that bulk rendering gives the same embed as a notification."""
+    trade = load_recorded_trades()[0]
+    record = bulk_render.render_record(json.dumps({"data": trade}))
+
+    assert record["guid"] == trade["guid"]
+    assert record["embed"] == vars(get_notifier(get_trade_class(trade)).generate_embeds())
+
+
+def test_render_batch_reports_errors_in_place() -> None:
+    """Verify that bad trades produce an error record without shifting the output."""
+    trade = load_recorded_trades()[0]
+    lines, errors = bulk_render.render_batch(["not json", json.dumps({"guid": "x", "type": "LONG CALL"}), json.dumps(trade)])
+
+    records = [json.loads(x) for x in lines]
+    assert errors == 2
+    assert "JSONDecodeError" in records[0]["error"]
+    assert "ValidationError" in records[1]["error"]
+    assert records[2]["guid"] == trade["guid"]
+
+
+def test_render_lines_keeps_input_order() -> None:
+    """Verify that results from the pool stream out in input order."""
+    trades = load_recorded_trades() * 3
+    lines = [json.dumps(x) for x in trades] + ["", "[]"]
+    stats = bulk_render.RenderStats()
+
+    records = [json.loads(x) for x in bulk_render.render_lines(lines, workers=2, batch_size=4, stats=stats)]
+
+    assert [x.get("guid") for x in records[:-1]] == [x["guid"] for x in trades]
+    assert "error" in records[-1]
+    assert stats.trades == len(trades) + 1
+    assert stats.errors == 1
+    assert stats.workers == 2
+    assert stats.per_core == stats.per_second / 2
+
+
+def test_read_trade_lines_leaves_stdin_open(tmp_path) -> None:
+    """Verify that reading trades from stdin and files does not close stdin."""
+    path = tmp_path / "trades.jsonl"
+    path.write_text("file\n", encoding="utf-8")
+    stdin = io.StringIO("stdin\n")
+
+    with mock.patch("sys.stdin", stdin):
+        assert list(bulk_render.read_trade_lines(["-", str(path)])) == ["stdin\n", "file\n"]
+
+    assert not stdin.closed
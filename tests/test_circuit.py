@@ -0,0 +1,81 @@
+"""Test the circuit breaker."""
+
+import pytest
+
+from thetagang_notifications import circuit
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Return a fake clock."""
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    """Return a breaker that opens after two failures."""
+    return circuit.CircuitBreaker("test", failure_threshold=2, reset_timeout=10, max_reset_timeout=30, clock=clock)
+
+
+def test_opens_after_threshold(breaker) -> None:
+    """Verify that the breaker opens after enough failures in a row."""
+    breaker.record_failure()
+    assert breaker.allow_request()
+
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == circuit.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == circuit.OPEN
+    assert not breaker.allow_request()
+
+
+def test_half_open_probe(breaker, clock) -> None:
+    """Verify that one probe goes through after the reset timeout."""
+    breaker.record_failure()
+    breaker.record_failure()
+
+    clock.now = 10
+    assert breaker.allow_request()
+    assert breaker.state == circuit.HALF_OPEN
+    # Only one probe at a time.
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == circuit.CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_backs_off(breaker, clock) -> None:
+    """Verify that failed probes double the reset timeout up to the maximum."""
+    breaker.record_failure()
+    breaker.record_failure()
+
+    for expected_timeout in (20, 30, 30):
+        clock.now += breaker.current_timeout
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == circuit.OPEN
+        assert breaker.current_timeout == expected_timeout
+
+    clock.now += 29
+    assert not breaker.allow_request()
+    assert breaker.status() == {"state": circuit.OPEN, "failures": 5, "retry_in": 1.0}
+
+
+def test_breaker_status(breaker) -> None:
+    """Verify that every breaker is visible for monitoring."""
+    assert circuit.breaker_status()["test"] == {"state": circuit.CLOSED, "failures": 0, "retry_in": 0.0}
@@ -0,0 +1,135 @@
+"""Test the compiled trade filter rules."""
+
+import random
+from unittest import mock
+
+import pytest
+from pydantic import ValidationError
+
+from thetagang_notifications.config import settings
+from thetagang_notifications.filters import FilterRule, TradeFilter, build_trade_filter, load_filter_rules
+
+
+def make_trade(user: str = "major", role: str = "patron", symbol: str = "TSLA", trade_type: str = "CASH SECURED PUT", quantity: int = 1) -> dict:
+    """Build the fields of a feed trade that the filters look at."""
+    return {"User": {"username": user, "role": role}, "symbol": symbol, "type": trade_type, "quantity": quantity}
+
+
+def first_match(rules: list[FilterRule], trade: dict) -> FilterRule | None:
+    """Check the rules one by one, the slow way the compiled filter must agree with."""
+    user, role = trade["User"]["username"], trade["User"]["role"]
+    for rule in rules:
+        if rule.matches(user, trade["symbol"].upper(), trade["type"], role, trade["quantity"]):
+            return rule
+    return None
+
+
+def test_first_matching_rule_wins() -> None:
+    """Verify that rules apply in order and unmatched trades are denied."""
+    trade_filter = TradeFilter([
+        FilterRule(action="deny", symbols=frozenset({"gme"})),
+        FilterRule(action="allow", users=frozenset({"major"}), symbols=frozenset({"GME", "AMC"})),
+        FilterRule(action="deny", min_quantity=100),
+        FilterRule(action="allow", roles=frozenset({"patron"}), trade_types=frozenset({"CASH SECURED PUT"})),
+    ])
+
+    assert not trade_filter(make_trade(symbol="GME"))
+    assert trade_filter(make_trade(symbol="AMC", trade_type="LONG CALL"))
+    assert not trade_filter(make_trade(quantity=100))
+    assert trade_filter(make_trade())
+    assert not trade_filter(make_trade(role="member"))
+    assert not trade_filter(make_trade(trade_type="LONG CALL"))
+
+
+def test_catch_all_rule() -> None:
+    """Verify that a rule without conditions decides every trade that reaches it."""
+    allow_all = FilterRule(action="allow")
+    trade_filter = TradeFilter([FilterRule(action="deny", users=frozenset({"bot"})), allow_all])
+
+    assert trade_filter.decide(make_trade(role="member")) is allow_all
+    assert not trade_filter(make_trade(user="bot"))
+
+
+def test_matches_first_match_semantics() -> None:
+    """Verify the compiled filter against checking thousands of rules in order."""
+    rng = random.Random(42)
+    users = [f"user{x}" for x in range(200)]
+    symbols = [f"SYM{x}" for x in range(200)]
+    types = ["CASH SECURED PUT", "LONG CALL", "COVERED CALL", "SHORT IRON CONDOR"]
+    roles = ["patron", "joonie", "member"]
+
+    def sample(values: list[str], chance: float) -> frozenset[str]:
+        return frozenset(rng.sample(values, rng.randint(1, 3))) if rng.random() < chance else frozenset()
+
+    rules = [
+        FilterRule(
+            action=rng.choice(["allow", "deny"]),
+            users=sample(users, 0.7) or frozenset({rng.choice(users)}),
+            symbols=sample(symbols, 0.7),
+            trade_types=sample(types, 0.3),
+            roles=sample(roles, 0.3),
+            min_quantity=rng.choice([None, None, 5]),
+            max_quantity=rng.choice([None, None, 50]),
+        )
+        for _ in range(2000)
+    ]
+    rules.insert(1500, FilterRule(action="deny", min_quantity=90))
+    trade_filter = TradeFilter(rules)
+
+    positions = []
+    for _ in range(2000):
+        trade = make_trade(rng.choice(users), rng.choice(roles), rng.choice(symbols), rng.choice(types), rng.randint(1, 100))
+        expected = first_match(rules, trade)
+        assert trade_filter.decide(trade) is expected
+        positions.append(rules.index(expected) if expected is not None else len(rules))
+    # Make sure the rules were selective enough to reach deep into the list.
+    assert max(positions) >= 1000
+
+
+def test_build_trade_filter_keeps_defaults() -> None:
+    """Verify that skipped users and allowed roles work without a rules file."""
+    with mock.patch.object(settings, "skipped_users", "lurker, quiet"):
+        trade_filter = build_trade_filter()
+
+    assert trade_filter(make_trade())
+    assert trade_filter(make_trade(role="joonie"))
+    assert not trade_filter(make_trade(role="member"))
+    assert not trade_filter(make_trade(user="quiet"))
+
+
+@pytest.mark.parametrize("allowed_roles", ["", " , "])
+def test_no_allowed_roles_allows_nobody(allowed_roles) -> None:
+    """Verify that an empty role list allows no trades instead of every trade."""
+    with mock.patch.object(settings, "allowed_roles", allowed_roles):
+        trade_filter = build_trade_filter()
+
+    assert not trade_filter(make_trade())
+    assert not trade_filter(make_trade(role="member"))
+
+
+def test_build_trade_filter_from_file(tmp_path) -> None:
+    """Verify that rules from the file apply between skipped users and roles."""
+    rules_file = tmp_path / "filters.yml"
+    rules_file.write_text(
+        "- action: deny\n  symbols: [spy]\n  max_quantity: 1\n- action: allow\n  roles: [member]\n  symbols: [TSLA]\n",
+        encoding="utf-8",
+    )
+    with mock.patch.object(settings, "trade_filters_file", str(rules_file)):
+        trade_filter = build_trade_filter()
+
+    assert not trade_filter(make_trade(symbol="SPY"))
+    assert trade_filter(make_trade(symbol="SPY", quantity=2))
+    assert trade_filter(make_trade(role="member"))
+    assert not trade_filter(make_trade(role="member", symbol="AAPL"))
+
+
+def test_load_rejects_bad_rules(tmp_path) -> None:
+    """Verify that typos in the rules file fail loudly."""
+    rules_file = tmp_path / "filters.yml"
+    rules_file.write_text("- action: deny\n  symbol: [SPY]\n", encoding="utf-8")
+    with pytest.raises(ValidationError):
+        load_filter_rules(str(rules_file))
+
+    rules_file.write_text("action: deny\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_filter_rules(str(rules_file))
@@ -0,0 +1,147 @@
+"""Test the receiver for pushed trade events."""
+
+import json
+from http.client import HTTPConnection
+from unittest import mock
+
+import fakeredis
+import httpx
+import pytest
+
+from thetagang_notifications import ingest
+from thetagang_notifications.notification import get_notifier
+from thetagang_notifications.trade import get_trade_class
+from thetagang_notifications.trade_queue import TradeQueue
+
+from .conftest import load_recorded_trades
+
+SECRET = "test-secret"
+
+
+def make_trade(guid: str) -> dict:
+    """Build a complete trade event from a recorded trade."""
+    return {**load_recorded_trades()[0], "guid": guid}
+
+
+@pytest.fixture
+def server():
+    """Run a receiver on a free local port."""
+    ingest_server = ingest.IngestServer(host="127.0.0.1", port=0, secret=SECRET)
+    ingest_server.start()
+    yield ingest_server
+    ingest_server.stop()
+
+
+def push(url: str, payload, secret: str = SECRET) -> httpx.Response:
+    """Stand in for the sender and push signed trades to the receiver."""
+    body = json.dumps(payload).encode()
+    headers = {ingest.SIGNATURE_HEADER: ingest.sign_payload(body, secret), "Content-Type": "application/json"}
+    return httpx.post(url, content=body, headers=headers, timeout=5)
+
+
+def test_verify_signature() -> None:
+    """Verify that signatures are checked against the shared secret."""
+    body = b'{"guid": "1"}'
+    assert ingest.verify_signature(body, ingest.sign_payload(body, SECRET), SECRET)
+    assert not ingest.verify_signature(body, ingest.sign_payload(body, "wrong"), SECRET)
+    assert not ingest.verify_signature(body, None, SECRET)
+    assert not ingest.verify_signature(body, ingest.sign_payload(body, ""), "")
+
+
+def test_parse_trades() -> None:
+    """Verify the payload shapes that the receiver accepts."""
+    trade = make_trade("1")
+    assert ingest.parse_trades(json.dumps(trade).encode()) == [trade]
+    assert ingest.parse_trades(json.dumps([trade, trade]).encode()) == [trade, trade]
+    assert ingest.parse_trades(json.dumps({"data": [trade]}).encode()) == [trade]
+
+    with pytest.raises(ValueError):
+        ingest.parse_trades(b'[{"symbol": "AMD"}]')
+    with pytest.raises(ValueError):
+        ingest.parse_trades(b"not json")
+
+
+@pytest.mark.parametrize(
+    ("change", "message"),
+    [
+        ({"User": None}, "invalid fields: User"),
+        ({"quantity": "many"}, "invalid fields: quantity"),
+        ({"updatedAt": None}, "no updatedAt"),
+        ({"updatedAt": "yesterday-ish"}, "yesterday-ish"),
+    ],
+)
+def test_parse_trades_rejects_incomplete_trades(change, message) -> None:
+    """Verify that trades the queue cannot process are rejected at the receiver."""
+    with pytest.raises(ValueError, match=message):
+        ingest.parse_trades(json.dumps({**make_trade("1"), **change}).encode())
+
+
+@pytest.mark.parametrize("field", ingest.QUEUE_FIELDS)
+def test_parse_trades_rejects_missing_queue_fields(field) -> None:
+    """Verify that one trade without a field the queue reads rejects the whole batch."""
+    trade = make_trade("1")
+    del trade[field]
+    with pytest.raises(ValueError, match=f"missing {field}"):
+        ingest.parse_trades(json.dumps([make_trade("2"), trade]).encode())
+
+
+def test_rejects_bad_requests(server) -> None:
+    """Verify that unsigned, malformed and misrouted requests are rejected."""
+    assert push(server.url, {"guid": "1"}, secret="wrong").status_code == 401
+    assert push(server.url, {"symbol": "AMD"}).status_code == 400
+    assert push(server.url, {"guid": "1"}).status_code == 400
+    assert push(server.url.replace("/trades", "/other"), {"guid": "1"}).status_code == 404
+    assert server.wait_for_trades(timeout=0.1) == []
+
+
+@pytest.mark.parametrize(
+    ("length", "status"),
+    [(None, 411), ("-1", 400), ("lots", 400), (str(ingest.MAX_BODY_BYTES + 1), 413)],
+)
+def test_rejects_bad_lengths(server, length, status) -> None:
+    """Verify that a missing, negative, non-numeric or oversized length is refused before reading."""
+    host, port = server.server_address[:2]
+    connection = HTTPConnection(host, port, timeout=5)
+    connection.putrequest("POST", ingest.INGEST_PATH)
+    if length is not None:
+        connection.putheader("Content-Length", length)
+    connection.endheaders()
+
+    assert connection.getresponse().status == status
+    connection.close()
+    assert server.wait_for_trades(timeout=0.1) == []
+
+
+def test_status(server) -> None:
+    """Verify that circuit breaker state is served for monitoring."""
+    response = httpx.get(server.url.replace("/trades", "/status"), timeout=5)
+
+    assert response.status_code == 200
+    assert "circuit_breakers" in response.json()
+
+
+def test_wait_for_trades_drains_in_order(server) -> None:
+    """Verify that every pushed batch is drained in arrival order."""
+    assert push(server.url, make_trade("1")).status_code == 202
+    assert push(server.url, {"data": [make_trade("2"), make_trade("3")]}).status_code == 202
+
+    assert [x["guid"] for x in server.wait_for_trades(timeout=1)] == ["1", "2", "3"]
+    assert server.wait_for_trades(timeout=0) == []
+
+
+@pytest.mark.parametrize("real_trades", ["CASH SECURED PUT"], indirect=True)
+def test_pushed_trade_end_to_end(server, real_trades) -> None:
+    """Verify that a pushed trade flows through the queue to a notification."""
+    tq = TradeQueue()
+    tq.db_conn = fakeredis.FakeRedis(decode_responses=True)
+    trade = {**real_trades, "updatedAt": "2099-01-01T00:00:00.000Z", "User": {**real_trades["User"], "role": "patron"}}
+
+    assert push(server.url, trade).status_code == 202
+    tq.latest_trades = server.wait_for_trades(timeout=1)
+
+    with mock.patch("thetagang_notifications.notification.DiscordWebhook.execute") as mock_execute:
+        for queued_trade in tq.build_queue():
+            get_notifier(get_trade_class(queued_trade)).notify()
+
+    assert mock_execute.called
+    assert tq.db_conn.get(trade["guid"]) == "closed"
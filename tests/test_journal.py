@@ -0,0 +1,201 @@
+"""Test riding out a Redis outage with the local status journal."""
+
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import fakeredis
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from thetagang_notifications.circuit import OPEN
+from thetagang_notifications.config import settings
+from thetagang_notifications.journal import StatusJournal
+from thetagang_notifications.trade_queue import SNAPSHOT_INTERVAL, TradeQueue
+
+
+def make_trade(guid: str, close_date: str | None = None) -> dict:
+    """Build a minimal recent trade from the patrons feed."""
+    return {
+        "guid": guid,
+        # Distinct symbols keep trades in one cycle from collapsing into rolls.
+        "symbol": guid,
+        "type": "CASH SECURED PUT",
+        "close_date": close_date,
+        "updatedAt": (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat(),
+        "mistake": False,
+        "User": {"username": "real_user", "role": "patron"},
+    }
+
+
+@pytest.fixture
+def server():
+    """Return a fake Redis server that can be taken down."""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def queue(server, tmp_path):
+    """Return a trade queue on the fake server with a journal in a temporary directory."""
+    with (
+        mock.patch.object(settings, "journal_path", str(tmp_path / "statuses.journal")),
+        mock.patch.object(settings, "redis_retry_interval", 0.01),
+    ):
+        tq = TradeQueue()
+    tq.db_conn = fakeredis.FakeRedis(server=server, decode_responses=True)
+    return tq
+
+
+def run_cycle(tq: TradeQueue, trades: list[dict]) -> list[str]:
+    """Run one queue cycle and return the guids that would be notified."""
+    tq.latest_trades = list(trades)
+    return [x["guid"] for x in tq.build_queue()]
+
+
+def test_snapshot_round_trip(tmp_path) -> None:
+    """Verify that the snapshot is replaced whole and an unreadable one is ignored."""
+    journal = StatusJournal(tmp_path / "statuses.journal")
+    assert journal.load_snapshot() == {}
+
+    journal.save_snapshot({"a": "open", "b": "closed"})
+    journal.save_snapshot({"b": "closed", "c": "open"})
+    assert StatusJournal(tmp_path / "statuses.journal").load_snapshot() == {"b": "closed", "c": "open"}
+
+    journal.snapshot_path.write_text('{"b": "clo', encoding="utf-8")
+    assert journal.load_snapshot() == {}
+
+
+def test_journal_round_trip(tmp_path) -> None:
+    """Verify that the journal survives a restart, ignores a torn line and empties on replay."""
+    path = tmp_path / "statuses.journal"
+    journal = StatusJournal(path)
+    journal.record({"a": "open", "b": "open"})
+    journal.record({"a": "closed"})
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write('{"guid": "c", "sta')
+
+    reloaded = StatusJournal(path)
+    assert reloaded.statuses == {"a": "closed", "b": "open"}
+
+    batches = []
+    assert reloaded.replay(batches.append, batch_size=1) == 2
+    assert batches == [[("a", "closed")], [("b", "open")]]
+    assert not path.exists()
+    assert len(reloaded) == 0
+
+
+def test_record_after_torn_line(tmp_path) -> None:
+    """Verify that decisions recorded after a torn tail survive the next load."""
+    path = tmp_path / "statuses.journal"
+    StatusJournal(path).record({"a": "open"})
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write('{"guid": "c", "sta')
+
+    journal = StatusJournal(path)
+    journal.record({"d": "closed"})
+
+    assert StatusJournal(path).statuses == {"a": "open", "d": "closed"}
+    assert path.read_text(encoding="utf-8").endswith('"closed"}\n')
+
+
+def test_malformed_lines_are_skipped(tmp_path) -> None:
+    """Verify that lines that are valid JSON but not journal entries are skipped on load."""
+    path = tmp_path / "statuses.journal"
+    path.write_text('["a", "open"]\n"a"\n{"guid": "b"}\n{"guid": "c", "status": "open"}\n', encoding="utf-8")
+    assert StatusJournal(path).statuses == {"c": "open"}
+
+    journal = StatusJournal(path)
+    journal.snapshot_path.write_text('["a", "open"]', encoding="utf-8")
+    assert journal.load_snapshot() == {}
+
+
+def test_snapshots_are_throttled_while_healthy(queue, server) -> None:
+    """Verify that a healthy store is snapshotted at most once per interval, and again when it goes down."""
+    with mock.patch.object(queue.journal, "save_snapshot", wraps=queue.journal.save_snapshot) as save_snapshot:
+        for x in range(3):
+            run_cycle(queue, [make_trade(str(x))])
+        assert save_snapshot.call_count == 1
+
+        queue._snapshot_at -= SNAPSHOT_INTERVAL
+        run_cycle(queue, [make_trade("3")])
+        assert save_snapshot.call_count == 2
+
+        run_cycle(queue, [make_trade("4")])
+        server.connected = False
+        run_cycle(queue, [make_trade("5")])
+        assert save_snapshot.call_count == 3
+        assert "4" in queue.journal.load_snapshot()
+
+        queue.close()
+        assert save_snapshot.call_count == 3
+
+
+def test_outage_keeps_notifying_without_duplicates(queue, server) -> None:
+    """Verify that new trades are still notified once while Redis is down."""
+    seen, closing = make_trade("seen"), make_trade("closing")
+    assert run_cycle(queue, [seen, closing]) == ["seen", "closing"]
+
+    server.connected = False
+    closed = {**closing, "close_date": "2024-01-01T00:00:00Z"}
+    assert run_cycle(queue, [seen, closed, make_trade("new")]) == ["closing", "new"]
+    assert queue.store_breaker.state == OPEN
+    assert queue.journal.statuses == {"closing": "closed", "new": "open"}
+    # The same feed again during the outage produces nothing.
+    assert run_cycle(queue, [seen, closed, make_trade("new")]) == []
+
+
+def test_recovery_replays_journal(queue, server) -> None:
+    """Verify that the journal is replayed into Redis in pipelines once it is back."""
+    server.connected = False
+    assert run_cycle(queue, [make_trade(str(x)) for x in range(3)]) == ["0", "1", "2"]
+
+    server.connected = True
+    queue.store_breaker.opened_at -= 1
+    with mock.patch.object(settings, "journal_replay_batch_size", 2):
+        assert run_cycle(queue, [make_trade(str(x)) for x in range(3)]) == []
+
+    assert len(queue.journal) == 0
+    assert queue.db_conn.mget(["0", "1", "2"]) == ["open", "open", "open"]
+    assert run_cycle(queue, [make_trade("3")]) == ["3"]
+
+
+def test_restart_during_outage(queue, server, tmp_path) -> None:
+    """Verify that a restart while Redis is down does not notify journaled trades again."""
+    server.connected = False
+    run_cycle(queue, [make_trade("a")])
+
+    with mock.patch.object(settings, "journal_path", str(tmp_path / "statuses.journal")):
+        restarted = TradeQueue()
+    restarted.db_conn = fakeredis.FakeRedis(server=server, decode_responses=True)
+    assert run_cycle(restarted, [make_trade("a")]) == []
+
+
+def test_restart_during_outage_remembers_redis(queue, server, tmp_path) -> None:
+    """Verify that a restart while Redis is down does not notify trades stored in Redis again."""
+    trades = [make_trade(str(x)) for x in range(5)]
+    assert len(run_cycle(queue, trades)) == 5
+    assert run_cycle(queue, trades) == []
+
+    server.connected = False
+    with mock.patch.object(settings, "journal_path", str(tmp_path / "statuses.journal")):
+        restarted = TradeQueue()
+    restarted.db_conn = fakeredis.FakeRedis(server=server, decode_responses=True)
+
+    assert run_cycle(restarted, trades) == []
+    assert run_cycle(restarted, [*trades, make_trade("new")]) == ["new"]
+
+
+def test_failed_replay_keeps_journal(queue, server) -> None:
+    """Verify that a replay that fails partway keeps every status for the next try."""
+    server.connected = False
+    run_cycle(queue, [make_trade("a"), make_trade("b")])
+
+    server.connected = True
+    queue.store_breaker.opened_at -= 1
+    with (
+        mock.patch.object(settings, "journal_replay_batch_size", 1),
+        mock.patch.object(queue, "write_statuses", side_effect=[None, RedisConnectionError("lost again")]),
+    ):
+        assert not queue.store_available()
+
+    assert queue.journal.statuses == {"a": "open", "b": "open"}
+    assert queue.store_breaker.state == OPEN
@@ -0,0 +1,173 @@
+"""Test the leader lease used to run several replicas."""
+
+import time
+from unittest import mock
+
+import fakeredis
+import pytest
+from pydantic import ValidationError
+from redis.exceptions import RedisClusterException
+
+from thetagang_notifications.config import Settings
+from thetagang_notifications.exceptions import LeaseLostError
+from thetagang_notifications.lease import LeaderLease
+
+
+@pytest.fixture
+def db_conn():
+    """Return a fake Redis connection shared by every replica."""
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_only_one_replica_leads(db_conn) -> None:
+    """Verify that a second replica stands by while the lease is held."""
+    leader = LeaderLease(db_conn, key="lease", ttl=5, owner="a")
+    standby = LeaderLease(db_conn, key="lease", ttl=5, owner="b")
+
+    assert leader.acquire()
+    assert not standby.acquire()
+    assert leader.is_leader
+    assert not standby.is_leader
+    assert db_conn.get("lease") == "1:a"
+
+    # Acquiring again just renews the lease we already hold.
+    assert leader.acquire()
+    assert leader.token == 1
+
+
+def test_standby_takes_over_after_crash(db_conn) -> None:
+    """Verify that a standby takes over when the leader stops renewing."""
+    leader = LeaderLease(db_conn, key="lease", ttl=0.2, owner="a")
+    standby = LeaderLease(db_conn, key="lease", ttl=0.2, owner="b")
+    assert leader.acquire()
+
+    # The leader crashes and never renews, so the lease expires.
+    time.sleep(0.3)
+    assert standby.acquire()
+    assert standby.token == 2
+
+    # If the old leader comes back it must notice that it was fenced off.
+    assert not leader.is_leader
+    assert not leader.renew()
+    assert standby.renew()
+
+
+def test_stalled_leader_is_fenced(db_conn) -> None:
+    """Verify that a leader paused past its lease cannot keep writing."""
+    leader = LeaderLease(db_conn, key="lease", ttl=0.2, owner="a")
+    standby = LeaderLease(db_conn, key="lease", ttl=5, owner="b")
+    assert leader.acquire()
+    leader.ensure()
+
+    time.sleep(0.3)
+    assert standby.acquire()
+
+    with pytest.raises(LeaseLostError):
+        leader.ensure()
+    assert leader.token is None
+    standby.ensure()
+
+
+def test_release_hands_over_immediately(db_conn) -> None:
+    """Verify that a graceful shutdown lets the standby take over at once."""
+    leader = LeaderLease(db_conn, key="lease", ttl=5, owner="a")
+    standby = LeaderLease(db_conn, key="lease", ttl=5, owner="b")
+    assert leader.acquire()
+
+    leader.release()
+    assert not leader.is_leader
+    assert standby.acquire()
+
+    # Releasing a lease we lost must not delete the new leader's lease.
+    leader.release()
+    assert db_conn.get("lease") == standby.value
+
+
+def test_renew_keeps_lease_alive(db_conn) -> None:
+    """Verify that renewing the lease keeps the standby out."""
+    leader = LeaderLease(db_conn, key="lease", ttl=0.3, owner="a")
+    standby = LeaderLease(db_conn, key="lease", ttl=0.3, owner="b")
+    assert leader.acquire()
+
+    for _ in range(4):
+        time.sleep(0.1)
+        assert leader.renew()
+        assert not standby.acquire()
+
+
+def test_renews_in_the_background(db_conn) -> None:
+    """Verify that the renewer thread keeps the lease through a cycle longer than its TTL."""
+    leader = LeaderLease(db_conn, key="lease", ttl=0.3, owner="a")
+    standby = LeaderLease(db_conn, key="lease", ttl=0.3, owner="b")
+    leader.start_renewing(interval=0.05)
+    try:
+        time.sleep(0.6)
+        assert leader.is_leader
+        assert leader.took_over()
+        assert not leader.took_over()
+        leader.ensure()
+        assert not standby.acquire()
+    finally:
+        leader.release()
+
+    # Releasing stops the renewer, so the lease stays free for the standby.
+    time.sleep(0.1)
+    assert standby.acquire()
+    assert not leader.is_leader
+
+
+def test_renewer_survives_redis_outage() -> None:
+    """Verify that the renewer keeps trying while Redis is unreachable."""
+    server = fakeredis.FakeServer()
+    server.connected = False
+    leader = LeaderLease(fakeredis.FakeRedis(server=server, decode_responses=True), key="lease", ttl=1, owner="a")
+    leader.start_renewing(interval=0.05)
+    try:
+        time.sleep(0.2)
+        assert not leader.is_leader
+
+        server.connected = True
+        time.sleep(0.2)
+        assert leader.is_leader
+    finally:
+        leader.release()
+
+
+def test_renewer_survives_unexpected_errors(db_conn, caplog) -> None:
+    """Verify that an error other than a Redis failure is logged and the renewer keeps going."""
+    leader = LeaderLease(db_conn, key="lease", ttl=1, owner="a")
+    with mock.patch.object(leader, "acquire", side_effect=[RuntimeError("boom"), True, True, True]) as acquire:
+        leader.start_renewing(interval=0.01)
+        for _ in range(100):
+            if acquire.call_count >= 3:
+                break
+            time.sleep(0.01)
+        leader.stop_renewing()
+
+    assert acquire.call_count >= 3
+    assert "Unexpected error renewing leader lease" in caplog.text
+
+
+def test_renew_interval_must_be_shorter_than_ttl() -> None:
+    """Verify that a renew interval that lets the lease lapse is refused."""
+    with pytest.raises(ValidationError, match="LEASE_RENEW_INTERVAL"):
+        Settings(lease_ttl=5, lease_renew_interval=5)
+    assert Settings(lease_ttl=5, lease_renew_interval=1).lease_renew_interval == 1
+
+
+def test_lease_on_a_cluster(db_conn) -> None:
+    """Verify that renewing and releasing work without the transactions a cluster refuses."""
+    client = mock.MagicMock(wraps=db_conn)
+    client.pipeline.side_effect = RedisClusterException("WATCH is not supported outside of transactional context")
+    leader = LeaderLease(client, key="lease", ttl=5, owner="a")
+    standby = LeaderLease(client, key="lease", ttl=5, owner="b")
+
+    assert leader.acquire()
+    assert leader.renew()
+    assert not standby.acquire()
+    leader.ensure()
+
+    leader.release()
+    assert db_conn.get("lease") is None
+    assert standby.acquire()
+    client.pipeline.assert_not_called()
@@ -0,0 +1,82 @@
+"""Test the notification preview tool."""
+
+import json
+import logging
+from unittest import mock
+
+import httpx
+import pytest
+
+import make_notification
+from thetagang_notifications.config import settings
+
+from .conftest import load_recorded_trades
+
+
+@pytest.fixture
+def root_handlers():
+    """Put back the root log handlers that the tool replaces."""
+    handlers = logging.root.handlers[:]
+    yield
+    logging.root.handlers[:] = handlers
+
+
+def fake_trades_api(requests: list[httpx.Request]) -> httpx.Client:
+    """Return a client that serves the recorded trades by guid."""
+    trades = {x["guid"]: x for x in load_recorded_trades()}
+
+    def respond(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"data": trades[request.url.path.rsplit("/", 1)[-1]]})
+
+    return httpx.Client(transport=httpx.MockTransport(respond))
+
+
+def test_downloads_are_cached(tmp_path) -> None:
+    """Verify that trades are downloaded once, in order, and then read from the cache."""
+    guids = [x["guid"] for x in load_recorded_trades()[:3]]
+    requests: list[httpx.Request] = []
+    with mock.patch.object(make_notification, "get_http_client", return_value=fake_trades_api(requests)):
+        trades = make_notification.download_trades(guids, tmp_path, concurrency=2)
+        assert make_notification.download_trades(guids, tmp_path, concurrency=2) == trades
+
+    assert [x["guid"] for x in trades] == guids
+    assert len(requests) == len(guids)
+    assert requests[0].url.path.startswith(httpx.URL(settings.trades_json_url).path)
+
+
+@pytest.mark.parametrize("guid", ["../x", "/etc/passwd", "not-a-guid"])
+def test_guid_must_be_a_uuid(tmp_path, guid: str) -> None:
+    """Verify that a guid which could escape the cache directory is rejected."""
+    with (
+        mock.patch.object(make_notification, "get_http_client") as mock_client,
+        pytest.raises(ValueError, match="UUID"),
+    ):
+        make_notification.download_trade(guid, tmp_path / "cache")
+
+    mock_client.assert_not_called()
+    assert not list(tmp_path.iterdir())
+
+
+def test_command_line_rejects_bad_guids(capsys) -> None:
+    """Verify that the command line refuses a guid that is not a UUID."""
+    with mock.patch("sys.argv", ["make_notification.py", "../x"]), pytest.raises(SystemExit):
+        make_notification.parse_args()
+
+    assert "invalid parse_guid value" in capsys.readouterr().err
+
+
+def test_preview_to_stdout(tmp_path, capsys, root_handlers) -> None:
+    """Verify that every trade renders to stdout as JSON lines with the logs on stderr."""
+    trades = load_recorded_trades()
+    for trade in trades:
+        (tmp_path / f"{trade['guid']}.json").write_text(json.dumps(trade), encoding="utf-8")
+
+    argv = ["make_notification.py", *(x["guid"] for x in trades), "--cache-dir", str(tmp_path), "--output", "-"]
+    with mock.patch("sys.argv", argv):
+        make_notification.main()
+
+    captured = capsys.readouterr()
+    records = [json.loads(x) for x in captured.out.splitlines()]
+    assert len(records) >= len(trades)
+    assert f"Loaded {len(trades)} trades" in captured.err
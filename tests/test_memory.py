@@ -0,0 +1,111 @@
+"""Test reference cycles and the per-cycle memory report."""
+
+import gc
+import logging
+import tracemalloc
+from unittest import mock
+
+import pytest
+
+from thetagang_notifications import memory, sinks
+from thetagang_notifications.config import settings
+from thetagang_notifications.notification import get_notifier
+from thetagang_notifications.trade import get_trade_class
+
+
+@pytest.fixture
+def memory_sink():
+    """Route deliveries to memory for the length of a test."""
+    sink = sinks.set_sink(sinks.MemorySink())
+    yield sink
+    sinks.set_sink(None)
+
+
+@pytest.fixture
+def reporter():
+    """Return a reporter and make sure tracing stops afterwards."""
+    reporter = memory.MemoryReporter(top=5)
+    yield reporter
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+@pytest.fixture
+def quiet_logging():
+    """Keep pytest's log capture from holding on to records during a measurement."""
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def notify(trade: dict) -> None:
+    """Render and deliver a trade, including the rolled path."""
+    get_notifier(get_trade_class(trade)).notify()
+    get_notifier(get_trade_class({**trade, "rolled_from": trade})).notify()
+
+
+def test_trades_and_notifications_free_without_gc(real_trades, memory_sink) -> None:
+    """Verify that reference counting alone frees trades and their notifications."""
+    notify(real_trades)
+    memory_sink.messages.clear()
+
+    gc.collect()
+    gc.disable()
+    try:
+        notify(real_trades)
+        memory_sink.messages.clear()
+        assert gc.collect() == 0
+    finally:
+        gc.enable()
+
+
+def test_memory_stays_flat(real_trades, memory_sink, reporter, quiet_logging) -> None:
+    """Verify that repeated cycles do not grow memory in the project modules."""
+    cycles = 25
+
+    def run_cycles(count: int) -> list[memory.ModuleGrowth]:
+        for _ in range(count):
+            notify(real_trades)
+            memory_sink.messages.clear()
+        return reporter.report_cycle()
+
+    # The first traced cycles fill interpreter and library caches, which are bounded.
+    reporter.start()
+    run_cycles(2 * cycles)
+    stats = run_cycles(cycles)
+
+    growth = sum(x.size_diff for x in stats if x.module.startswith("thetagang_notifications"))
+    # A few hundred bytes of one-off interpreter caches are fine, but a leak of even
+    # 100 bytes per cycle is not.
+    assert growth < 4096
+
+
+def test_report_groups_growth_by_module(reporter) -> None:
+    """Verify that allocations are attributed to the module that made them."""
+    reporter.start()
+    held = [str(x) * 10 for x in range(5000)]
+    stats = reporter.report_cycle()
+
+    assert stats[0].module == __name__
+    assert stats[0].size_diff > 100_000
+    assert stats[0].count_diff >= len(held)
+
+
+def test_toggle_waits_for_cycle_end(reporter) -> None:
+    """Verify that toggles apply between cycles."""
+    assert not reporter.enabled
+    reporter.request_toggle()
+    assert not reporter.enabled
+
+    assert reporter.report_cycle() == []
+    assert reporter.enabled and tracemalloc.is_tracing()
+
+    reporter.request_toggle()
+    reporter.report_cycle()
+    assert not reporter.enabled and not tracemalloc.is_tracing()
+
+
+def test_enabled_by_setting(reporter) -> None:
+    """Verify that the setting turns reports on at startup."""
+    with mock.patch.object(settings, "memory_report", True):
+        assert memory.MemoryReporter().enabled
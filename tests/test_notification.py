@@ -42,3 +42,69 @@ def test_notify(real_trades):
         test_notifier.notify()
 
     assert mock_execute.called
+
+
+@pytest.mark.parametrize("real_trades", ["CASH SECURED PUT"], indirect=True)
+def test_rolled_notification(real_trades):
+    """Test a notification for a rolled trade."""
+    opened = {**real_trades, "guid": "rolled-guid", "close_date": None}
+    trade_obj = get_trade_class({**opened, "rolled_from": real_trades})
+    test_notifier = notification.get_notifier(trade_obj)
+    embed = test_notifier.generate_embeds()
+
+    assert isinstance(test_notifier, notification.RolledNotification)
+    assert test_notifier.generate_action()["name"] == f"{trade_obj.username} rolled a trade"
+    assert embed.title == trade_obj.notification_title()
+    assert trade_obj.rolled_from.closing_description() in embed.description
+
+
+@pytest.mark.parametrize("real_trades", ["CASH SECURED PUT"], indirect=True)
+def test_opened_and_closed_notification(real_trades):
+    """Test a notification for a trade opened and closed in one cycle."""
+    trade_obj = get_trade_class({**real_trades, "opened_and_closed": True})
+    test_notifier = notification.get_notifier(trade_obj)
+
+    assert isinstance(test_notifier, notification.ClosedNotification)
+    assert test_notifier.generate_action()["name"] == f"{trade_obj.username} opened and closed a trade"
+
+
+def test_pack_embeds_respects_embed_count():
+    """Test that packing never puts more than ten embeds in a message."""
+    embeds = [DiscordEmbed(title=f"Trade {x}", description="short") for x in range(23)]
+    messages = notification.pack_embeds(embeds)
+
+    assert [len(message) for message in messages] == [10, 10, 3]
+    assert [embed for message in messages for embed in message] == embeds
+
+
+def test_pack_embeds_respects_character_limit():
+    """Test that packing starts a new message before the character limit."""
+    embeds = [DiscordEmbed(title="x" * 256, description="y" * 2000) for _ in range(5)]
+    messages = notification.pack_embeds(embeds)
+
+    assert [len(message) for message in messages] == [2, 2, 1]
+    for message in messages:
+        assert sum(notification.embed_size(x) for x in message) <= notification.MAX_EMBED_CHARS_PER_MESSAGE
+
+
+def test_pack_embeds_empty():
+    """Test packing with nothing to send."""
+    assert notification.pack_embeds([]) == []
+
+
+@pytest.mark.parametrize("real_trades", ["CASH SECURED PUT"], indirect=True)
+def test_notify_packed(real_trades):
+    """Test that a batch of notifications is sent in one message per webhook."""
+    trade_obj = get_trade_class(real_trades)
+    notifiers = [notification.get_notifier(trade_obj) for _ in range(3)]
+
+    with (
+        mock.patch.object(settings, "webhook_url_trades_list", "https://example.com/1,https://example.com/2"),
+        mock.patch("thetagang_notifications.notification.DiscordWebhook.execute") as mock_execute,
+    ):
+        webhooks = notification.notify_packed(notifiers)
+        webhook_urls = settings.get_webhook_urls()
+
+    assert len(webhook_urls) == 3
+    assert mock_execute.call_count == len(webhook_urls)
+    assert all(len(webhook.embeds) == 3 for webhook in webhooks)
@@ -0,0 +1,134 @@
+"""Test the open interest index."""
+
+import copy
+from datetime import datetime, timedelta, timezone
+
+from unittest import mock
+
+import fakeredis
+import pytest
+
+from thetagang_notifications.open_interest import OpenInterestIndex, expires_at, expiry_day
+from thetagang_notifications.trade import Trade, get_trade_class
+from thetagang_notifications.trade_queue import TradeQueue
+
+from .conftest import load_recorded_trades
+
+FRIDAY = (datetime.now(timezone.utc) + timedelta(days=7)).date().isoformat()
+LATER = (datetime.now(timezone.utc) + timedelta(days=35)).date().isoformat()
+
+
+def make_open_trade(trade_type: str, guid: str, expiry: str = FRIDAY, symbol: str = "TSLA") -> dict:
+    """Copy a recorded trade of a type and open it on a future expiration."""
+    trade = copy.deepcopy(next(x for x in load_recorded_trades() if x["type"] == trade_type))
+    trade.update({
+        "guid": guid,
+        "symbol": symbol,
+        "expiry_date": f"{expiry}T04:00:00.000Z",
+        "close_date": None,
+        "updatedAt": datetime.now(timezone.utc).isoformat(),
+        "mistake": False,
+    })
+    trade["User"]["role"] = "patron"
+    return trade
+
+
+def close(trade: dict) -> dict:
+    """Return a closed copy of a trade."""
+    return {**trade, "close_date": datetime.now(timezone.utc).isoformat()}
+
+
+def parse(*trades: dict) -> list[Trade]:
+    """Parse feed trades the way the notification path does."""
+    return [get_trade_class(x) for x in trades]
+
+
+@pytest.fixture
+def index():
+    """Return an open interest index backed by fakeredis."""
+    return OpenInterestIndex(fakeredis.FakeRedis(decode_responses=True), prefix="oi")
+
+
+def test_expiry_day() -> None:
+    """Verify that expirations sent as midnight Eastern map to their day."""
+    assert expiry_day("2023-07-28T04:00:00.000Z") == "2023-07-28"
+    assert expiry_day("2024-03-15T00:00:00.000Z") == "2024-03-15"
+    assert expires_at("2024-03-15") == datetime(2024, 3, 16, tzinfo=timezone.utc).timestamp()
+
+
+def test_update_adds_positions_with_strikes(index) -> None:
+    """Verify that opened option trades are indexed with quantities and strikes."""
+    trades = [
+        make_open_trade("PUT CREDIT SPREAD", "a"),
+        make_open_trade("CASH SECURED PUT", "b"),
+        make_open_trade("LONG CALL", "c", expiry=LATER),
+        make_open_trade("BUY COMMON STOCK", "d"),
+    ]
+    assert index.update(parse(*trades)) == 3
+
+    positions = index.positions("tsla", FRIDAY)
+    assert [x.guid for x in positions] == ["a", "b"]
+    assert positions[0].trade_type == "PUT CREDIT SPREAD"
+    assert set(positions[0].strikes) == {"short_put", "long_put"}
+    assert positions[1].short
+    assert index.expiries("TSLA") == [FRIDAY, LATER]
+    assert sum(index.contracts("TSLA", FRIDAY).values()) == 3
+
+
+def test_closing_removes_position(index) -> None:
+    """Verify that closing trades removes them and forgets empty expirations."""
+    opened = make_open_trade("CASH SECURED PUT", "a")
+    index.update(parse(opened, make_open_trade("LONG CALL", "b", expiry=LATER)))
+
+    index.update(parse(close(opened)))
+    assert index.positions("TSLA", FRIDAY) == []
+    assert index.expiries("TSLA") == [LATER]
+    assert index.db_conn.zrange(index.schedule_key, 0, -1) == [f"TSLA:{LATER}"]
+
+
+def test_prune_only_reads_expired_entries(index) -> None:
+    """Verify that pruning drops expired positions and keeps the rest."""
+    index.update(parse(make_open_trade("CASH SECURED PUT", "a"), make_open_trade("LONG CALL", "b", expiry=LATER)))
+
+    assert index.prune(now=expires_at(FRIDAY)) == 1
+    assert index.positions("TSLA", FRIDAY) == []
+    assert [x.guid for x in index.positions("TSLA", LATER)] == ["b"]
+    assert index.prune(now=expires_at(FRIDAY)) == 0
+
+
+def test_update_skips_expired_trades(index) -> None:
+    """Verify that trades opened on a past expiration are not indexed."""
+    assert index.update(parse(make_open_trade("CASH SECURED PUT", "a", expiry="2020-01-17"))) == 0
+    assert index.db_conn.keys() == []
+
+
+def test_roll_moves_position(index) -> None:
+    """Verify that a roll closes the old position and opens the new one."""
+    opened = make_open_trade("CASH SECURED PUT", "a")
+    index.update(parse(opened))
+
+    rolled = {**make_open_trade("CASH SECURED PUT", "b", expiry=LATER), "rolled_from": close(opened)}
+    assert index.update(parse(rolled)) == 2
+    assert index.expiries("TSLA") == [LATER]
+    assert [x.guid for x in index.positions("TSLA", LATER)] == ["b"]
+
+
+def test_cycle_updates_index(run_trades) -> None:
+    """Verify that each cycle keeps the index current as trades open and close."""
+    tq = TradeQueue()
+    tq.db_conn = fakeredis.FakeRedis(decode_responses=True)
+    index = OpenInterestIndex(tq.db_conn)
+    trade = make_open_trade("SHORT NAKED CALL", "a", symbol="SPY")
+
+    with (
+        mock.patch.object(run_trades.symbol_cache, "prefetch"),
+        mock.patch("thetagang_notifications.notification.DiscordWebhook.execute"),
+    ):
+        tq.latest_trades = [trade]
+        assert run_trades.notify_trades(tq) == 1
+        assert [x.guid for x in index.positions("SPY", FRIDAY)] == ["a"]
+
+        tq.latest_trades = [close(trade)]
+        assert run_trades.notify_trades(tq) == 1
+    assert index.positions("SPY", FRIDAY) == []
+    assert index.expiries("SPY") == []
@@ -0,0 +1,140 @@
+"""Test reloading the configuration without a restart."""
+
+import os
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from thetagang_notifications import routing
+from thetagang_notifications.config import settings
+from thetagang_notifications.reload import ConfigReloader
+from thetagang_notifications.trade import get_spec_data, set_trade_specs
+
+SPEC_FILE = Path(settings.trade_spec_file).resolve()
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    """Run from a directory with its own .env and spec file, restoring the settings after."""
+    saved = dict(settings.__dict__)
+    spec_file = tmp_path / "trade_specs.yml"
+    spec_file.write_text(SPEC_FILE.read_text(encoding="utf-8"), encoding="utf-8")
+    (tmp_path / ".env").write_text(f"TRADE_SPEC_FILE={spec_file}\n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    settings.__dict__.update({"trade_spec_file": str(spec_file)})
+    yield tmp_path
+    settings.__dict__.update(saved)
+    set_trade_specs(None)
+    routing.set_router(None)
+
+
+def touch(path: Path, text: str) -> None:
+    """Rewrite a file and make sure its modification time moves forward."""
+    before = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(before + 1_000_000_000, before + 1_000_000_000))
+
+
+def test_reload_applies_between_cycles(config_dir) -> None:
+    """Verify that a changed .env is staged, then goes live only when applied."""
+    reloader = ConfigReloader()
+    assert not reloader.check()
+
+    env = config_dir / ".env"
+    touch(env, env.read_text(encoding="utf-8") + "SKIPPED_USERS=lurker\n")
+    assert reloader.check()
+    assert settings.skipped_users == ""
+
+    trade_queue = SimpleNamespace(trade_filter=None)
+    assert reloader.apply_pending(trade_queue)
+    assert settings.skipped_users == "lurker"
+    assert reloader.generation == 1
+    assert not trade_queue.trade_filter({"User": {"username": "lurker", "role": "patron"}, "symbol": "SPY", "type": "X"})
+    assert not reloader.apply_pending(trade_queue)
+
+
+def test_startup_settings_need_a_restart(config_dir, caplog) -> None:
+    """Verify that changing settings read when long-lived objects are built asks for a restart."""
+    reloader = ConfigReloader()
+    env = config_dir / ".env"
+    extra = f"JOURNAL_PATH={settings.journal_path}\nLEASE_TTL=9\nFEED_RESET_TIMEOUT=7\nSKIPPED_USERS=lurker\n"
+    touch(env, env.read_text(encoding="utf-8") + extra)
+    assert reloader.check()
+
+    assert reloader.apply_pending()
+    assert "only take effect after a restart: feed_reset_timeout, lease_ttl" in caplog.text
+
+
+def test_bad_config_keeps_old_one(config_dir, caplog) -> None:
+    """Verify that an invalid .env is rejected and the running settings are kept."""
+    reloader = ConfigReloader()
+    port = settings.redis_port
+
+    touch(config_dir / ".env", "REDIS_PORT=not-a-port\n")
+    assert not reloader.check()
+    assert "Rejected new configuration" in caplog.text
+    assert not reloader.apply_pending()
+    assert settings.redis_port == port
+    assert reloader.generation == 0
+
+    # The same broken file is not reported again on the next poll.
+    caplog.clear()
+    assert not reloader.check()
+    assert not caplog.text
+
+
+def test_spec_changes_swap_atomically(config_dir) -> None:
+    """Verify that new trade specs replace the registry only when applied."""
+    reloader = ConfigReloader()
+    assert get_spec_data("COVERED CALL").sentiment == "bearish"
+
+    spec_file = config_dir / "trade_specs.yml"
+    specs = spec_file.read_text(encoding="utf-8")
+    start = specs.index("type: COVERED CALL")
+    end = specs.index("sentiment: bearish", start)
+    touch(spec_file, specs[:end] + "sentiment: neutral" + specs[end + len("sentiment: bearish") :])
+    assert reloader.check()
+    assert get_spec_data("COVERED CALL").sentiment == "bearish"
+
+    reloader.apply_pending()
+    assert get_spec_data("COVERED CALL").sentiment == "neutral"
+
+
+def test_spec_file_missing_types_is_rejected(config_dir) -> None:
+    """Verify that dropping a trade type from the specs is refused."""
+    reloader = ConfigReloader()
+    get_spec_data("COVERED CALL")
+
+    spec_file = config_dir / "trade_specs.yml"
+    specs = spec_file.read_text(encoding="utf-8")
+    touch(spec_file, specs.replace("type: COVERED CALL", "type: SOMETHING ELSE"))
+    assert not reloader.check()
+    assert get_spec_data("COVERED CALL")
+
+
+def test_request_reload_without_watcher(config_dir) -> None:
+    """Verify that SIGHUP reloads at the next cycle even when nothing changed on disk."""
+    reloader = ConfigReloader()
+    reloader.request_reload()
+
+    assert reloader.apply_pending()
+    assert reloader.generation == 1
+
+
+def test_watcher_thread_stages_changes(config_dir) -> None:
+    """Verify that the watcher thread notices a changed file by itself."""
+    reloader = ConfigReloader(interval=0.05)
+    reloader.start()
+    try:
+        env = config_dir / ".env"
+        touch(env, env.read_text(encoding="utf-8") + "ALLOWED_ROLES=patron\n")
+        deadline = time.monotonic() + 5
+        while reloader.pending is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        reloader.stop()
+
+    assert reloader.apply_pending()
+    assert settings.allowed_roles == "patron"
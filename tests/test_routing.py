@@ -0,0 +1,116 @@
+"""Test routing trades to webhooks."""
+
+from unittest import mock
+
+import pytest
+from pydantic import ValidationError
+
+from thetagang_notifications import routing, sinks
+from thetagang_notifications.config import settings
+from thetagang_notifications.notification import get_notifier, notify_packed
+from thetagang_notifications.routing import Route, Router
+from thetagang_notifications.trade import get_trade_class
+
+from .conftest import load_recorded_trades
+
+SPY = "https://example.com/spy"
+MAJOR = "https://example.com/major"
+BEARS = "https://example.com/bears"
+CLOSED_BULLS = "https://example.com/closed-bulls"
+FIREHOSE = "https://example.com/all"
+
+ROUTES = [
+    Route(webhooks=frozenset({SPY}), symbols=frozenset({"spy"})),
+    Route(webhooks=frozenset({MAJOR}), users=frozenset({"major"})),
+    Route(webhooks=frozenset({BEARS}), sentiments=frozenset({"bearish"})),
+    Route(webhooks=frozenset({CLOSED_BULLS}), sentiments=frozenset({"bullish"}), statuses=frozenset({"closed"})),
+]
+
+
+@pytest.fixture(scope="module")
+def trades():
+    """Return every recorded example trade keyed by type."""
+    return {x["type"]: get_trade_class(x) for x in load_recorded_trades()}
+
+
+@pytest.fixture
+def routed():
+    """Route notifications with the test routes into a memory sink."""
+    sink = sinks.set_sink(sinks.MemorySink())
+    routing.set_router(Router(ROUTES))
+    with mock.patch.object(settings, "webhook_url_trades_list", FIREHOSE), mock.patch.object(settings, "webhook_url_trades", None):
+        yield sink
+    routing.set_router(None)
+    sinks.set_sink(None)
+
+
+def test_route_by_attributes(trades) -> None:
+    """Verify that each trade goes to every route it matches."""
+    router = Router(ROUTES)
+
+    # major, SPY, bullish, closed
+    assert router.route(trades["CASH SECURED PUT"]) == (CLOSED_BULLS, MAJOR, SPY)
+    # piotr91, SPY, bullish, open
+    assert router.route(trades["CALL DEBIT SPREAD"]) == (SPY,)
+    # Luk77e, PLTR, bearish, open
+    assert router.route(trades["LONG PUT"]) == (BEARS,)
+    # jcvalhalla, PLTR, bullish, closed
+    assert router.route(trades["LONG CALL"]) == (CLOSED_BULLS,)
+    # TCB47, UAL, neutral, closed
+    assert router.route(trades["LONG STRADDLE"]) == ()
+
+
+def test_route_everywhere(trades) -> None:
+    """Verify that a route without conditions receives every trade."""
+    router = Router([Route(webhooks=frozenset({FIREHOSE})), *ROUTES])
+
+    assert router.route(trades["LONG STRADDLE"]) == (FIREHOSE,)
+    assert FIREHOSE in router.route(trades["LONG PUT"])
+
+
+def test_compound_routes_are_indexed(trades) -> None:
+    """Verify that compound routes only sit under one value of one attribute."""
+    router = Router(ROUTES)
+
+    assert router.index["sentiments"]["bullish"].compound == [ROUTES[3]]
+    assert router.index["symbols"]["SPY"].webhooks == {SPY}
+    assert not router.index["statuses"]
+
+
+def test_load_routes(tmp_path) -> None:
+    """Verify that routes load from YAML and typos are refused."""
+    routes_file = tmp_path / "routes.yml"
+    routes_file.write_text(f"- webhooks: [{SPY}]\n  symbols: [spy]\n  statuses: [open]\n", encoding="utf-8")
+    assert routing.load_routes(str(routes_file)) == [
+        Route(webhooks=frozenset({SPY}), symbols=frozenset({"SPY"}), statuses=frozenset({"open"}))
+    ]
+
+    routes_file.write_text(f"- webhooks: [{SPY}]\n  sentiments: [sideways]\n", encoding="utf-8")
+    with pytest.raises(ValidationError):
+        routing.load_routes(str(routes_file))
+
+
+def test_notify_falls_back_to_configured_webhooks(routed, trades) -> None:
+    """Verify that trades no route wants go to the configured webhooks."""
+    get_notifier(trades["LONG STRADDLE"]).notify()
+    get_notifier(trades["LONG PUT"]).notify()
+
+    assert [url for url, _ in routed.messages] == [FIREHOSE, BEARS]
+
+
+def test_notify_packed_renders_each_embed_once(routed, trades) -> None:
+    """Verify that packed delivery renders once and sends each webhook only its trades."""
+    notifiers = [get_notifier(trades[x]) for x in ("CASH SECURED PUT", "COVERED CALL", "LONG PUT", "LONG STRADDLE")]
+    notify_packed(notifiers)
+    delivered = {url: message for url, message in routed.messages}
+
+    assert set(delivered) == {MAJOR, SPY, CLOSED_BULLS, BEARS, FIREHOSE}
+    # Both of major's SPY trades go to the user and the symbol channels as the same embeds.
+    assert len(delivered[MAJOR]) == 2
+    assert [id(x) for x in delivered[MAJOR]] == [id(x) for x in delivered[SPY]]
+    assert len(delivered[BEARS]) == 2
+    assert len(delivered[FIREHOSE]) == 1
+    # Eight embeds were delivered, but only one was rendered per notification.
+    embeds = [embed for message in delivered.values() for embed in message]
+    assert len(embeds) == 8
+    assert len({id(x) for x in embeds}) == len(notifiers)
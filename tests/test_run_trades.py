@@ -0,0 +1,98 @@
+"""Test the daemon loop in run_trades.py."""
+
+from unittest import mock
+
+import fakeredis
+import pytest
+
+from thetagang_notifications.circuit import CLOSED, OPEN
+from thetagang_notifications.config import settings
+from thetagang_notifications.exceptions import LeaseLostError
+from thetagang_notifications.scheduler import MAX_IDLE_CYCLES
+from thetagang_notifications.trade import get_trade_class
+from thetagang_notifications.trade_queue import TradeQueue
+
+from .conftest import load_recorded_trades
+from .test_trade_queue import make_trade
+
+
+@pytest.fixture
+def lease(run_trades):
+    """Install a leader lease held by another replica."""
+    standby = mock.Mock(is_leader=False)
+    with (
+        mock.patch.object(settings, "lease_enabled", True),
+        mock.patch.object(run_trades, "leader_lease", standby),
+        mock.patch.object(run_trades.poll_job, "interval", run_trades.poll_job.interval),
+        mock.patch.object(run_trades.poll_scheduler, "idle_cycles", 0),
+    ):
+        yield standby
+
+
+def test_standby_polls_do_not_back_off(run_trades, lease) -> None:
+    """Verify that polls while another replica leads leave the schedule alone."""
+    interval = run_trades.poll_job.interval
+    with mock.patch.object(run_trades, "run_cycle") as run_cycle:
+        for _ in range(10):
+            run_trades.poll()
+
+    run_cycle.assert_not_called()
+    assert run_trades.poll_scheduler.idle_cycles == 0
+    assert run_trades.poll_job.interval == interval
+
+
+def test_takeover_polls_on_a_fresh_interval(run_trades, lease) -> None:
+    """Verify that a takeover polls through the full cycle and reschedules the next poll."""
+    lease.is_leader = True
+    lease.took_over.return_value = True
+    run_trades.poll_scheduler.idle_cycles = MAX_IDLE_CYCLES
+    run_trades.poll_job.interval = settings.poll_max_interval
+
+    with (
+        mock.patch.object(run_trades, "run_queue", return_value=0) as run_queue,
+        mock.patch.object(run_trades.config_reloader, "apply_pending") as apply_pending,
+        mock.patch.object(run_trades.supervisor_link, "cycle_finished") as cycle_finished,
+    ):
+        run_trades.handle_takeover()
+
+    run_queue.assert_called_once()
+    apply_pending.assert_called_once()
+    cycle_finished.assert_called_once()
+    assert run_trades.poll_scheduler.idle_cycles == 1
+    assert run_trades.poll_job.interval < settings.poll_max_interval
+    # The next poll is scheduled on the new interval, not the backed-off one.
+    job = run_trades.poll_job
+    assert (job.next_run - job.last_run).total_seconds() == pytest.approx(job.interval, abs=1)
+
+
+def test_lost_lease_stores_nothing(run_trades, lease) -> None:
+    """Verify that losing the lease during a cycle leaves the statuses for the new leader."""
+    tq = TradeQueue()
+    tq.db_conn = fakeredis.FakeRedis(decode_responses=True)
+    tq.latest_trades = [make_trade("1")]
+    lease.ensure.side_effect = LeaseLostError("a")
+
+    with (
+        mock.patch.object(run_trades.symbol_cache, "prefetch") as prefetch,
+        mock.patch("thetagang_notifications.notification.DiscordWebhook.execute") as execute,
+    ):
+        assert run_trades.notify_trades(tq) == 0
+
+    prefetch.assert_called_once()
+    execute.assert_not_called()
+    assert tq.db_conn.get("1") is None
+
+
+def test_closes_wait_for_redis(run_trades) -> None:
+    """Verify that closes seen while Redis is down reach the aggregates once it is back."""
+    tq = TradeQueue()
+    tq.db_conn = fakeredis.FakeRedis(decode_responses=True)
+    trades = [get_trade_class(x) for x in load_recorded_trades()]
+    with mock.patch.object(run_trades, "aggregates", None):
+        tq.store_breaker.state = OPEN
+        run_trades.update_redis_views(tq, [], trades)
+        assert run_trades.get_aggregates(tq).stats("user", "major")["trades"] == 0
+
+        tq.store_breaker.state = CLOSED
+        run_trades.update_redis_views(tq, [], [])
+        assert run_trades.get_aggregates(tq).stats("user", "major")["trades"] == 5
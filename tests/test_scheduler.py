@@ -0,0 +1,116 @@
+"""Test the adaptive polling schedule."""
+
+from datetime import date, datetime
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from thetagang_notifications.config import settings
+from thetagang_notifications.scheduler import PollScheduler
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+# A regular Wednesday during market hours and a Sunday morning.
+MARKET_OPEN = datetime(2024, 3, 6, 10, 0, tzinfo=NEW_YORK)
+SUNDAY = datetime(2024, 3, 3, 3, 0, tzinfo=NEW_YORK)
+
+
+@pytest.fixture
+def scheduler():
+    """Return a scheduler with one market holiday."""
+    with mock.patch.object(settings, "market_holidays", "2024-03-07"):
+        return PollScheduler()
+
+
+def test_market_is_open(scheduler) -> None:
+    """Verify market hours, weekends and holidays."""
+    assert scheduler.market_is_open(MARKET_OPEN)
+    assert not scheduler.market_is_open(MARKET_OPEN.replace(hour=9, minute=29))
+    assert not scheduler.market_is_open(MARKET_OPEN.replace(hour=16))
+    assert not scheduler.market_is_open(SUNDAY)
+    assert not scheduler.market_is_open(MARKET_OPEN.replace(day=7))
+
+
+def test_seconds_until_open(scheduler) -> None:
+    """Verify that holidays and weekends are skipped when finding the next open."""
+    # Thursday is a holiday, so Wednesday evening waits until Friday's open.
+    evening = MARKET_OPEN.replace(hour=17)
+    assert scheduler.seconds_until_open(evening) == (datetime(2024, 3, 8, 9, 30, tzinfo=NEW_YORK) - evening).total_seconds()
+
+    # Times in other timezones are converted to market time.
+    utc_morning = datetime(2024, 3, 6, 14, 0, tzinfo=ZoneInfo("UTC"))
+    assert scheduler.seconds_until_open(utc_morning) == 30 * 60
+
+
+def test_next_interval_by_market_hours(scheduler) -> None:
+    """Verify that polling is slower while the market is closed."""
+    assert scheduler.next_interval(MARKET_OPEN) == settings.poll_market_interval
+    assert scheduler.next_interval(SUNDAY) == settings.poll_closed_interval
+
+    # Close to the open we wake up for the opening bell.
+    before_open = MARKET_OPEN.replace(hour=9, minute=29, second=50)
+    assert scheduler.next_interval(before_open) == 10
+
+
+def test_next_interval_backs_off_when_idle(scheduler) -> None:
+    """Verify that empty polls back off up to the maximum interval."""
+    intervals = []
+    for _ in range(20):
+        scheduler.record_cycle(0)
+        intervals.append(scheduler.next_interval(SUNDAY))
+
+    assert intervals == sorted(intervals)
+    assert intervals[0] > settings.poll_closed_interval
+    assert intervals[-1] == settings.poll_max_interval
+
+
+def test_idle_night_does_not_delay_the_open(scheduler) -> None:
+    """Verify that a long idle streak wakes up for the opening bell and polls at the base rate after it."""
+    before_open = MARKET_OPEN.replace(hour=9, minute=29)
+    for _ in range(20):
+        scheduler.record_cycle(0)
+
+    assert scheduler.next_interval(before_open) == 60
+    with mock.patch.object(settings, "ingest_enabled", True):
+        assert scheduler.next_interval(before_open) == 60
+
+    assert scheduler.next_interval(MARKET_OPEN.replace(hour=9, minute=30)) == settings.poll_market_interval
+    assert scheduler.idle_cycles == 0
+
+
+def test_next_interval_speeds_up_with_trades(scheduler) -> None:
+    """Verify that a steady flow of trades shortens the interval."""
+    with mock.patch("thetagang_notifications.scheduler.time.monotonic", side_effect=[0, 15, 30, 45]):
+        for _ in range(4):
+            scheduler.record_cycle(3)
+
+    assert scheduler.idle_cycles == 0
+    assert scheduler.arrival_rate > 0
+    assert settings.poll_min_interval <= scheduler.next_interval(MARKET_OPEN) < settings.poll_market_interval
+
+
+def test_market_holidays_list() -> None:
+    """Verify that market holidays are parsed from the settings."""
+    with mock.patch.object(settings, "market_holidays", "2024-12-25, 2025-01-01,"):
+        assert settings.market_holidays_list == [date(2024, 12, 25), date(2025, 1, 1)]
+
+
+def test_next_interval_with_push_enabled(scheduler) -> None:
+    """Verify that polling slows to reconciliation when trades are pushed."""
+    with mock.patch.object(settings, "ingest_enabled", True):
+        assert scheduler.next_interval(MARKET_OPEN) == settings.ingest_reconcile_interval
+
+
+def test_state_round_trip() -> None:
+    """Verify that the learned state survives a handover."""
+    scheduler = PollScheduler()
+    scheduler.arrival_rate = 2.5
+    scheduler.idle_cycles = 4
+
+    replacement = PollScheduler()
+    replacement.restore(scheduler.state())
+    assert replacement.state() == {"arrival_rate": 2.5, "idle_cycles": 4}
+
+    replacement.restore({})
+    assert replacement.idle_cycles == 4
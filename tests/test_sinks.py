@@ -0,0 +1,59 @@
+"""Test the notification sinks."""
+
+import json
+from unittest import mock
+
+import pytest
+from discord_webhook import DiscordEmbed, DiscordWebhook
+
+from thetagang_notifications import sinks
+from thetagang_notifications.config import settings
+from thetagang_notifications.notification import deliver_routed
+
+
+@pytest.fixture
+def memory_sink():
+    """Route deliveries to memory for the length of a test."""
+    sink = sinks.set_sink(sinks.MemorySink())
+    yield sink
+    sinks.set_sink(None)
+
+
+def test_create_sink() -> None:
+    """Verify that the sink follows the settings."""
+    with mock.patch.object(settings, "notification_sink", "memory"):
+        assert isinstance(sinks.create_sink(), sinks.MemorySink)
+    with mock.patch.object(settings, "notification_sink", "discord"):
+        assert isinstance(sinks.create_sink(), sinks.DiscordSink)
+
+
+def test_memory_sink_makes_no_requests(memory_sink) -> None:
+    """Verify that the memory sink keeps messages without sending them."""
+    with mock.patch.object(DiscordWebhook, "execute") as mock_execute:
+        webhooks = deliver_routed({"url": [[DiscordEmbed(title="one")], [DiscordEmbed(title="two")]]})
+
+    mock_execute.assert_not_called()
+    assert len(webhooks) == 2
+    assert [message[0].title for _, message in memory_sink.messages] == ["one", "two"]
+
+
+def test_memory_sink_is_bounded() -> None:
+    """Verify that the memory sink keeps only the newest messages but counts them all."""
+    sink = sinks.MemorySink(max_messages=3)
+    sink.deliver("url", [[DiscordEmbed(title=str(x))] for x in range(5)])
+
+    assert [message[0].title for _, message in sink.messages] == ["2", "3", "4"]
+    assert sink.delivered == 5
+
+
+def test_jsonl_file_sink(tmp_path) -> None:
+    """Verify that the file sink writes one redacted JSON line per message."""
+    path = tmp_path / "notifications.jsonl"
+    sink = sinks.JsonlFileSink(str(path))
+    sink.deliver("https://discord.com/api/webhooks/1/token", [[DiscordEmbed(title="one")], [DiscordEmbed(title="two")]])
+    sink.close()
+
+    lines = [json.loads(x) for x in path.read_text().splitlines()]
+    assert [x["embeds"][0]["title"] for x in lines] == ["one", "two"]
+    assert lines[0]["webhook"] == "https://discord.com/api/webhooks/1/***"
+    assert lines[0]["username"] == settings.discord_username
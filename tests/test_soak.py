@@ -0,0 +1,283 @@
+"""Soak test the polling cycle for leaks and latency drift.
+
+`run_queue` runs back to back against a synthetic feed, fakeredis and a local
+webhook receiver while RSS, object counts, open file descriptors, connection
+pool size, threads and cycle latency are sampled. The test fails when the fitted
+slope of any of them is over its limit. A week of 15 second polls is about
+40,000 cycles, so run a real soak with something like:
+
+    SOAK_CYCLES=200000 uv run pytest tests/test_soak.py --no-cov
+"""
+
+import copy
+import gc
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+import fakeredis
+import httpx
+import pytest
+
+from thetagang_notifications import sinks
+from thetagang_notifications.config import settings
+from thetagang_notifications.models import SymbolMetadata
+from thetagang_notifications.supervisor import read_rss
+from thetagang_notifications.symbols import symbol_cache
+from thetagang_notifications.trade_queue import TradeQueue
+
+from .conftest import load_recorded_trades
+from .test_trade_queue import store_key
+
+SOAK_CYCLES = int(os.environ.get("SOAK_CYCLES", "300"))
+SAMPLES = 30
+# Samples from the start of the run fill caches and pools, so they are left out of the fit.
+WARMUP_FRACTION = 0.2
+
+
+@dataclass(frozen=True)
+class Limit:
+    """Largest allowed growth for a metric.
+
+    Short runs are noisy, so a slope over the limit only fails the test when the
+    fitted growth over the whole run is also over the noise floor.
+    """
+
+    metric: str
+    per_1000_cycles: float
+    noise_floor: float
+
+
+LIMITS = [
+    Limit("rss", per_1000_cycles=256 * 1024, noise_floor=8 * 1024 * 1024),
+    Limit("objects", per_1000_cycles=100, noise_floor=5000),
+    Limit("fds", per_1000_cycles=1, noise_floor=2),
+    Limit("redis_connections", per_1000_cycles=1, noise_floor=2),
+    Limit("threads", per_1000_cycles=1, noise_floor=2),
+    Limit("latency", per_1000_cycles=0.0001, noise_floor=0.001),
+]
+
+
+class SyntheticFeed:
+    """Patrons feed that opens new trades every cycle and later closes them."""
+
+    def __init__(self, templates: list[dict], window: int = 50, new_per_cycle: int = 2, open_trades: int = 10) -> None:
+        """Constructor for SyntheticFeed."""
+        self.templates = templates
+        self.window: deque[dict] = deque()
+        self.window_size = window
+        self.new_per_cycle = new_per_cycle
+        self.open_trades: deque[dict] = deque()
+        self.max_open_trades = open_trades
+        # Notifications each trade should get, and trades that will never show up again.
+        self.expected: Counter[str] = Counter()
+        self.retired: list[str] = []
+        self.serial = 0
+
+    def advance(self) -> None:
+        """Move the feed forward by one cycle."""
+        now = datetime.now(timezone.utc).isoformat()
+        for _ in range(self.new_per_cycle):
+            trade = copy.deepcopy(self.templates[self.serial % len(self.templates)])
+            self.serial += 1
+            trade.update({
+                "guid": str(uuid.uuid4()),
+                "close_date": None,
+                "price_closed": None,
+                "mistake": False,
+                "updatedAt": now,
+            })
+            # A prime-sized pool of users keeps the per-user aggregates bounded, and the
+            # same user only meets the same template every 97 * len(templates) trades,
+            # so trades never collapse into rolls.
+            trade["User"].update({"username": f"soak{self.serial % 97}", "role": "patron"})
+            self.publish(trade)
+            if "COMMON STOCK" not in trade["type"]:
+                self.open_trades.append(trade)
+
+        while len(self.open_trades) > self.max_open_trades:
+            opened = self.open_trades.popleft()
+            closed = {
+                **opened,
+                "close_date": now,
+                "price_closed": round(opened["price_filled"] / 2, 2),
+                "win": True,
+                "profitLoss": "10",
+                "updatedAt": now,
+            }
+            if opened in self.window:
+                self.window.remove(opened)
+            self.publish(closed)
+
+    def publish(self, trade: dict) -> None:
+        """Add a trade to the feed and expect a notification for it."""
+        self.window.append(trade)
+        self.expected[trade["guid"]] += 1
+        while len(self.window) > self.window_size:
+            dropped = self.window.popleft()
+            if dropped["close_date"] or dropped not in self.open_trades:
+                self.retired.append(dropped["guid"])
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        """Answer a request for the patrons feed."""
+        return httpx.Response(200, json={"data": list(self.window)})
+
+
+class WebhookReceiver(HTTPServer):
+    """Local stand-in for Discord that counts notifications per trade."""
+
+    def __init__(self) -> None:
+        """Constructor for WebhookReceiver."""
+        super().__init__(("127.0.0.1", 0), WebhookHandler)
+        self.notifications: Counter[str] = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Return the webhook URL."""
+        return f"http://127.0.0.1:{self.server_port}/api/webhooks/1/soak"
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Accept webhook messages like Discord does."""
+
+    server: WebhookReceiver
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Record the trade behind every embed."""
+        message = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            for embed in message["embeds"]:
+                self.server.notifications[embed["author"]["url"].rsplit("/", 1)[1]] += 1
+
+        body = b'{"id": "1"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        """Keep request logs out of the test output."""
+
+
+def object_counts() -> Counter[str]:
+    """Count live objects by type."""
+    gc.collect()
+    return Counter(type(x).__name__ for x in gc.get_objects())
+
+
+def sample(tq: TradeQueue, latencies: list[float], rss: list[int]) -> dict[str, float]:
+    """Measure everything that must stay flat."""
+    pool = tq.db_conn.connection_pool
+    return {
+        # The allocator hands memory back in bursts, so RSS is a sawtooth and only
+        # its low points show what is really retained.
+        "rss": min(rss),
+        "objects": len(gc.get_objects()),
+        "fds": len(os.listdir("/proc/self/fd")),
+        "redis_connections": len(pool._available_connections) + len(pool._in_use_connections),
+        "threads": threading.active_count(),
+        "latency": statistics.median(latencies),
+    }
+
+
+def slope(points: list[tuple[int, float]]) -> float:
+    """Return the least squares slope of the points."""
+    xs, ys = zip(*points, strict=True)
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys, strict=True)) / variance
+
+
+@pytest.fixture
+def receiver():
+    """Run the webhook receiver."""
+    server = WebhookReceiver()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc to count resources")
+def test_soak(run_trades, receiver) -> None:
+    """Run many cycles and fail if any resource or the latency keeps growing."""
+    templates = load_recorded_trades()
+    feed = SyntheticFeed(templates)
+
+    tq = TradeQueue()
+    tq.db_conn = fakeredis.FakeRedis(decode_responses=True)
+    tq._http_client.close()
+    tq._http_client = httpx.Client(transport=httpx.MockTransport(feed.respond))
+    run_trades.trade_queue = tq
+    for symbol in {x["symbol"] for x in templates}:
+        symbol_cache.put(SymbolMetadata(symbol=symbol.upper(), fallback_logo_url=settings.symbol_fallback_logo))
+
+    sample_every = max(SOAK_CYCLES // SAMPLES, 1)
+    samples: list[tuple[int, dict[str, float]]] = []
+    latencies: list[float] = []
+    rss: list[int] = []
+    first_counts = Counter()
+
+    sinks.set_sink(None)
+    logging.disable(logging.INFO)
+    try:
+        with (
+            mock.patch.object(settings, "webhook_url_trades", receiver.url),
+            mock.patch.object(settings, "webhook_url_trades_list", ""),
+            mock.patch.object(settings, "notification_sink", "discord"),
+            # Bound the trade indexes by count, since every synthetic trade is fresh.
+            mock.patch.object(settings, "trade_index_max_trades", feed.window_size + feed.max_open_trades),
+        ):
+            for cycle in range(1, SOAK_CYCLES + 1):
+                feed.advance()
+                started = time.perf_counter()
+                run_trades.run_queue()
+                latencies.append(time.perf_counter() - started)
+                rss.append(read_rss(os.getpid()))
+
+                # The dedupe keys live in Redis, not in the bot, so the ones for trades that
+                # left the feed for good are dropped to keep fakeredis out of the numbers.
+                if feed.retired:
+                    counted = [run_trades.get_aggregates(tq).counted_key(x) for x in feed.retired]
+                    tq.db_conn.delete(*[store_key(tq, x) for x in feed.retired], *counted)
+                    feed.retired.clear()
+
+                if cycle % sample_every == 0:
+                    samples.append((cycle, sample(tq, latencies[-sample_every:], rss)))
+                    rss.clear()
+                    if len(samples) == int(SAMPLES * WARMUP_FRACTION) + 1:
+                        first_counts = object_counts()
+    finally:
+        logging.disable(logging.NOTSET)
+        tq._http_client.close()
+
+    # Every trade in the feed was notified exactly as often as it opened and closed.
+    assert receiver.notifications == feed.expected
+
+    measured = samples[int(len(samples) * WARMUP_FRACTION) :]
+    cycles = measured[-1][0] - measured[0][0]
+    failures = []
+    for limit in LIMITS:
+        fitted = slope([(cycle, values[limit.metric]) for cycle, values in measured])
+        noise_floor = limit.noise_floor
+        if limit.metric == "latency":
+            noise_floor = max(noise_floor, statistics.median(latencies) / 2)
+        if fitted * 1000 > limit.per_1000_cycles and fitted * cycles > noise_floor:
+            failures.append(f"{limit.metric} grows {fitted * 1000:.4g} per 1000 cycles")
+
+    if failures and first_counts:
+        growth = object_counts() - first_counts
+        failures.append(f"fastest growing types: {growth.most_common(5)}")
+    assert not failures, "; ".join(failures)
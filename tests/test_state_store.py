@@ -0,0 +1,293 @@
+"""Test the trade status stores."""
+
+import importlib.util
+import sqlite3
+from unittest import mock
+
+import fakeredis
+import pytest
+from redis.cluster import ClusterPipeline
+
+from thetagang_notifications import trade_queue
+from thetagang_notifications.circuit import OPEN
+from thetagang_notifications.config import Settings, settings
+from thetagang_notifications.exceptions import StateBackendError, StateStoreError
+from thetagang_notifications.state_store import (
+    LAYOUT_KEY,
+    PREVIOUS_LAYOUT_KEY,
+    LMDBStateStore,
+    RedisStateStore,
+    SQLiteStateStore,
+    create_state_store,
+)
+from thetagang_notifications.trade_queue import TradeQueue
+
+from .test_trade_queue import make_trade
+
+BACKENDS = [
+    "redis",
+    "sqlite",
+    pytest.param(
+        "lmdb",
+        marks=pytest.mark.skipif(importlib.util.find_spec("lmdb") is None, reason="lmdb is not installed"),
+    ),
+]
+
+
+def open_store(backend: str, tmp_path):
+    """Open a store of the given kind under a temporary directory."""
+    if backend == "sqlite":
+        return SQLiteStateStore(tmp_path / "state.db")
+    if backend == "lmdb":
+        return LMDBStateStore(tmp_path / "state.lmdb", 1 << 24)
+    return RedisStateStore(fakeredis.FakeRedis(decode_responses=True))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_round_trip(backend, tmp_path) -> None:
+    """Verify that every store reads back what it wrote, and None for unknown trades."""
+    store = open_store(backend, tmp_path)
+    store.set_many([("1", "open"), ("2", "closed")])
+    store.set_many([("1", "closed")])
+
+    assert store.get_many(["1", "2", "3", "1"]) == {"1": "closed", "2": "closed", "3": None}
+    assert store.get_many([]) == {}
+    store.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_large_batches(backend, tmp_path) -> None:
+    """Verify that batches bigger than one statement still cover every trade."""
+    store = open_store(backend, tmp_path)
+    guids = [f"guid-{x}" for x in range(1200)]
+    store.set_many([(x, "open") for x in guids[::2]])
+
+    statuses = store.get_many(guids)
+
+    assert len(statuses) == len(guids)
+    assert sum(1 for x in statuses.values() if x == "open") == 600
+    store.close()
+
+
+def cluster_client(server: fakeredis.FakeServer) -> mock.MagicMock:
+    """Return a stand-in cluster client whose pipelines are real `ClusterPipeline` objects.
+
+    Commands a cluster refuses in a pipeline raise as they would against a real
+    cluster, and the queued commands run on fakeredis when the pipeline executes.
+    """
+    fake = fakeredis.FakeRedis(server=server, decode_responses=True)
+    client = mock.MagicMock(wraps=fake)
+    # A real cluster rejects MGET across slots, so only single-key reads may go straight to the client.
+    client.mget.side_effect = AssertionError("MGET across slots")
+
+    def pipeline(transaction: bool = False) -> ClusterPipeline:
+        pipe = ClusterPipeline(nodes_manager=mock.MagicMock(), commands_parser=mock.MagicMock())
+
+        def execute() -> list:
+            queued = pipe._execution_strategy.command_queue
+            return [fake.execute_command(*command.args) for command in queued]
+
+        pipe.execute = execute
+        return pipe
+
+    client.pipeline.side_effect = pipeline
+    return client
+
+
+def test_cluster_pipeline_reads() -> None:
+    """Verify that cluster reads and writes only queue commands a cluster pipeline allows."""
+    client = cluster_client(fakeredis.FakeServer())
+    client.set(LAYOUT_KEY, "cluster:4")
+    store = RedisStateStore(client, cluster_mode=True, key_buckets=4)
+    store.set_many([("1", "open"), ("2", "closed")])
+
+    assert store.get_many(["1", "2", "3"]) == {"1": "open", "2": "closed", "3": None}
+
+
+def test_layout_change_reads_old_keys() -> None:
+    """Verify that switching to cluster keys keeps the statuses stored under bare GUIDs."""
+    server = fakeredis.FakeServer()
+    single = RedisStateStore(fakeredis.FakeRedis(server=server, decode_responses=True))
+    single.set_many([("1", "open"), ("2", "closed")])
+    assert single.get_many(["3"]) == {"3": None}
+
+    client = cluster_client(server)
+    store = RedisStateStore(client, cluster_mode=True, key_buckets=4)
+    assert store.get_many(["1", "2", "3"]) == {"1": "open", "2": "closed", "3": None}
+
+    # The statuses were copied to the new keys, so they survive the old keys going away.
+    client.delete("1", "2")
+    assert store.get_many(["1", "2"]) == {"1": "open", "2": "closed"}
+    assert client.get(LAYOUT_KEY) == "cluster:4"
+    assert client.get(PREVIOUS_LAYOUT_KEY) == "single"
+
+    # Changing the bucket count falls back to the earlier cluster layout in turn.
+    rebucketed = RedisStateStore(client, cluster_mode=True, key_buckets=8)
+    assert rebucketed.get_many(["1"]) == {"1": "open"}
+    assert client.get(PREVIOUS_LAYOUT_KEY) == "cluster:4"
+
+
+def test_layout_fallback_expires() -> None:
+    """Verify that old keys are no longer read once the fallback window ends."""
+    server = fakeredis.FakeServer()
+    RedisStateStore(fakeredis.FakeRedis(server=server, decode_responses=True)).set_many([("1", "open")])
+
+    store = RedisStateStore(fakeredis.FakeRedis(server=server, decode_responses=True), True, 4)
+    store.db_conn.delete(PREVIOUS_LAYOUT_KEY)
+    store.db_conn.set(LAYOUT_KEY, "cluster:4")
+
+    assert store.get_many(["1"]) == {"1": None}
+
+
+def test_sqlite_survives_reopen(tmp_path) -> None:
+    """Verify that SQLite runs in WAL mode and keeps statuses across restarts."""
+    store = SQLiteStateStore(tmp_path / "state.db")
+    store.set_many([("1", "open")])
+    assert store.conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    store.close()
+
+    reopened = SQLiteStateStore(tmp_path / "state.db")
+    assert reopened.get_many(["1"]) == {"1": "open"}
+    reopened.close()
+
+
+def test_sqlite_failed_batch_rolls_back(tmp_path) -> None:
+    """Verify that a batch is written completely or not at all."""
+    store = SQLiteStateStore(tmp_path / "state.db")
+    with pytest.raises(sqlite3.IntegrityError):
+        store.set_many([("1", "open"), ("2", None)])
+
+    assert store.get_many(["1", "2"]) == {"1": None, "2": None}
+    store.close()
+
+
+def test_sqlite_errors_are_store_errors(tmp_path) -> None:
+    """Verify that a locked or broken database is reported as a store failure."""
+    store = SQLiteStateStore(tmp_path / "state.db")
+    conn = store.conn
+    store._prepared = True
+    store.conn = mock.Mock(in_transaction=False)
+    store.conn.execute.side_effect = sqlite3.OperationalError("database is locked")
+
+    with pytest.raises(StateStoreError, match="database is locked"):
+        store.get_many(["1"])
+    with pytest.raises(StateStoreError, match="database is locked"):
+        store.set_many([("1", "open")])
+    conn.close()
+
+
+def test_corrupt_sqlite_file_is_a_store_error(tmp_path) -> None:
+    """Verify that a file that is not a SQLite database is reported as a store failure."""
+    path = tmp_path / "state.db"
+    path.write_bytes(b"not a database at all, just some garbage bytes" * 100)
+    store = SQLiteStateStore(path)
+
+    with pytest.raises(StateStoreError, match="not a database"):
+        store.get_many(["1"])
+    with pytest.raises(StateStoreError, match="not a database"):
+        store.set_many([("1", "open")])
+    store.close()
+
+
+@pytest.mark.skipif(importlib.util.find_spec("lmdb") is None, reason="lmdb is not installed")
+def test_lmdb_full_map_is_a_store_error(tmp_path) -> None:
+    """Verify that running out of LMDB map space is reported as a store failure."""
+    store = LMDBStateStore(tmp_path / "state.lmdb", 1 << 16)
+    with pytest.raises(StateStoreError, match="lmdb"):
+        store.set_many([(f"guid-{x}", "open") for x in range(10000)])
+    store.close()
+
+
+def test_create_state_store(tmp_path) -> None:
+    """Verify that the backend comes from the settings."""
+    db_conn = fakeredis.FakeRedis(decode_responses=True)
+    assert isinstance(create_state_store(db_conn), RedisStateStore)
+
+    config = settings.model_copy(update={"state_backend": "sqlite", "state_path": str(tmp_path / "state.db")})
+    store = create_state_store(db_conn, config)
+    assert isinstance(store, SQLiteStateStore)
+    store.close()
+
+
+def test_lmdb_missing(tmp_path) -> None:
+    """Verify that a missing lmdb package is reported clearly."""
+    config = settings.model_copy(update={"state_backend": "lmdb", "state_path": str(tmp_path / "state.lmdb")})
+    with (
+        mock.patch("importlib.util.find_spec", return_value=None),
+        pytest.raises(StateBackendError, match="lmdb package is not installed"),
+    ):
+        create_state_store(fakeredis.FakeRedis(), config)
+
+
+def test_embedded_backend_disables_redis_features() -> None:
+    """Verify that the Redis-backed features are off without Redis unless enabled explicitly."""
+    config = Settings(state_backend="sqlite", trade_index_enabled=True)
+    assert not config.aggregates_enabled
+    assert not config.open_interest_enabled
+    assert config.trade_index_enabled
+
+    config = Settings(state_backend="redis")
+    assert config.aggregates_enabled
+    assert config.open_interest_enabled
+
+
+def test_trade_queue_without_redis(tmp_path) -> None:
+    """Verify that the queue dedupes through SQLite without touching Redis."""
+    server = fakeredis.FakeServer()
+    server.connected = False
+    with (
+        mock.patch.object(settings, "state_backend", "sqlite"),
+        mock.patch.object(settings, "state_path", str(tmp_path / "state.db")),
+        mock.patch.object(settings, "journal_path", str(tmp_path / "statuses.journal")),
+    ):
+        tq = TradeQueue()
+    tq.db_conn = fakeredis.FakeRedis(server=server, decode_responses=True)
+    trade = make_trade("1")
+    tq.latest_trades = [trade]
+
+    assert tq.build_queue() == [trade]
+    assert tq.build_queue() == []
+
+    assert len(tq.journal) == 0
+    assert tq.state_store.get_many(["1"]) == {"1": "open"}
+    tq.close()
+
+
+def test_trade_queue_never_connects_redis(tmp_path) -> None:
+    """Verify that a queue on an embedded store opens no Redis connection."""
+    with (
+        mock.patch.object(settings, "state_backend", "sqlite"),
+        mock.patch.object(settings, "state_path", str(tmp_path / "state.db")),
+        mock.patch.object(trade_queue, "connect_redis") as connect_redis,
+    ):
+        tq = TradeQueue()
+        tq.latest_trades = [make_trade("1")]
+        tq.build_queue()
+        tq.close()
+
+    connect_redis.assert_not_called()
+
+
+def test_sqlite_failure_uses_the_journal(tmp_path) -> None:
+    """Verify that a failing SQLite store falls back to the journal and replays it later."""
+    with (
+        mock.patch.object(settings, "state_backend", "sqlite"),
+        mock.patch.object(settings, "state_path", str(tmp_path / "state.db")),
+    ):
+        tq = TradeQueue()
+        tq.latest_trades = [make_trade("1")]
+        locked = StateStoreError("sqlite", "database is locked")
+        with mock.patch.object(tq.state_store, "get_many", side_effect=locked):
+            assert len(tq.build_queue()) == 1
+
+        assert tq.store_breaker.name == "sqlite"
+        assert tq.store_breaker.state == OPEN
+        assert tq.journal.get("1") == "open"
+        # The journal keeps dedupe working while the store is down.
+        assert tq.build_queue() == []
+
+        tq.store_breaker.opened_at -= settings.redis_max_retry_interval
+        assert tq.store_available()
+        assert len(tq.journal) == 0
+        assert tq.state_store.get_many(["1"]) == {"1": "open"}
+        tq.close()
@@ -0,0 +1,198 @@
+"""Test the supervisor that recycles the daemon."""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import thetagang_notifications
+from thetagang_notifications import supervisor
+
+# A stand-in daemon that reports a cycle every 50ms and counts cycles across handovers.
+CHILD = """
+import os
+import time
+
+from thetagang_notifications.supervisor import SupervisorLink
+
+link = SupervisorLink()
+link.install()
+cycles = link.handover.get("cycles", 0)
+while not link.draining:
+    link.cycle_started()
+    cycles += 1
+    link.cycle_finished(float(os.environ.get("FAKE_CYCLE_SECONDS", "0.01")), 0, {"cycles": cycles})
+    time.sleep(0.05)
+"""
+
+
+@pytest.fixture(autouse=True)
+def child_path(monkeypatch):
+    """Let the children import the package."""
+    src = str(Path(thetagang_notifications.__file__).parent.parent)
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")])))
+
+
+def make_supervisor(**kwargs) -> supervisor.Supervisor:
+    """Return a supervisor for the stand-in daemon."""
+    options = {"max_rss": 0, "max_cycle_seconds": 0, "drain_timeout": 5, "check_interval": 0.2, **kwargs}
+    return supervisor.Supervisor([sys.executable, "-c", CHILD], **options)
+
+
+def step_until(sup: supervisor.Supervisor, recycles: int) -> None:
+    """Step the supervisor until it has recycled a number of children."""
+    for _ in range(100):
+        if sup.recycles >= recycles:
+            return
+        sup.step()
+    pytest.fail(f"only {sup.recycles} recycles")
+
+
+def test_read_rss() -> None:
+    """Verify that RSS comes from /proc and unknown processes report zero."""
+    if not Path("/proc/self/status").exists():
+        pytest.skip("no /proc on this platform")
+    assert supervisor.read_rss(os.getpid()) > 1024 * 1024
+    assert supervisor.read_rss(2**22 + 1) == 0
+
+
+def test_link_without_supervisor() -> None:
+    """Verify that the link does nothing outside a supervisor."""
+    link = supervisor.SupervisorLink({})
+    assert not link.supervised
+    assert link.handover == {}
+    assert link.sleep_interval(30) == 30
+    link.cycle_finished(1.0, 2, {})
+
+
+def test_link_reports_cycles() -> None:
+    """Verify that the link writes reports and reads the handover state."""
+    read_fd, write_fd = os.pipe()
+    link = supervisor.SupervisorLink(
+        {supervisor.REPORT_FD_ENV: str(write_fd), supervisor.HANDOVER_ENV: json.dumps({"scheduler": {"idle_cycles": 3}})}
+    )
+    assert link.supervised
+    assert link.handover == {"scheduler": {"idle_cycles": 3}}
+    assert link.sleep_interval(30) == supervisor.DRAIN_CHECK_INTERVAL
+
+    link.cycle_started()
+    link.cycle_finished(0.5, 2, {"a": 1})
+    link.stream.close()
+    with os.fdopen(read_fd) as reports:
+        lines = [json.loads(x) for x in reports]
+    assert lines == [
+        {"event": "cycle_started"},
+        {"event": "cycle_finished", "seconds": 0.5, "trades": 2, "state": {"a": 1}},
+    ]
+
+
+def test_slow_cycles_recycle_the_child_with_handover(monkeypatch) -> None:
+    """Verify that a slow child is drained and its state handed to the next one."""
+    monkeypatch.setenv("FAKE_CYCLE_SECONDS", "5")
+    sup = make_supervisor(max_cycle_seconds=1)
+    try:
+        step_until(sup, 1)
+        assert sup.child is None
+        handed_over = sup.handover["cycles"]
+
+        step_until(sup, 2)
+        assert sup.handover["cycles"] > handed_over
+    finally:
+        sup.drain()
+
+
+def test_rss_limit_recycles_the_child() -> None:
+    """Verify that a child over the RSS limit is drained."""
+    if not Path("/proc/self/status").exists():
+        pytest.skip("no /proc on this platform")
+    sup = make_supervisor(max_rss=1)
+    try:
+        step_until(sup, 1)
+        assert sup.child is None
+    finally:
+        sup.drain()
+
+
+def test_healthy_child_keeps_running() -> None:
+    """Verify that a healthy child is left alone."""
+    sup = make_supervisor()
+    try:
+        for _ in range(10):
+            sup.step()
+        assert sup.recycles == 0
+        assert sup.child.poll() is None
+    finally:
+        sup.drain()
+    assert sup.child is None
+
+
+def test_crashed_child_is_restarted(monkeypatch) -> None:
+    """Verify that a child that dies is replaced."""
+    monkeypatch.setattr(supervisor.time, "sleep", lambda _: None)
+    sup = supervisor.Supervisor([sys.executable, "-c", "raise SystemExit(3)"], check_interval=0.2)
+    sup.start_child()
+    sup.child.wait()
+    sup.step()
+    assert sup.crashes == 1
+    assert sup.child is None
+
+
+def test_crash_backoff_resets_after_a_stable_run(monkeypatch) -> None:
+    """Verify that a crash after a long healthy run restarts without the crash loop backoff."""
+    sleeps = []
+    monkeypatch.setattr(supervisor.time, "sleep", sleeps.append)
+    sup = supervisor.Supervisor([sys.executable, "-c", "raise SystemExit(3)"], check_interval=0.2)
+    sup.crashes = 6
+    sup.start_child()
+    sup.child.wait()
+    sup.step()
+    assert sup.crashes == 7
+    assert sleeps == [supervisor.MAX_RESTART_BACKOFF]
+
+    sup.start_child()
+    sup.child.wait()
+    sup.started_at -= supervisor.STABLE_RUN_SECONDS
+    sup.step()
+    assert sup.crashes == 1
+    assert sleeps[-1] == 1.0
+
+
+def test_reports_from_an_earlier_child_are_ignored() -> None:
+    """Verify that a late report from a replaced child neither recycles nor hands over."""
+    sup = make_supervisor(max_cycle_seconds=1)
+    sup.generation = 2
+    sup.handover = {"cycles": 5}
+    sup.reports.put((1, {"event": "cycle_finished", "seconds": 10.0, "trades": 0, "state": {"cycles": 1}}))
+    sup.reports.put((2, {"event": "cycle_finished", "seconds": 0.1, "trades": 0, "state": {"cycles": 6}}))
+
+    report = sup.next_report()
+    assert report["state"] == {"cycles": 6}
+    assert sup.handle_report(report) is None
+    assert sup.handover == {"cycles": 6}
+    assert sup.next_report() is None
+
+
+def test_reload_requests_reach_the_child(tmp_path) -> None:
+    """Verify that SIGHUP sent to the supervisor is passed on to the child."""
+    ready = tmp_path / "ready"
+    child = (
+        "import signal, sys, time\n"
+        "signal.signal(signal.SIGHUP, lambda *_: sys.exit(7))\n"
+        f"open({str(ready)!r}, 'w').close()\n"
+        "time.sleep(30)\n"
+    )
+    sup = supervisor.Supervisor([sys.executable, "-c", child])
+    sup.start_child()
+    try:
+        for _ in range(500):
+            if ready.exists():
+                break
+            time.sleep(0.01)
+        sup.forward_reload()
+        assert sup.child.wait(timeout=5) == 7
+    finally:
+        sup.child.kill()
+        sup.child.wait()
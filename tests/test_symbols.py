@@ -0,0 +1,126 @@
+"""Test the symbol metadata cache."""
+
+import time
+from unittest import mock
+
+import fakeredis
+import httpx
+import pytest
+
+from thetagang_notifications import symbols
+from thetagang_notifications.config import settings
+from thetagang_notifications.models import SymbolMetadata
+
+
+def fake_api(request: httpx.Request) -> httpx.Response:
+    """Answer logo and company name lookups."""
+    fake_api.requests.append(request)
+    if request.method == "HEAD":
+        return httpx.Response(200 if "amd" in request.url.path else 404)
+    names = {"AMD": "Advanced Micro Devices, Inc."}
+    symbol = request.url.params["q"]
+    quotes = [{"symbol": symbol, "longname": names[symbol]}] if symbol in names else []
+    return httpx.Response(200, json={"quotes": quotes})
+
+
+@pytest.fixture
+def http_client():
+    """Route symbol lookups to the fake API."""
+    fake_api.requests = []
+    client = httpx.Client(transport=httpx.MockTransport(fake_api))
+    with mock.patch.object(symbols, "get_http_client", return_value=client):
+        yield client
+
+
+@pytest.fixture
+def cache():
+    """Return a cache backed by fakeredis."""
+    return symbols.SymbolCache(fakeredis.FakeRedis(decode_responses=True))
+
+
+def test_prefetch_resolves_and_stores(cache, http_client) -> None:
+    """Verify that unknown symbols are looked up once and stored in Redis."""
+    cache.prefetch(["amd", "DOOTY", "AMD"])
+
+    amd, dooty = cache.get("AMD"), cache.get("dooty")
+    assert amd.logo_url == symbols.STOCK_LOGO % "amd"
+    assert amd.company_name == "Advanced Micro Devices, Inc."
+    assert dooty.logo_url is None
+    assert dooty.thumbnail_url == settings.symbol_fallback_logo
+    assert len(fake_api.requests) == 4
+
+    assert 0 < cache.db_conn.ttl(symbols.SYMBOL_KEY % "AMD") <= settings.symbol_cache_ttl
+
+    # Cached symbols are not looked up again.
+    cache.prefetch(["AMD", "DOOTY"])
+    assert len(fake_api.requests) == 4
+
+
+def test_incomplete_lookups_are_retried(cache, http_client) -> None:
+    """Verify that a symbol without a logo or name is only cached briefly."""
+    cache.prefetch(["DOOTY"])
+    assert 0 < cache.db_conn.ttl(symbols.SYMBOL_KEY % "DOOTY") <= settings.symbol_retry_ttl
+    fake_api.requests.clear()
+
+    # Once the retry window passes, the symbol is gone from Redis and from memory.
+    cache.db_conn.delete(symbols.SYMBOL_KEY % "DOOTY")
+    later = time.monotonic() + settings.symbol_retry_ttl
+    with mock.patch.object(symbols.time, "monotonic", return_value=later):
+        assert cache.get("DOOTY") is None
+        cache.prefetch(["DOOTY"])
+
+    assert len(fake_api.requests) == 2
+    assert cache.get("DOOTY") is not None
+
+
+def test_prefetch_reads_redis_first(cache, http_client) -> None:
+    """Verify that a fresh process loads metadata from Redis instead of the web."""
+    cache.prefetch(["AMD"])
+    fresh = symbols.SymbolCache(cache.db_conn)
+    fake_api.requests.clear()
+
+    fresh.prefetch(["AMD"])
+    assert fresh.get("AMD") == cache.get("AMD")
+    assert fake_api.requests == []
+
+
+def test_corrupt_redis_entries_are_misses(cache, http_client) -> None:
+    """Verify that unreadable metadata in Redis is dropped and looked up again."""
+    cache.db_conn.set(symbols.SYMBOL_KEY % "AMD", "not json")
+    cache.db_conn.set(symbols.SYMBOL_KEY % "DOOTY", '{"symbol": "DOOTY", "logo_url": 7}')
+
+    with mock.patch.object(cache.db_conn, "delete", wraps=cache.db_conn.delete) as delete:
+        cache.prefetch(["AMD", "DOOTY"])
+
+    delete.assert_called_once_with(symbols.SYMBOL_KEY % "AMD", symbols.SYMBOL_KEY % "DOOTY")
+    assert cache.get("AMD").company_name == "Advanced Micro Devices, Inc."
+    assert cache.get("DOOTY") is not None
+    assert symbols.SymbolCache(cache.db_conn)._load_from_redis(["AMD", "DOOTY"]) == []
+
+
+def test_lookup_failures_use_fallback(cache) -> None:
+    """Verify that network failures still produce usable metadata."""
+    client = httpx.Client(transport=httpx.MockTransport(mock.Mock(side_effect=httpx.ConnectError("boom"))))
+    with mock.patch.object(symbols, "get_http_client", return_value=client):
+        cache.prefetch(["AMD"])
+
+    assert cache.get("AMD").thumbnail_url == settings.symbol_fallback_logo
+
+
+def test_thumbnail_url_never_blocks(cache) -> None:
+    """Verify that rendering falls back to the logo guess for unknown symbols."""
+    assert cache.thumbnail_url("TSLA") == symbols.STOCK_LOGO % "tsla"
+
+
+def test_lru_eviction() -> None:
+    """Verify that the in-memory cache keeps the most recently used symbols."""
+    cache = symbols.SymbolCache()
+    with mock.patch.object(settings, "symbol_cache_size", 2):
+        for symbol in ("A", "B", "C"):
+            if symbol == "C":
+                cache.get("A")
+            cache.put(SymbolMetadata(symbol=symbol, fallback_logo_url="fallback"))
+
+    assert cache.get("A") is not None
+    assert cache.get("B") is None
+    assert cache.get("C") is not None
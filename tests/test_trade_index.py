@@ -0,0 +1,123 @@
+"""Test the secondary trade indexes."""
+
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import fakeredis
+import pytest
+
+from thetagang_notifications.config import settings
+from thetagang_notifications.trade_index import IndexedTrade, TradeIndex
+
+START = datetime(2024, 3, 14, 15, 0, tzinfo=timezone.utc)
+
+
+def make_trade(guid: str, minutes: int, user: str = "major", symbol: str = "TSLA", trade_type: str = "SHORT IRON CONDOR") -> dict:
+    """Build a minimal trade from the patrons feed, updated some minutes after the start."""
+    return {
+        "guid": guid,
+        "symbol": symbol,
+        "type": trade_type,
+        "close_date": None,
+        "updatedAt": (START + timedelta(minutes=minutes)).isoformat(),
+        "User": {"username": user, "role": "patron"},
+    }
+
+
+@pytest.fixture
+def index():
+    """Return a trade index backed by fakeredis."""
+    return TradeIndex(fakeredis.FakeRedis(decode_responses=True), prefix="idx")
+
+
+def test_lookups_are_newest_first(index) -> None:
+    """Verify each supported lookup returns matching trades, newest first."""
+    index.update([
+        make_trade("a", 1),
+        make_trade("b", 2, symbol="spy"),
+        make_trade("c", 3, user="jrue"),
+        make_trade("d", 4, trade_type="CASH SECURED PUT"),
+    ])
+
+    assert [x.guid for x in index.lookup(user="major")] == ["d", "b", "a"]
+    assert [x.guid for x in index.lookup(symbol="tsla")] == ["d", "c", "a"]
+    assert [x.guid for x in index.lookup(user="major", symbol="TSLA")] == ["d", "a"]
+    assert [x.guid for x in index.lookup(trade_type="SHORT IRON CONDOR")] == ["c", "b", "a"]
+    assert [x.guid for x in index.lookup(day="2024-03-14")] == ["d", "c", "b", "a"]
+    assert index.lookup(user="nobody") == []
+    assert index.lookup(symbol="SPY")[0] == IndexedTrade("b", "major", "SPY", "SHORT IRON CONDOR", "open", START.timestamp() + 120)
+
+
+def test_paging(index) -> None:
+    """Verify that pages cover every trade exactly once."""
+    index.update([make_trade(str(x), x) for x in range(25)])
+
+    pages = [index.lookup(user="major", limit=10, offset=x) for x in (0, 10, 20)]
+    assert [len(x) for x in pages] == [10, 10, 5]
+    assert [x.guid for page in pages for x in page] == [str(x) for x in reversed(range(25))]
+    assert index.count(user="major") == 25
+
+
+def test_closing_moves_trade(index) -> None:
+    """Verify that a trade closing a day later moves to its new day and score."""
+    trade = make_trade("a", 0)
+    index.update([trade, make_trade("b", 5)])
+
+    closed = {**trade, "close_date": "2024-03-15T16:00:00Z", "updatedAt": "2024-03-15T16:00:00+00:00"}
+    index.update([closed])
+
+    assert [x.guid for x in index.lookup(day="2024-03-14")] == ["b"]
+    assert [x.guid for x in index.lookup(day="2024-03-15")] == ["a"]
+    assert [(x.guid, x.status) for x in index.lookup(user="major")] == [("a", "closed"), ("b", "open")]
+    assert index.count(symbol="TSLA") == 2
+
+
+def test_rolled_from_is_indexed(index) -> None:
+    """Verify that both sides of a roll are indexed."""
+    closed = {**make_trade("a", 0), "close_date": "2024-03-14T15:30:00Z"}
+    index.update([{**make_trade("b", 31), "rolled_from": closed}])
+
+    assert [(x.guid, x.status) for x in index.lookup(user="major")] == [("b", "open"), ("a", "closed")]
+
+
+def test_remove(index) -> None:
+    """Verify that removed trades leave no index entries behind."""
+    index.update([make_trade("a", 0), make_trade("b", 1)])
+
+    assert index.remove(["a", "missing"]) == 1
+    assert [x.guid for x in index.lookup(user="major")] == ["b"]
+    index.remove(["b"])
+    assert index.db_conn.keys() == []
+
+
+def test_prune_drops_old_trades(index) -> None:
+    """Verify that trades not updated within the maximum age leave every index."""
+    index.update([make_trade("a", 0), make_trade("b", 60), make_trade("c", 120)])
+    now = (START + timedelta(minutes=90)).timestamp()
+
+    with mock.patch.object(settings, "trade_index_max_age", 20 * 60):
+        assert index.prune(now=now) == 2
+        assert index.prune(now=now) == 0
+
+    assert [x.guid for x in index.lookup(user="major")] == ["c"]
+    assert index.db_conn.zrange(index.all_key, 0, -1) == ["c"]
+
+
+def test_prune_keeps_the_newest_trades(index) -> None:
+    """Verify that the indexes never hold more than the maximum number of trades."""
+    index.update([make_trade(str(x), x) for x in range(10)])
+
+    with mock.patch.object(settings, "trade_index_max_trades", 4):
+        assert index.prune(now=START.timestamp(), limit=3) == 3
+        assert index.prune(now=START.timestamp()) == 3
+
+    assert [x.guid for x in index.lookup(user="major")] == ["9", "8", "7", "6"]
+    assert index.count(day=START.date().isoformat()) == 4
+
+
+def test_unsupported_lookup(index) -> None:
+    """Verify that filter combinations without an index are refused."""
+    with pytest.raises(ValueError):
+        index.lookup(symbol="TSLA", trade_type="SHORT IRON CONDOR")
+    with pytest.raises(ValueError):
+        index.lookup()
@@ -1,10 +1,18 @@
 """Test the trade queue builder."""
 
+import time
 from datetime import datetime, timedelta, timezone
+from unittest import mock
 
 import fakeredis
+import httpx
+import pytest
+from redis.cluster import key_slot
 
-from thetagang_notifications.trade_queue import TradeQueue
+from thetagang_notifications import circuit, transport
+from thetagang_notifications.config import settings
+from thetagang_notifications.state_store import LAYOUT_KEY, key_bucket, status_key
+from thetagang_notifications.trade_queue import FEED_WORKERS, TradeQueue, collapse_related_trades
 
 
 def test_store_trade() -> None:
@@ -118,6 +126,159 @@ def test_build_queue() -> None:
     assert tq.build_queue() == []
 
 
+def make_trade(guid: str, close_date: str | None = None, symbol: str = "TSLA") -> dict:
+    """Build a minimal trade from the patrons feed."""
+    return {
+        "guid": guid,
+        "close_date": close_date,
+        "updatedAt": (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat(),
+        "mistake": False,
+        "symbol": symbol,
+        "type": "CASH SECURED PUT",
+        "User": {"username": "real_user", "role": "patron"},
+    }
+
+
+def minutes_ago(minutes: float) -> str:
+    """Return an ISO timestamp from some minutes ago."""
+    return (datetime.now(timezone.utc) - timedelta(minutes=minutes)).isoformat()
+
+
+def test_collapse_related_trades_roll() -> None:
+    """Verify that a close and a matching open become one rolled trade."""
+    closed = make_trade("1", close_date=minutes_ago(2))
+    opened = make_trade("2")
+    unrelated = make_trade("3", symbol="AMD")
+
+    collapsed = collapse_related_trades([closed, unrelated, opened], new_guids={"2", "3"})
+
+    assert [x["guid"] for x in collapsed] == ["3", "2"]
+    assert collapsed[1]["rolled_from"] is closed
+    assert "rolled_from" not in collapsed[0]
+
+
+@pytest.mark.parametrize(
+    ("close_date", "trade_type"),
+    [
+        # Closed after the new trade opened.
+        (minutes_ago(0), "CASH SECURED PUT"),
+        # Closed long before the new trade opened.
+        (minutes_ago(60), "CASH SECURED PUT"),
+        ("test_date", "CASH SECURED PUT"),
+        # Stock trades always show as open.
+        (minutes_ago(2), "BUY COMMON STOCK"),
+    ],
+)
+def test_collapse_related_trades_not_a_roll(close_date: str, trade_type: str) -> None:
+    """Verify that only a close shortly before a matching open counts as a roll."""
+    closed = {**make_trade("1", close_date=close_date), "type": trade_type}
+    opened = {**make_trade("2"), "type": trade_type}
+
+    assert collapse_related_trades([closed, opened], new_guids={"2"}) == [closed, opened]
+
+
+def test_collapse_related_trades_opened_and_closed() -> None:
+    """Verify that a new trade which is already closed gets flagged."""
+    trade = make_trade("1", close_date="test_date")
+
+    assert collapse_related_trades([trade], new_guids={"1"}) == [{**trade, "opened_and_closed": True}]
+    assert collapse_related_trades([trade], new_guids=set()) == [trade]
+
+
+def test_build_queue_collapses_rolls() -> None:
+    """Verify that build_queue sends one trade for a roll."""
+    tq = TradeQueue()
+    tq.db_conn = fakeredis.FakeRedis(decode_responses=True)
+
+    tq.latest_trades = [make_trade("1")]
+    assert tq.build_queue() == tq.latest_trades
+
+    closed = make_trade("1", close_date=minutes_ago(2))
+    tq.latest_trades = [closed, make_trade("2")]
+    queue = tq.build_queue()
+
+    assert len(queue) == 1
+    assert queue[0]["guid"] == "2"
+    assert queue[0]["rolled_from"] == closed
+    assert tq.db_conn.get("1") == "closed"
+    assert tq.db_conn.get("2") == "open"
+
+
+@pytest.fixture
+def cluster_queue():
+    """Return a TradeQueue in cluster mode backed by fakeredis."""
+    with (
+        mock.patch.object(settings, "redis_mode", "cluster"),
+        mock.patch.object(settings, "redis_hash_tag_buckets", 4),
+        mock.patch("thetagang_notifications.trade_queue.RedisCluster") as mock_cluster,
+    ):
+        tq = TradeQueue()
+
+    mock_cluster.assert_called_once_with(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        decode_responses=True,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_timeout,
+    )
+    tq.db_conn = fakeredis.FakeRedis(decode_responses=True)
+    return tq
+
+
+def store_key(tq: TradeQueue, guid: str) -> str:
+    """Return the Redis key that the queue's state store keeps the status of a trade under."""
+    return status_key(guid, tq.state_store.cluster_mode, tq.state_store.key_buckets)
+
+
+def test_trade_key_single_node() -> None:
+    """Verify that single node mode keeps using bare GUIDs as keys."""
+    tq = TradeQueue()
+    assert store_key(tq, "abc") == "abc"
+
+
+def test_trade_key_cluster(cluster_queue) -> None:
+    """Verify that cluster keys share a slot for each hash tag bucket."""
+    guids = [f"guid-{x}" for x in range(50)]
+    slots = {key_slot(store_key(cluster_queue, x).encode()) for x in guids}
+    buckets = {key_bucket(x, cluster_queue.state_store.key_buckets) for x in guids}
+
+    assert len(slots) == len(buckets) <= 4
+    assert all(store_key(cluster_queue, x).endswith(f":{x}") for x in guids)
+
+
+def test_fetch_statuses_one_pipeline(cluster_queue) -> None:
+    """Verify that statuses are read with one pipeline once the cluster layout is recorded."""
+    guids = [f"guid-{x}" for x in range(20)]
+    cluster_queue.db_conn.set(LAYOUT_KEY, "cluster:4")
+    cluster_queue.store_trades([{"guid": x, "close_date": None} for x in guids[:10]])
+
+    with mock.patch.object(cluster_queue.db_conn, "pipeline", wraps=cluster_queue.db_conn.pipeline) as mock_pipeline:
+        statuses = cluster_queue.fetch_statuses(guids)
+
+    mock_pipeline.assert_called_once_with(transaction=False)
+    assert statuses == {x: "open" if x in guids[:10] else None for x in guids}
+
+
+def test_build_queue_cluster(cluster_queue) -> None:
+    """Verify that the queue works the same way in cluster mode."""
+    trade = make_trade("1")
+    cluster_queue.latest_trades = [trade]
+
+    assert cluster_queue.build_queue() == [trade]
+    assert cluster_queue.build_queue() == []
+    assert cluster_queue.db_conn.get(store_key(cluster_queue, "1")) == "open"
+    assert cluster_queue.db_conn.get("1") is None
+
+
+def test_build_queue_duplicate_guids() -> None:
+    """Verify that a trade repeated in one feed is only queued once."""
+    tq = TradeQueue()
+    tq.db_conn = fakeredis.FakeRedis(decode_responses=True)
+    tq.latest_trades = [make_trade("1"), make_trade("1")]
+
+    assert len(tq.build_queue()) == 1
+
+
 def test_trade_is_old() -> None:
     """Test detection of an old trade."""
     tq = TradeQueue()
@@ -128,6 +289,131 @@ def test_trade_is_old() -> None:
     assert not tq.trade_is_old(trade)
 
 
+def feed_response(trades: list[dict]) -> httpx.Response:
+    """Build a patrons feed response."""
+    return httpx.Response(200, json={"data": trades}, request=httpx.Request("GET", "https://example.com"))
+
+
+def test_update_trades_retries() -> None:
+    """Verify that a failed fetch is retried within the cycle."""
+    tq = TradeQueue()
+    responses = [httpx.ConnectError("boom"), feed_response([{"guid": "1"}, {"guid": "2"}])]
+
+    with (
+        mock.patch.object(tq, "_timed_get", side_effect=responses),
+        mock.patch("thetagang_notifications.trade_queue.time.sleep") as mock_sleep,
+    ):
+        assert tq.update_trades() == [{"guid": "2"}, {"guid": "1"}]
+
+    assert mock_sleep.call_args.args[0] <= settings.feed_backoff_base
+    assert tq.feed_breaker.state == circuit.CLOSED
+
+
+def test_retries_stop_at_the_deadline() -> None:
+    """Verify that a retry is skipped when its backoff would pass the fetch deadline."""
+    tq = TradeQueue()
+
+    with (
+        mock.patch.object(settings, "feed_deadline", 1.0),
+        mock.patch.object(settings, "feed_backoff_base", 4.0),
+        mock.patch.object(tq, "_timed_get", side_effect=httpx.ReadTimeout("slow")) as mock_get,
+        mock.patch("thetagang_notifications.trade_queue.random.uniform", side_effect=lambda low, high: high),
+        mock.patch("thetagang_notifications.trade_queue.time.sleep") as mock_sleep,
+        pytest.raises(httpx.ReadTimeout),
+    ):
+        tq.fetch_feed()
+
+    assert mock_get.call_count == 1
+    assert 0 < mock_get.call_args.args[1] <= 1.0
+    mock_sleep.assert_not_called()
+    tq.close()
+
+
+def test_request_timeout_shrinks_to_the_deadline() -> None:
+    """Verify that a request never waits longer than the time left."""
+    tq = TradeQueue()
+    with mock.patch.object(tq._http_client, "get", return_value=feed_response([])) as mock_get:
+        tq._timed_get("https://example.com", 2.0)
+
+    timeout = mock_get.call_args.kwargs["timeout"]
+    assert timeout.read == 2.0
+    assert timeout.connect == min(settings.http_connect_timeout, 2.0)
+
+
+@pytest.mark.parametrize("body", [[1, 2], "oops", {"data": {"guid": "1"}}, {"data": None}])
+def test_unexpected_response_is_a_failure(body: object) -> None:
+    """Verify that a 200 with the wrong shape counts against the breaker."""
+    tq = TradeQueue()
+    resp = httpx.Response(200, json=body, request=httpx.Request("GET", "https://example.com"))
+
+    with mock.patch.object(tq, "fetch_feed", return_value=resp):
+        assert tq.update_trades() == []
+
+    assert tq.feed_breaker.failures == 1
+
+
+def test_update_trades_breaker_opens() -> None:
+    """Verify that repeated failures open the breaker and skip the fetch."""
+    tq = TradeQueue()
+
+    with (
+        mock.patch.object(tq, "_timed_get", side_effect=httpx.ConnectError("boom")) as mock_get,
+        mock.patch("thetagang_notifications.trade_queue.time.sleep"),
+    ):
+        for _ in range(settings.feed_failure_threshold):
+            assert tq.update_trades() == []
+        assert tq.feed_breaker.state == circuit.OPEN
+
+        calls = mock_get.call_count
+        assert tq.update_trades() == []
+        assert tq.latest_trades == []
+        assert mock_get.call_count == calls
+
+    assert circuit.breaker_status()["patrons-api"]["state"] == circuit.OPEN
+
+
+def test_hedged_get() -> None:
+    """Verify that a slow request gets hedged and the faster response wins."""
+    tq = TradeQueue()
+    tq.feed_latencies.extend([0.01] * 20)
+    slow, fast = feed_response([{"guid": "slow"}]), feed_response([{"guid": "fast"}])
+
+    def fake_get(url: str, timeout: float | None = None) -> httpx.Response:
+        if fake_get.calls == 0:
+            fake_get.calls += 1
+            time.sleep(0.5)
+            return slow
+        return fast
+
+    fake_get.calls = 0
+    with mock.patch.object(tq, "_timed_get", side_effect=fake_get) as mock_get:
+        assert tq.hedged_get("https://example.com") is fast
+
+    assert mock_get.call_count == 2
+    tq.close()
+
+
+def test_feed_has_its_own_client() -> None:
+    """Verify that the feed does not share connections with the symbol lookups."""
+    tq = TradeQueue()
+    assert tq._http_client is not transport.get_http_client()
+    assert tq._http_client._transport._pool._max_connections == FEED_WORKERS
+
+    tq.close()
+    assert tq._http_client.is_closed
+    assert not transport.get_http_client().is_closed
+    transport.close_http_client()
+
+
+def test_hedge_delay() -> None:
+    """Verify that hedging waits for enough latency history."""
+    tq = TradeQueue()
+    assert tq.hedge_delay() is None
+
+    tq.feed_latencies.extend(x / 100 for x in range(1, 101))
+    assert tq.hedge_delay() == 0.96
+
+
 # def test_update_trades() -> None:
 #     """Test getting updated trades from thetagang.com."""
 #     mocked_trades = {
@@ -0,0 +1,102 @@
+"""Test the shared HTTP transport."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+from thetagang_notifications import transport
+from thetagang_notifications.config import settings
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Answer every request on a kept-alive connection."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self) -> None:  # noqa: N802
+        """Answer a HEAD request."""
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer a GET request."""
+        self.do_HEAD()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args) -> None:  # noqa: A002
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def local_api():
+    """Run a local API on a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    transport.close_http_client()
+
+
+def test_get_http_client_is_shared() -> None:
+    """Verify that every caller shares one client until it is closed."""
+    client = transport.get_http_client()
+    assert transport.get_http_client() is client
+    assert client.timeout.connect == settings.http_connect_timeout
+    assert client.timeout.read == settings.http_read_timeout
+
+    transport.close_http_client()
+    assert client.is_closed
+    assert transport.get_http_client() is not client
+    transport.close_http_client()
+
+
+def test_prewarm_own_client(local_api) -> None:
+    """Verify that pre-warming can fill a client other than the shared one."""
+    client = transport.create_http_client(max_connections=2)
+    transport.recent_timings.clear()
+    transport.prewarm(local_api, client)
+    client.get(f"{local_api}/api/patrons")
+    client.close()
+
+    assert transport.recent_timings[-1].reused_connection
+
+
+def test_prewarm_reuses_connection(local_api) -> None:
+    """Verify that the first request after pre-warming skips the connect."""
+    transport.recent_timings.clear()
+    transport.prewarm(local_api)
+    transport.get_http_client().get(f"{local_api}/api/patrons?secret=1")
+
+    warm, first = transport.recent_timings
+    assert warm.method == "HEAD"
+    assert warm.connect > 0
+    assert not warm.reused_connection
+
+    assert first.url == f"{local_api}/api/patrons"
+    assert first.status_code == 200
+    assert first.http_version == "HTTP/1.1"
+    assert first.reused_connection
+    assert first.elapsed > 0
+
+
+def test_prewarm_failure_is_not_fatal(caplog) -> None:
+    """Verify that a failed pre-warm only logs a warning."""
+    transport.prewarm("http://127.0.0.1:1")
+    transport.close_http_client()
+    assert "Could not pre-warm" in caplog.text
+
+
+def test_http2_needs_h2() -> None:
+    """Verify that HTTP/2 falls back when the h2 package is missing."""
+    assert not transport.http2_available()
+
+    with mock.patch.object(settings, "http2", True):
+        with mock.patch("thetagang_notifications.transport.importlib.util.find_spec", return_value=None):
+            assert not transport.http2_available()
+        with mock.patch("thetagang_notifications.transport.importlib.util.find_spec", return_value=object()):
+            assert transport.http2_available()
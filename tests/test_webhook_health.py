@@ -0,0 +1,92 @@
+"""Test webhook health tracking and quarantine."""
+
+import time
+from unittest import mock
+
+import requests
+from discord_webhook import DiscordEmbed, DiscordWebhook
+
+from thetagang_notifications import circuit, notification, sinks, webhook_health
+from thetagang_notifications.config import settings
+
+
+def fake_response(status_code: int) -> requests.Response:
+    """Build a webhook response."""
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+def test_redact_webhook() -> None:
+    """Verify that webhook tokens never show up in health output."""
+    url = "https://discord.com/api/webhooks/1234/s3cr3t-token"
+    assert webhook_health.redact_webhook(url) == "https://discord.com/api/webhooks/1234/***"
+    assert webhook_health.redact_webhook("https://example.com/hook") == "https://example.com/hook"
+
+
+def test_health_status() -> None:
+    """Verify the rolling error rate and latency."""
+    health = webhook_health.WebhookHealth("https://discord.com/api/webhooks/1/status")
+    for success, latency in [(True, 0.1), (False, 0.3), (True, 0.2), (True, 0.2)]:
+        health.record(success, latency)
+
+    status = health.status()
+    assert status["state"] == "closed"
+    assert status["deliveries"] == 4
+    assert status["error_rate"] == 0.25
+    assert status["latency_p50"] == 0.2
+    assert status["latency_max"] == 0.3
+
+
+def test_deliver_quarantines_and_reinstates() -> None:
+    """Verify that a failing webhook is quarantined and later reinstated."""
+    url = "https://discord.com/api/webhooks/2/quarantine"
+    messages = [[DiscordEmbed(title="test")]]
+    health = webhook_health.get_webhook_health(url)
+
+    with mock.patch.object(DiscordWebhook, "execute", return_value=fake_response(404)) as mock_execute:
+        for _ in range(settings.webhook_failure_threshold):
+            sinks.DiscordSink().deliver(url, messages)
+        assert health.quarantined
+
+        # Quarantined webhooks are skipped without a request, and the messages count as dropped.
+        assert sinks.DiscordSink().deliver(url, messages * 2) == []
+        assert mock_execute.call_count == settings.webhook_failure_threshold
+    assert health.status()["dropped"] == settings.webhook_failure_threshold + 2
+
+    # Once the backoff passes a probe goes out, and success reinstates the webhook.
+    health.breaker.opened_at -= settings.webhook_reset_timeout
+    with mock.patch.object(DiscordWebhook, "execute", return_value=fake_response(204)):
+        assert len(sinks.DiscordSink().deliver(url, messages)) == 1
+    assert not health.quarantined
+    assert webhook_health.webhook_health_status()[health.name]["state"] == "closed"
+    # The breaker is only reported under its webhook.
+    assert health.breaker.name not in circuit.breaker_status()
+
+
+def test_deliver_counts_exceptions_as_failures() -> None:
+    """Verify that timeouts and bad responses count against the webhook."""
+    url = "https://discord.com/api/webhooks/3/timeout"
+    with mock.patch.object(DiscordWebhook, "execute", side_effect=requests.Timeout("slow")):
+        sinks.DiscordSink().deliver(url, [[DiscordEmbed(title="test")]])
+
+    assert webhook_health.get_webhook_health(url).error_rate == 1.0
+
+
+def test_dead_webhook_does_not_slow_healthy_ones() -> None:
+    """Verify that deliveries to every webhook run side by side."""
+    dead, healthy = "https://discord.com/api/webhooks/4/dead", "https://discord.com/api/webhooks/5/healthy"
+    finished: dict[str, float] = {}
+    started = time.perf_counter()
+
+    def fake_execute(webhook: DiscordWebhook) -> requests.Response:
+        if webhook.url == dead:
+            time.sleep(0.5)
+        finished[webhook.url] = time.perf_counter() - started
+        return fake_response(204)
+
+    with mock.patch.object(DiscordWebhook, "execute", autospec=True, side_effect=fake_execute):
+        webhooks = notification.deliver_routed(dict.fromkeys([dead, healthy], [[DiscordEmbed(title="test")]]))
+
+    assert [x.url for x in webhooks] == [dead, healthy]
+    assert finished[healthy] < 0.25 < finished[dead]